@@ -0,0 +1,142 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+import aiohttp
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Giới hạn kết nối của session dùng chung: tổng số và theo từng host
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "50"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "6"))
+HTTP_TIMEOUT = 10  # Thời gian chờ tối đa cho mỗi request (giây)
+HTTP_MAX_RETRIES = 3
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+class AsyncHttpClient:
+    """
+    HTTP client bất đồng bộ dùng chung cho các crawler.
+    Chạy một event loop riêng ở thread nền với một aiohttp.ClientSession duy nhất,
+    nhờ đó connection pool (keep-alive, DNS cache) được dùng lại giữa các lượt tìm kiếm.
+    Code đồng bộ (thread của crawler) gọi run() để chạy coroutine trên loop này.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_LIMIT_PER_HOST):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._thread = threading.Thread(target=self._run_loop, name="async-http", daemon=True)
+        self._thread.start()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "errors": 0
+        }
+
+    @classmethod
+    def instance(cls) -> "AsyncHttpClient":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Session dùng chung (chỉ gọi từ event loop của client)."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+                headers=DEFAULT_HEADERS
+            )
+        return self._session
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Chạy coroutine trên event loop của client và chờ kết quả (gọi từ thread khác)."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def _request(self, method: str, url: str, headers: Dict[str, str] = None,
+                       retries: int = HTTP_MAX_RETRIES, read=None) -> Any:
+        session = await self.get_session()
+        for attempt in range(retries + 1):
+            self._count("requests")
+            try:
+                async with session.request(method, url, headers=headers) as response:
+                    if response.status in HTTP_RETRY_STATUSES and attempt < retries:
+                        self._count("retries")
+                        await asyncio.sleep(2 ** attempt * 0.5)
+                        continue
+                    response.raise_for_status()
+                    return await read(response)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= retries:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                logger.debug(f"Thử lại {url} lần {attempt + 1} do lỗi: {str(e)}")
+                await asyncio.sleep(2 ** attempt * 0.5)
+            except aiohttp.ClientError:
+                self._count("errors")
+                raise
+
+    async def get_json(self, url: str, headers: Dict[str, str] = None, retries: int = HTTP_MAX_RETRIES) -> Any:
+        """GET và parse JSON, thử lại khi gặp lỗi mạng hoặc mã 429/5xx."""
+        return await self._request("GET", url, headers, retries, read=lambda r: r.json(content_type=None))
+
+    async def get_text(self, url: str, headers: Dict[str, str] = None, retries: int = HTTP_MAX_RETRIES) -> str:
+        """GET và trả về nội dung dạng text."""
+        return await self._request("GET", url, headers, retries, read=lambda r: r.text())
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                **self.stats,
+                "limit": self.limit,
+                "limit_per_host": self.limit_per_host
+            }
+
+    def close(self):
+        """Đóng session và dừng event loop."""
+        if not self._loop.is_running():
+            return
+        if self._session is not None and not self._session.closed:
+            try:
+                self.run(self._session.close(), timeout=5)
+            except Exception as e:
+                logger.warning(f"Lỗi khi đóng HTTP session: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+def get_async_client() -> AsyncHttpClient:
+    """Lấy HTTP client bất đồng bộ dùng chung."""
+    return AsyncHttpClient.instance()
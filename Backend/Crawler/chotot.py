@@ -1,120 +1,116 @@
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import asyncio
 import logging
-import re
-from urllib.parse import urljoin
-from .utils import standardize_product_name, get_category_id_from_keyword, validate_image_url
+import os
+from urllib.parse import quote
+from .utils import standardize_product_name, get_category_id_from_keyword, get_remaining_time, validate_image_url
+from .async_http import get_async_client
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def clean_url(url, base_url=""):
-    """Làm sạch URL, thêm base_url nếu cần."""
-    if not url:
-        return ""
-    if url.startswith("//"):
-        url = "https:" + url
-    elif url.startswith("/"):
-        url = urljoin(base_url, url)
-    elif not url.startswith(("http://", "https://")):
-        url = urljoin(base_url, url)
-    return url
+# API tìm kiếm tin đăng (có thể trỏ sang server khác qua biến môi trường)
+CHOTOT_API_URL = os.getenv("CHOTOT_API_URL", "https://gateway.chotot.com/v1/public/ad-listing")
+CHOTOT_PAGE_LIMIT = 20
+# Các trang được lấy song song nên tăng số trang không làm tăng thời gian chờ đáng kể
+CHOTOT_MAX_PAGES = int(os.getenv("CHOTOT_MAX_PAGES", "5"))
 
-def get_category_id(product_name):
-    """Ánh xạ từ khóa tìm kiếm sang category_id."""
-    categories = {
-        'dien thoai': 1,  # Điện thoại
-        'laptop': 2,      # Laptop
-        'may tinh bang': 3,  # Máy tính bảng
-        'tai nghe': 4,    # Tai nghe
-        'tivi': 5         # Tivi
-    }
-    product_name_lower = product_name.lower().strip()
-    for keyword, category_id in categories.items():
-        if keyword in product_name_lower:
-            return category_id
-    return None
+CHOTOT_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "Origin": "https://www.chotot.com",
+    "Referer": "https://www.chotot.com/"
+}
 
-def crawl_chotot(product_name):
-    product_name_lower = standardize_product_name(product_name)
-    search_query = product_name.replace(' ', '%20')
-    results = []
-    page = 1
-    limit = 20
-    max_pages = 2
+def parse_ad(item):
+    """Chuyển một tin đăng từ API Chợ Tốt thành sản phẩm (None nếu thiếu thông tin)."""
+    name = item.get('subject', '')
+    if not name:
+        return None
 
-    session = requests.Session()
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    price = item.get('price', 0)
+    price = int(price) if price else 0
+    if price <= 0:
+        return None
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Origin": "https://www.chotot.com",
-        "Referer": "https://www.chotot.com/",
-        "Connection": "keep-alive"
-    }
+    list_id = item.get('list_id', '')
+    link = f"https://www.chotot.com/{list_id}.htm" if list_id else ""
+    if not link:
+        return None
 
-    while page <= max_pages:
-        try:
-            api_url = f"https://gateway.chotot.com/v1/public/ad-listing?cg=&st=s,k&limit={limit}&o={(page-1)*limit}&q={search_query}"
-            logger.info(f"Crawling Chợ Tốt API page {page}: {api_url}")
-            
-            response = session.get(api_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            items = data.get('ads', [])
-            if not items:
-                logger.info("Không tìm thấy thêm sản phẩm")
-                break
+    image_url = item.get('image', '') or (item.get('images', [])[0] if item.get('images', []) else '')
+    image_url = validate_image_url(image_url)
 
-            for item in items:
-                try:
-                    name = item.get('subject', '')
-                    if not name:
-                        continue
+    return {
+        "name": name,
+        "store_id": 3,  # Chợ Tốt
+        "store_name": "Chợ Tốt",
+        "category_id": get_category_id_from_keyword(name),
+        "price": price,
+        "rating": 0.0,
+        "link": link,
+        "image_url": image_url
+    }
 
-                    price = item.get('price', 0)
-                    price = int(price) if price else 0
-                    if price <= 0:
-                        continue
+async def fetch_chotot_page(client, search_query, offset):
+    """Lấy một trang kết quả từ API Chợ Tốt, trả về danh sách tin đăng (rỗng nếu lỗi)."""
+    api_url = f"{CHOTOT_API_URL}?cg=&st=s,k&limit={CHOTOT_PAGE_LIMIT}&o={offset}&q={search_query}"
+    logger.info(f"Crawling Chợ Tốt API offset {offset}: {api_url}")
+    try:
+        data = await client.get_json(api_url, headers=CHOTOT_HEADERS)
+        return data.get('ads', []) if isinstance(data, dict) else []
+    except Exception as e:
+        logger.error(f"Lỗi khi truy cập API Chợ Tốt (offset {offset}): {str(e)}")
+        return []
 
-                    list_id = item.get('list_id', '')
-                    link = f"https://www.chotot.com/{list_id}.htm" if list_id else ""
-                    if not link:
+async def iter_chotot_ads(product_name, max_pages=CHOTOT_MAX_PAGES):
+    """
+    Lấy đồng thời tất cả các trang (offset) và trả về từng sản phẩm ngay khi trang của nó về tới.
+    Số request chạy song song tới cùng host được giới hạn bởi connection pool dùng chung.
+    """
+    client = get_async_client()
+    search_query = quote(product_name)
+    tasks = [
+        asyncio.ensure_future(fetch_chotot_page(client, search_query, page * CHOTOT_PAGE_LIMIT))
+        for page in range(max_pages)
+    ]
+    seen = set()
+    try:
+        for next_page in asyncio.as_completed(tasks):
+            for item in await next_page:
+                try:
+                    product = parse_ad(item)
+                    if product is None or product["link"] in seen:
                         continue
-
-                    image_url = item.get('image', '') or (item.get('images', [])[0] if item.get('images', []) else '')
-                    image_url = validate_image_url(image_url)
-
-                    product = {
-                        "name": name,
-                        "store_id": 3,  # Chợ Tốt
-                        "store_name": "Chợ Tốt",
-                        "category_id": get_category_id_from_keyword(name),
-                        "price": price,
-                        "rating": 0.0,
-                        "link": link,
-                        "image_url": image_url
-                    }
-                    results.append(product)
-                    logger.debug(f"Thêm sản phẩm: {name}")
+                    seen.add(product["link"])
+                    logger.debug(f"Thêm sản phẩm: {product['name']}")
+                    yield product
                 except Exception as e:
                     logger.error(f"Lỗi khi xử lý sản phẩm: {str(e)}")
                     continue
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def crawl_chotot_async(product_name, max_pages=CHOTOT_MAX_PAGES, timeout=None):
+    """Gom sản phẩm của các trang theo thứ tự về tới, hết timeout thì trả về các sản phẩm đã nhận được."""
+    results = []
 
-            if len(items) < limit:
-                break
-            page += 1
+    async def collect():
+        async for product in iter_chotot_ads(product_name, max_pages):
+            results.append(product)
 
-        except requests.RequestException as e:
-            logger.error(f"Lỗi khi truy cập API Chợ Tốt: {str(e)}")
-            break
+    try:
+        await asyncio.wait_for(collect(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Hết thời hạn crawl Chợ Tốt, dùng {len(results)} sản phẩm của các trang đã về")
+    return results
 
+def crawl_chotot(product_name, max_pages=CHOTOT_MAX_PAGES):
+    """Crawl Chợ Tốt (gọi từ thread đồng bộ, chạy trên event loop của HTTP client dùng chung)."""
+    try:
+        results = get_async_client().run(crawl_chotot_async(product_name, max_pages, timeout=get_remaining_time()))
+    except Exception as e:
+        logger.error(f"Lỗi khi crawl Chợ Tốt: {str(e)}")
+        return []
     logger.info(f"Đã crawl {len(results)} sản phẩm từ Chợ Tốt")
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,164 @@
+import logging
+import time
+from functools import partial
+from urllib.parse import quote
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException, SessionNotCreatedException
+from .async_http import get_async_client
+from .parsing import parse_store_page
+from .stores import PAGINATION_NONE, TIER_API, TIER_BROWSER, TIER_HTTP
+from .utils import (
+    clean_url, crawl_deadline_passed, extract_price, get_chrome_driver, get_remaining_time,
+    iter_new_list_items, standardize_product_name, validate_image_url
+)
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Thời gian chờ tối đa cho một lượt tải trang tìm kiếm bằng HTTP (giây)
+HTTP_SEARCH_TIMEOUT = 15
+BROWSER_PAGE_READY_TIMEOUT = 10
+BROWSER_MAX_ATTEMPTS = 3
+# Số vòng "Xem thêm" tối đa với kiểu phân trang load_more
+LOAD_MORE_MAX_ROUNDS = 10
+
+HTML_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+}
+
+def parse_list_html(html, store):
+    """
+    Đọc các sản phẩm thô (name, price, href, image) từ HTML trang danh sách theo selector của cửa hàng.
+    Parse bằng lxml với XPath biên dịch sẵn trong process pool (Crawler/parsing.py).
+    """
+    return parse_store_page(html, store)
+
+def normalize_items(store, items, seen=None):
+    """
+    Chuẩn hóa các sản phẩm thô thành sản phẩm của hệ thống và loại trùng theo (tên, giá).
+    Dùng chung cho mọi tầng crawl nên kết quả HTTP và trình duyệt có cùng định dạng.
+    """
+    seen = set() if seen is None else seen
+    for item in items:
+        try:
+            name = standardize_product_name(item.get("name", ""))
+            price = extract_price(item.get("price", ""))
+            href = item.get("href", "")
+            if not href or not name or price <= 0:
+                continue
+
+            # Tạo key duy nhất cho sản phẩm để tránh trùng lặp
+            product_key = f"{name}_{price}"
+            if product_key in seen:
+                continue
+            seen.add(product_key)
+
+            image_url = clean_url(item.get("image", ""), store.base_url)
+            yield {
+                "name": name,
+                "store_id": store.store_id,
+                "store_name": store.name,
+                "category_id": 11,
+                "price": price,
+                "rating": 0.0,
+                "link": clean_url(href, store.base_url),
+                "image_url": validate_image_url(image_url),
+                "condition": "new"
+            }
+        except Exception as e:
+            logger.error(f"Lỗi khi xử lý sản phẩm từ {store.name}: {str(e)}")
+            continue
+
+def crawl_store_http(store, query):
+    """Tải trang tìm kiếm bằng HTTP (không mở trình duyệt) qua HTTP client dùng chung."""
+    url = store.build_search_url(quote(query))
+    logger.info(f"Crawling {store.name} (HTTP): {url}")
+    try:
+        client = get_async_client()
+        html = client.run(client.get_text(url, headers=HTML_HEADERS), timeout=get_remaining_time(HTTP_SEARCH_TIMEOUT))
+    except Exception as e:
+        logger.warning(f"Không tải được trang tìm kiếm {store.name} bằng HTTP: {str(e)}")
+        return []
+
+    products = list(normalize_items(store, parse_list_html(html, store)))[:store.max_products]
+    if not products:
+        logger.info(f"Trang tĩnh của {store.name} không có sản phẩm cho từ khóa: {query}")
+    return products
+
+def crawl_store_browser(store, query):
+    """Mở trang tìm kiếm bằng Chrome trong pool, đọc dần sản phẩm khi trang tải thêm."""
+    url = store.build_search_url(quote(query))
+    products = []
+    try:
+        # Mượn Chrome driver đã khởi động sẵn từ pool
+        with get_chrome_driver(store_id=store.store_id) as driver:
+            logger.info(f"Crawling {store.name} (browser): {url}")
+
+            # Thử lại tối đa BROWSER_MAX_ATTEMPTS lần nếu có lỗi
+            for attempt in range(BROWSER_MAX_ATTEMPTS):
+                try:
+                    driver.get(url)
+                    # Đợi cho trang load xong
+                    WebDriverWait(driver, get_remaining_time(BROWSER_PAGE_READY_TIMEOUT)).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, store.list_selector))
+                    )
+                    break
+                except WebDriverException as e:
+                    logger.warning(f"Thử lại lần {attempt+1} do lỗi: {str(e)}")
+                    if attempt == BROWSER_MAX_ATTEMPTS - 1:  # Lần thử cuối cùng
+                        logger.error(f"Không thể crawl {url} sau {BROWSER_MAX_ATTEMPTS} lần thử")
+                        return []
+                    if crawl_deadline_passed():
+                        logger.error(f"Hết thời hạn crawl {url}, không thử lại")
+                        return []
+                    time.sleep(2)
+
+            # Đọc dần các sản phẩm mới khi trang tải thêm (chờ số sản phẩm tăng thay vì ngủ cố định)
+            max_rounds = 1 if store.pagination == PAGINATION_NONE else LOAD_MORE_MAX_ROUNDS
+            items = iter_new_list_items(
+                driver,
+                item_selector=store.item_selector,
+                price_selector=store.price_selector,
+                load_more_selector=store.load_more_selector,
+                max_items=store.max_products,
+                max_rounds=max_rounds,
+                name_selector=store.name_selector,
+                link_selector=store.link_selector,
+                image_selector=store.image_selector
+            )
+            for product in normalize_items(store, items):
+                products.append(product)
+                logger.debug(f"Thêm sản phẩm: {product['name']} - {product['price']:,.0f}đ")
+                if len(products) >= store.max_products:
+                    logger.info(f"Đã đạt số lượng sản phẩm tối đa ({store.max_products})")
+                    break
+
+    except SessionNotCreatedException as e:
+        logger.error(f"Lỗi phiên bản ChromeDriver: {str(e)}")
+        return []
+    except Exception as e:
+        logger.error(f"Lỗi khi crawl {store.name}: {str(e)}")
+        return []
+
+    if products:
+        logger.info(f"Crawl {store.name} thành công: {len(products)} sản phẩm")
+    else:
+        logger.warning(f"Không tìm thấy sản phẩm nào trên {store.name} sau khi crawl")
+    return products
+
+def get_store_tiers(store):
+    """Danh sách (tên tầng, hàm crawl(query)) theo thứ tự khai báo trong cấu hình cửa hàng."""
+    tiers = []
+    for tier in store.tiers:
+        if tier == TIER_HTTP:
+            tiers.append((tier, partial(crawl_store_http, store)))
+        elif tier == TIER_BROWSER:
+            tiers.append((tier, partial(crawl_store_browser, store)))
+        elif tier == TIER_API and store.api_fetcher is not None:
+            tiers.append((tier, store.api_fetcher))
+        else:
+            logger.warning(f"Bỏ qua tầng crawl không hợp lệ '{tier}' của {store.name}")
+    return tiers
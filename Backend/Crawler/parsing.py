@@ -0,0 +1,263 @@
+import atexit
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from lxml import etree, html as lxml_html
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Parse HTML trong process pool để việc parse nặng không tranh GIL với API và các thread điều khiển Chrome
+PARSE_PROCESS_POOL = os.getenv("PARSE_PROCESS_POOL", "1") != "0"
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Thời gian chờ tối đa cho một lượt parse trong pool (giây), quá hạn sẽ parse ngay trong process hiện tại
+PARSE_TIMEOUT = 10
+# Trang nhỏ hơn ngưỡng này được parse luôn trong process hiện tại (chi phí gửi sang pool lớn hơn parse)
+PARSE_POOL_MIN_SIZE = 20000
+# Thư mục chứa trang tìm kiếm đã lưu của từng cửa hàng (<store_id>.html) cho benchmark và test
+SEARCH_PAGE_FIXTURE_DIR = os.getenv(
+    "SEARCH_PAGE_FIXTURE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures", "search_pages")
+)
+
+# (item, name, price, link, image): selector CSS của một trang danh sách
+ListSelectors = Tuple[str, str, str, str, str]
+
+_COMPOUND_RE = re.compile(r'^(\*|[a-zA-Z][\w-]*)?((?:\.[\w-]+|#[\w-]+|\[[^\]]+\])*)$')
+_PART_RE = re.compile(r'\.([\w-]+)|#([\w-]+)|\[\s*([\w-]+)\s*(?:=\s*["\']?([^"\'\]]*)["\']?\s*)?\]')
+
+def _compound_to_xpath(compound: str) -> str:
+    match = _COMPOUND_RE.match(compound)
+    if not match:
+        raise ValueError(f"Selector CSS không được hỗ trợ: {compound}")
+    tag, parts = match.group(1) or "*", match.group(2)
+    predicates = []
+    for class_name, element_id, attr, value in _PART_RE.findall(parts):
+        if class_name:
+            predicates.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')")
+        elif element_id:
+            predicates.append(f"@id='{element_id}'")
+        elif value:
+            predicates.append(f"@{attr}='{value}'")
+        else:
+            predicates.append(f"@{attr}")
+    return tag + "".join(f"[{predicate}]" for predicate in predicates)
+
+def css_to_xpath(selector: str, relative: bool = False) -> str:
+    """
+    Chuyển selector CSS của cấu hình cửa hàng sang XPath. Chỉ hỗ trợ tập con đang dùng trong
+    Crawler/stores.py: nhóm (a, b), tổ tiên (a b), con trực tiếp (a > b), tag, .class, #id,
+    [attr] và [attr=value]. relative=True tìm trong phần tử hiện tại thay vì cả tài liệu.
+    """
+    expressions = []
+    for group in selector.split(","):
+        tokens = group.replace(">", " > ").split()
+        if not tokens:
+            continue
+        path = ""
+        combinator = ".//" if relative else "//"
+        for token in tokens:
+            if token == ">":
+                combinator = "/"
+                continue
+            path += combinator + _compound_to_xpath(token)
+            combinator = "//"
+        expressions.append(path)
+    return " | ".join(expressions)
+
+@lru_cache(maxsize=64)
+def compile_selectors(selectors: ListSelectors) -> Tuple[etree.XPath, ...]:
+    """XPath đã biên dịch cho một bộ selector (mỗi process chỉ biên dịch một lần)."""
+    item, name, price, link, image = selectors
+    return (
+        etree.XPath(css_to_xpath(item)),
+        etree.XPath(css_to_xpath(name, relative=True)),
+        etree.XPath(css_to_xpath(price, relative=True)),
+        etree.XPath(css_to_xpath(link, relative=True)),
+        etree.XPath(css_to_xpath(image, relative=True)),
+    )
+
+def get_store_selectors(store) -> ListSelectors:
+    return (store.item_selector, store.name_selector, store.price_selector,
+            store.link_selector, store.image_selector)
+
+def _first(xpath: etree.XPath, element) -> Optional[etree._Element]:
+    found = xpath(element)
+    return found[0] if found else None
+
+def parse_list_items(page: str, selectors: ListSelectors) -> List[Dict[str, str]]:
+    """
+    Đọc các sản phẩm thô (name, price, href, image) từ HTML trang danh sách bằng lxml.
+    Kết quả giống cách đọc bằng BeautifulSoup trước đây (phần tử đầu tiên khớp theo thứ tự trong trang).
+    """
+    if not page:
+        return []
+    item_xpath, name_xpath, price_xpath, link_xpath, image_xpath = compile_selectors(selectors)
+    parser = lxml_html.HTMLParser(encoding="utf-8")
+    root = lxml_html.document_fromstring(page.encode("utf-8") if isinstance(page, str) else page, parser=parser)
+
+    items = []
+    for element in item_xpath(root):
+        name_elem = _first(name_xpath, element)
+        price_elem = _first(price_xpath, element)
+        link_elem = element if element.tag == "a" else _first(link_xpath, element)
+        img_elem = _first(image_xpath, element)
+        items.append({
+            "name": " ".join(text.strip() for text in name_elem.itertext() if text.strip()) if name_elem is not None else "",
+            "price": "".join(price_elem.itertext()) if price_elem is not None else "",
+            "href": link_elem.get("href", "") if link_elem is not None else "",
+            "image": (img_elem.get("data-src", "") or img_elem.get("src", "")) if img_elem is not None else ""
+        })
+    return items
+
+class ParsePool:
+    """
+    Process pool cho bước parse HTML. Pool được tạo khi cần lần đầu; nếu pool lỗi (process con
+    chết) hoặc quá hạn, trang được parse ngay trong process hiện tại để lượt crawl không bị mất.
+    """
+    def __init__(self, workers: int = PARSE_WORKERS, enabled: bool = PARSE_PROCESS_POOL):
+        self.workers = workers
+        self.enabled = enabled and workers > 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {"pool_parses": 0, "local_parses": 0, "fallbacks": 0, "items": 0, "parse_time": 0.0}
+        atexit.register(self.shutdown)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Dùng spawn: process cha có nhiều thread nên fork không an toàn
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Đã khởi động process pool parse HTML với {self.workers} process")
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def parse(self, page: str, selectors: ListSelectors) -> List[Dict[str, str]]:
+        start = time.perf_counter()
+        items = None
+        used_pool = False
+        if self.enabled and len(page or "") >= PARSE_POOL_MIN_SIZE:
+            try:
+                items = self._get_executor().submit(parse_list_items, page, selectors).result(timeout=PARSE_TIMEOUT)
+                used_pool = True
+            except Exception as e:
+                logger.warning(f"Parse HTML trong process pool thất bại, parse trong process hiện tại: {e!r}")
+                with self._lock:
+                    self.stats["fallbacks"] += 1
+                if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                    self._reset_executor()
+        if items is None:
+            items = parse_list_items(page, selectors)
+        with self._lock:
+            self.stats["pool_parses" if used_pool else "local_parses"] += 1
+            self.stats["items"] += len(items)
+            self.stats["parse_time"] += time.perf_counter() - start
+        return items
+
+    def shutdown(self):
+        self._reset_executor()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        parses = stats["pool_parses"] + stats["local_parses"]
+        return {
+            **stats,
+            "parse_time": round(stats["parse_time"], 3),
+            "avg_parse_ms": round(stats["parse_time"] / parses * 1000, 2) if parses else 0.0,
+            "workers": self.workers,
+            "enabled": self.enabled,
+            "started": self._executor is not None
+        }
+
+parse_pool = ParsePool()
+
+def parse_store_page(page: str, store) -> List[Dict[str, str]]:
+    """Parse trang danh sách của một cửa hàng qua process pool dùng chung."""
+    return parse_pool.parse(page, get_store_selectors(store))
+
+def _bs4_parse_list_items(page: str, selectors: ListSelectors) -> List[Dict[str, str]]:
+    """Cách parse cũ bằng BeautifulSoup + html.parser, chỉ dùng để so sánh trong benchmark."""
+    from bs4 import BeautifulSoup
+    item, name, price, link, image = selectors
+    soup = BeautifulSoup(page, "html.parser")
+    items = []
+    for element in soup.select(item):
+        name_elem = element.select_one(name)
+        price_elem = element.select_one(price)
+        link_elem = element if element.name == "a" else element.select_one(link)
+        img_elem = element.select_one(image)
+        items.append({
+            "name": name_elem.get_text(" ", strip=True) if name_elem else "",
+            "price": price_elem.get_text() if price_elem else "",
+            "href": link_elem.get("href", "") if link_elem else "",
+            "image": (img_elem.get("data-src", "") or img_elem.get("src", "")) if img_elem else ""
+        })
+    return items
+
+def load_search_page_fixture(store_id: int, fixture_dir: Optional[str] = None) -> Optional[str]:
+    """Đọc trang tìm kiếm đã lưu <fixture_dir>/<store_id>.html, None nếu chưa có"""
+    path = os.path.join(fixture_dir or SEARCH_PAGE_FIXTURE_DIR, f"{store_id}.html")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def run_benchmark(fixture_dir: Optional[str] = None, rounds: int = 5, pages: int = 16):
+    """
+    So sánh BeautifulSoup (html.parser) với lxml + XPath biên dịch sẵn trên trang tìm kiếm đã lưu
+    của từng cửa hàng (<fixture_dir>/<store_id>.html, mặc định tests/fixtures/search_pages).
+    Phần process pool parse cùng lúc `pages` trang như khi nhiều lượt crawl xong cùng lúc.
+    """
+    import timeit
+    from .stores import STORES
+
+    stores = [store for store in STORES if store.enabled and store.api_fetcher is None]
+    for store in stores:
+        page = load_search_page_fixture(store.store_id, fixture_dir)
+        if page is None:
+            print(f"{store.name}: chưa có trang đã lưu {store.store_id}.html, bỏ qua")
+            continue
+        source = f"{store.store_id}.html"
+        selectors = get_store_selectors(store)
+        assert parse_list_items(page, selectors) == _bs4_parse_list_items(page, selectors)
+
+        count = len(parse_list_items(page, selectors))
+        print(f"{store.name} ({source}, {len(page) // 1024} KB, {count} sản phẩm)")
+        bs4_time = timeit.timeit(lambda: _bs4_parse_list_items(page, selectors), number=rounds) / rounds
+        lxml_time = timeit.timeit(lambda: parse_list_items(page, selectors), number=rounds) / rounds
+        print(f"  {'BeautifulSoup html.parser':<35}{bs4_time * 1000:>10.2f} ms / trang")
+        print(f"  {'lxml + XPath biên dịch sẵn':<35}{lxml_time * 1000:>10.2f} ms / trang ({bs4_time / lxml_time:.1f}x)")
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            list(executor.map(parse_list_items, [page] * PARSE_WORKERS, [selectors] * PARSE_WORKERS))  # khởi động pool
+            start = time.perf_counter()
+            list(executor.map(parse_list_items, [page] * pages, [selectors] * pages))
+            pool_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(pages):
+            _bs4_parse_list_items(page, selectors)
+        serial_time = time.perf_counter() - start
+        print(f"  {pages} trang: BeautifulSoup tuần tự {serial_time * 1000:.0f} ms, "
+              f"lxml trong pool {PARSE_WORKERS} process {pool_time * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    # python -m Crawler.parsing [thư mục chứa <store_id>.html, mặc định tests/fixtures/search_pages] trong thư mục Backend
+    import sys
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterable, Optional, Tuple
+from .async_http import get_async_client
+from .chotot import CHOTOT_HEADERS
+from .stores import LINK_REFRESH_CHOTOT_API, LINK_REFRESH_PAGE, get_store_config
+from .utils import extract_price
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# API chi tiết một tin đăng Chợ Tốt theo list_id
+CHOTOT_AD_URL = os.getenv("CHOTOT_AD_URL", "https://gateway.chotot.com/v1/public/ad-listing/{list_id}")
+# Số request làm mới giá chạy đồng thời (số kết nối tới cùng host vẫn bị giới hạn bởi HTTP client)
+LINK_REFRESH_CONCURRENCY = int(os.getenv("LINK_REFRESH_CONCURRENCY", "20"))
+# Thời gian tối đa cho cả một lô làm mới (giây)
+LINK_REFRESH_BATCH_TIMEOUT = 300
+
+PAGE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+_CHOTOT_LIST_ID_RE = re.compile(r'/(\d+)\.htm')
+_JSON_LD_RE = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+_META_PRICE_RE = re.compile(
+    r'<meta[^>]+(?:itemprop=["\']price["\']|property=["\']product:price:amount["\'])[^>]*content=["\']([^"\']+)["\']',
+    re.I
+)
+# Giá hiển thị trên trang chi tiết TGDĐ/ĐMX khi trang không có dữ liệu có cấu trúc
+_PAGE_PRICE_RE = re.compile(r'class=["\'][^"\']*(?:box-price-present|price-present)[^"\']*["\'][^>]*>\s*([\d.,]+)', re.I)
+
+_DECIMAL_PRICE_RE = re.compile(r'\d+(?:\.\d{1,2})?')
+
+def to_price(value) -> Optional[float]:
+    """Chuyển giá từ dữ liệu có cấu trúc (19990000, "19990000.00" hoặc "19.990.000₫") sang số."""
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    text = str(value or "").strip()
+    price = float(text) if _DECIMAL_PRICE_RE.fullmatch(text) else extract_price(text)
+    return price if price > 0 else None
+
+def extract_chotot_list_id(link: str) -> Optional[str]:
+    """Lấy list_id từ link tin đăng Chợ Tốt (https://www.chotot.com/<list_id>.htm)."""
+    match = _CHOTOT_LIST_ID_RE.search(link or "")
+    return match.group(1) if match else None
+
+def _find_offer_price(data) -> Optional[float]:
+    """Tìm offers.price trong dữ liệu JSON-LD (có thể là danh sách hoặc @graph lồng nhau)."""
+    if isinstance(data, list):
+        for entry in data:
+            price = _find_offer_price(entry)
+            if price:
+                return price
+        return None
+    if not isinstance(data, dict):
+        return None
+    if "@graph" in data:
+        return _find_offer_price(data["@graph"])
+    offers = data.get("offers")
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if isinstance(offers, dict):
+        return to_price(offers.get("price") or offers.get("lowPrice"))
+    return None
+
+def parse_product_page_price(html: str) -> Optional[float]:
+    """
+    Đọc giá từ trang chi tiết sản phẩm: ưu tiên JSON-LD (offers.price), sau đó thẻ meta giá,
+    cuối cùng là giá hiển thị. Trả về None nếu không tìm thấy.
+    """
+    for block in _JSON_LD_RE.findall(html):
+        try:
+            price = _find_offer_price(json.loads(block.strip()))
+        except ValueError:
+            continue
+        if price:
+            return price
+
+    for pattern in (_META_PRICE_RE, _PAGE_PRICE_RE):
+        match = pattern.search(html)
+        price = to_price(match.group(1)) if match else None
+        if price:
+            return price
+    return None
+
+async def fetch_chotot_price(client, link: str) -> Optional[float]:
+    """Lấy giá hiện tại của một tin đăng Chợ Tốt qua API chi tiết (None nếu tin đã gỡ hoặc lỗi)."""
+    list_id = extract_chotot_list_id(link)
+    if not list_id:
+        return None
+    data = await client.get_json(CHOTOT_AD_URL.format(list_id=list_id), headers=CHOTOT_HEADERS, retries=1)
+    ad = data.get("ad", data) if isinstance(data, dict) else {}
+    return to_price(ad.get("price")) if isinstance(ad, dict) else None
+
+async def fetch_page_price(client, link: str) -> Optional[float]:
+    """Tải trang chi tiết sản phẩm (không mở trình duyệt) và đọc giá."""
+    html = await client.get_text(link, headers=PAGE_HEADERS, retries=1)
+    return parse_product_page_price(html)
+
+LINK_REFRESH_FETCHERS = {
+    LINK_REFRESH_CHOTOT_API: fetch_chotot_price,
+    LINK_REFRESH_PAGE: fetch_page_price,
+}
+
+def supports_link_refresh(store_id: int) -> bool:
+    """Cửa hàng có làm mới giá theo link được hay không."""
+    store = get_store_config(store_id)
+    return store is not None and store.link_refresh in LINK_REFRESH_FETCHERS
+
+async def refresh_prices_async(items: Iterable[Tuple[int, int, str]],
+                               concurrency: int = LINK_REFRESH_CONCURRENCY) -> Dict[int, Optional[float]]:
+    """
+    Lấy giá mới cho danh sách (product_id, store_id, link) đồng thời.
+    Trả về {product_id: giá mới hoặc None nếu không lấy được}.
+    """
+    client = get_async_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(product_id, store_id, link):
+        store = get_store_config(store_id)
+        fetcher = LINK_REFRESH_FETCHERS.get(store.link_refresh) if store else None
+        if fetcher is None or not link:
+            return product_id, None
+        async with semaphore:
+            try:
+                return product_id, await fetcher(client, link)
+            except Exception as e:
+                logger.debug(f"Không làm mới được giá sản phẩm {product_id} ({link}): {str(e)}")
+                return product_id, None
+
+    results = await asyncio.gather(*(fetch_one(*item) for item in items))
+    return dict(results)
+
+def refresh_prices(items: Iterable[Tuple[int, int, str]], timeout: float = LINK_REFRESH_BATCH_TIMEOUT) -> Dict[int, Optional[float]]:
+    """Bản đồng bộ của refresh_prices_async (gọi từ thread, chạy trên event loop của HTTP client dùng chung)."""
+    items = list(items)
+    if not items:
+        return {}
+    try:
+        return get_async_client().run(refresh_prices_async(items), timeout=timeout)
+    except Exception as e:
+        logger.error(f"Lỗi khi làm mới giá theo link: {str(e)}")
+        return {product_id: None for product_id, _, _ in items}
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+from .chotot import crawl_chotot
+
+# Kiểu phân trang của trang danh sách sản phẩm
+PAGINATION_LOAD_MORE = "load_more"  # Bấm "Xem thêm"/cuộn trang để tải thêm sản phẩm
+PAGINATION_NONE = "none"            # Chỉ đọc trang đầu tiên
+
+# Các tầng crawl mà engine hỗ trợ
+TIER_HTTP = "http"        # Tải trang tĩnh bằng HTTP client dùng chung
+TIER_BROWSER = "browser"  # Mở trang bằng Chrome trong pool
+TIER_API = "api"          # Gọi hàm fetch riêng của cửa hàng (api_fetcher)
+
+# Cách làm mới giá của một sản phẩm đã lưu theo link (Crawler/product_refresh.py)
+LINK_REFRESH_PAGE = "page"              # Tải trang chi tiết, đọc JSON-LD/thẻ meta giá
+LINK_REFRESH_CHOTOT_API = "chotot_api"  # Gọi API chi tiết tin đăng theo list_id
+
+DEFAULT_STORE_TIMEOUT = 45
+
+@dataclass(frozen=True)
+class StoreConfig:
+    """
+    Mô tả khai báo của một cửa hàng: URL tìm kiếm, selector của trang danh sách,
+    kiểu phân trang và thứ tự các tầng crawl. Engine dùng chung (engine.py) đọc cấu hình này
+    để tải trang, parse, loại trùng và chuẩn hóa sản phẩm.
+    """
+    store_id: int
+    name: str
+    base_url: str
+    # {base_url} và {query} (đã encode) được thay khi tạo URL tìm kiếm
+    search_url: str = "{base_url}/tim-kiem?key={query}"
+    tiers: Tuple[str, ...] = (TIER_HTTP, TIER_BROWSER)
+    pagination: str = PAGINATION_LOAD_MORE
+    # Selector CSS của trang danh sách
+    list_selector: str = "ul.listproduct"
+    item_selector: str = "ul.listproduct li.item"
+    name_selector: str = "h3"
+    price_selector: str = "strong.price, .price"
+    link_selector: str = "a"
+    image_selector: str = "img[data-src], img[src]"
+    load_more_selector: str = ".view-more"
+    # Các mẫu trong BLOCKED_RESOURCE_PATTERNS (Crawler/utils.py) vẫn được tải khi crawl cửa hàng này bằng Chrome
+    resource_allowlist: Tuple[str, ...] = ()
+    max_products: int = 50
+    timeout: int = DEFAULT_STORE_TIMEOUT
+    # Hàm crawl riêng cho tầng "api": nhận từ khóa, trả về danh sách sản phẩm đã chuẩn hóa
+    api_fetcher: Optional[Callable] = None
+    # Lọc lại kết quả theo từ khóa (cho các nguồn trả về nhiều tin không liên quan)
+    filter_relevance: bool = False
+    # Cách làm mới giá theo link đã lưu (None nếu chỉ làm mới được bằng cách tìm kiếm lại)
+    link_refresh: Optional[str] = LINK_REFRESH_PAGE
+    # False: selector chưa được kiểm tra với trang thật của cửa hàng, không crawl cửa hàng này
+    enabled: bool = True
+
+    def build_search_url(self, encoded_query: str) -> str:
+        return self.search_url.format(base_url=self.base_url, query=encoded_query)
+
+STORES = [
+    StoreConfig(
+        store_id=1,
+        name="Điện Máy Xanh",
+        base_url="https://www.dienmayxanh.com",
+        price_selector="p.box-price-present, strong.price, .price",
+    ),
+    StoreConfig(
+        store_id=2,
+        name="Thế Giới Di Động",
+        base_url="https://www.thegioididong.com",
+    ),
+    StoreConfig(
+        store_id=3,
+        name="Chợ Tốt",
+        base_url="https://www.chotot.com",
+        tiers=(TIER_API,),
+        pagination=PAGINATION_NONE,
+        timeout=20,
+        api_fetcher=crawl_chotot,
+        filter_relevance=True,
+        link_refresh=LINK_REFRESH_CHOTOT_API,
+    ),
+    StoreConfig(
+        store_id=4,
+        name="Nguyễn Kim",
+        # Chưa có trang tìm kiếm thật để kiểm tra các selector dưới đây, tắt cho đến khi lưu được trang thật
+        # vào tests/fixtures/search_pages/4.html và đối chiếu lại
+        enabled=False,
+        base_url="https://www.nguyenkim.com",
+        search_url="{base_url}/tim-kiem.html?tu-khoa={query}",
+        list_selector=".product-list, .nk-product-list",
+        item_selector=".product-list .product-item, .nk-product-list .nk-product",
+        name_selector=".product-title, .product-name, h3",
+        # Không dùng cả khối .product-price: khối này chứa luôn giá gốc đứng trước giá bán
+        price_selector=".product-price .price, .price",
+        link_selector="a[href]",
+        load_more_selector=".btn-viewmore, .view-more",
+    ),
+]
+
+STORES_BY_ID = {store.store_id: store for store in STORES}
+
+def get_store_config(store_id: int) -> Optional[StoreConfig]:
+    """Lấy cấu hình cửa hàng theo store_id (None nếu không có)."""
+    return STORES_BY_ID.get(store_id)
@@ -1,15 +1,112 @@
 import re
-import unicodedata
+import os
+import time
+import threading
+from urllib.parse import urljoin
+from Services.normalize import standardize_name
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager as WebDriverManager
 from contextlib import contextmanager
 import logging
 import atexit
 
 logger = logging.getLogger(__name__)
 
+# Cấu hình pool Chrome driver
+CHROME_POOL_SIZE = int(os.getenv('CHROME_POOL_SIZE', '3'))  # Số Chrome chạy đồng thời tối đa
+CHROME_MAX_PAGES_PER_DRIVER = int(os.getenv('CHROME_MAX_PAGES_PER_DRIVER', '50'))  # Khởi động lại sau N lượt dùng
+CHROME_CHECKOUT_TIMEOUT = 60  # Thời gian chờ tối đa để mượn driver (giây)
+CHROME_PAGE_LOAD_TIMEOUT = 30
+# Dùng profile rút gọn (chặn ảnh/font/media) khi crawl, đặt CHROME_LEAN_PROFILE=0 để tắt
+CHROME_LEAN_PROFILE = os.getenv('CHROME_LEAN_PROFILE', '1') != '0'
+
+# Các tài nguyên crawler không cần: chỉ đọc markup danh sách sản phẩm, URL ảnh lấy từ data-src
+BLOCKED_RESOURCE_PATTERNS = [
+    # Ảnh
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif",
+    # Font
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # Media
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    # Script quảng cáo/thống kê bên thứ ba
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*",
+]
+
+# Thời hạn (time.monotonic()) của lượt crawl đang chạy trong thread hiện tại, đặt bằng crawl_deadline()
+_crawl_deadline = threading.local()
+
+@contextmanager
+def crawl_deadline(deadline):
+    """Đặt thời hạn cho lượt crawl chạy trong thread hiện tại (None là không giới hạn)."""
+    previous = getattr(_crawl_deadline, "value", None)
+    _crawl_deadline.value = deadline
+    try:
+        yield
+    finally:
+        _crawl_deadline.value = previous
+
+def get_remaining_time(default=None):
+    """
+    Số giây còn lại đến thời hạn crawl của thread hiện tại, không vượt quá default.
+    Dùng làm timeout cho các bước có thể treo (mượn driver, tải trang, chờ tải thêm, HTTP)
+    để lượt crawl quá hạn tự dừng và trả lại thread thay vì chạy tiếp ở nền.
+    """
+    deadline = getattr(_crawl_deadline, "value", None)
+    if deadline is None:
+        return default
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if default is None else min(default, remaining)
+
+def crawl_deadline_passed():
+    """Lượt crawl trong thread hiện tại đã hết thời hạn hay chưa."""
+    return get_remaining_time() == 0
+
+def get_blocked_resource_patterns(store_id=None):
+    """Danh sách mẫu URL bị chặn khi crawl một cửa hàng (đã trừ resource_allowlist trong cấu hình cửa hàng)."""
+    from .stores import get_store_config
+    store = get_store_config(store_id) if store_id is not None else None
+    allowed = set(store.resource_allowlist) if store else set()
+    return [pattern for pattern in BLOCKED_RESOURCE_PATTERNS if pattern not in allowed]
+
+def apply_resource_blocking(driver, store_id=None):
+    """Chặn tài nguyên không cần thiết cho tab hiện tại qua CDP Network.setBlockedURLs."""
+    if not CHROME_LEAN_PROFILE:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": get_blocked_resource_patterns(store_id)})
+    except Exception as e:
+        # Không chặn được thì vẫn crawl bình thường, chỉ chậm hơn
+        logger.debug(f"Không thiết lập được danh sách chặn tài nguyên: {str(e)}")
+
+# Đường dẫn ChromeDriver, chỉ cài đặt một lần cho mỗi tiến trình
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def get_chromedriver_path():
+    """Lấy đường dẫn ChromeDriver, ưu tiên CHROME_DRIVER_PATH trong biến môi trường."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            configured_path = os.getenv('CHROME_DRIVER_PATH')
+            if configured_path and os.path.exists(configured_path):
+                _driver_path = configured_path
+            else:
+                _driver_path = WebDriverManager().install()
+        return _driver_path
+
+def create_chrome_driver(options=None):
+    """Khởi động một Chrome driver mới với cấu hình mặc định của crawler."""
+    service = Service(get_chromedriver_path())
+    driver = webdriver.Chrome(service=service, options=options or setup_chrome_driver())
+    driver.set_page_load_timeout(CHROME_PAGE_LOAD_TIMEOUT)
+    return driver
+
 # Biến toàn cục để lưu trữ driver instance
 _driver = None
 
@@ -17,27 +114,7 @@ def get_driver():
     """Singleton pattern để tái sử dụng Chrome driver."""
     global _driver
     if _driver is None:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--start-maximized')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_argument('--ignore-certificate-errors')
-        chrome_options.add_argument('--ignore-ssl-errors')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option("useAutomationExtension", False)
-        chrome_options.add_argument('--disable-notifications')
-        chrome_options.add_argument('--disable-popup-blocking')
-        chrome_options.add_argument('--disable-web-security')
-        chrome_options.add_argument('--disable-site-isolation-trials')
-        chrome_options.page_load_strategy = 'eager'
-        
-        service = Service(ChromeDriverManager().install())
-        _driver = webdriver.Chrome(service=service, options=chrome_options)
-        _driver.set_page_load_timeout(30)
+        _driver = create_chrome_driver()
         
         # Đăng ký hàm cleanup khi thoát
         atexit.register(cleanup_driver)
@@ -54,115 +131,248 @@ def cleanup_driver():
             logger.error(f"Lỗi khi đóng ChromeDriver: {str(e)}")
         _driver = None
 
-class ChromeDriverManager:
+def close_extra_tabs(driver, main_handle):
+    """Đóng tất cả tab trừ tab chính và quay về tab chính."""
+    for handle in driver.window_handles:
+        if handle != main_handle:
+            driver.switch_to.window(handle)
+            driver.close()
+    driver.switch_to.window(main_handle)
+
+class PooledDriver:
+    """Chrome driver trong pool cùng số lượt đã sử dụng."""
+    def __init__(self, driver):
+        self.driver = driver
+        self.main_handle = driver.current_window_handle
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.error(f"Lỗi khi đóng ChromeDriver: {str(e)}")
+
+class ChromeDriverPool:
+    """
+    Pool giới hạn các Chrome driver đã khởi động sẵn, dùng chung giữa các crawler.
+    Driver được kiểm tra trước khi cho mượn và được khởi động lại sau
+    max_pages lượt dùng hoặc khi bị lỗi.
+    """
     _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.driver = None
-        return cls._instance
-        
-    def get_driver(self):
-        if self.driver is None:
-            options = webdriver.ChromeOptions()
-            options.add_argument('--headless')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-popup-blocking')
-            options.add_argument('--disable-notifications')
-            options.add_argument('--disable-extensions')
-            options.add_argument('--remote-debugging-port=9222')
-            
-            self.driver = webdriver.Chrome(options=options)
-            
-            # Đăng ký hàm cleanup khi thoát
-            atexit.register(self.cleanup)
-            
-        return self.driver
-        
-    def cleanup(self):
-        """Dọn dẹp driver và đóng tất cả tab."""
-        if self.driver:
-            try:
-                # Đóng tất cả tab trừ tab đầu tiên
-                if len(self.driver.window_handles) > 1:
-                    main_window = self.driver.window_handles[0]
-                    for handle in self.driver.window_handles[1:]:
-                        self.driver.switch_to.window(handle)
-                        self.driver.close()
-                    self.driver.switch_to.window(main_window)
-                
-                # Đóng driver
-                self.driver.quit()
-            except Exception as e:
-                logger.error(f"Lỗi khi dọn dẹp Chrome driver: {str(e)}")
-            finally:
-                self.driver = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_size=CHROME_POOL_SIZE, max_pages=CHROME_MAX_PAGES_PER_DRIVER):
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.stats = {"created": 0, "recycled": 0, "checkouts": 0, "waits": 0}
+
+    @classmethod
+    def instance(cls):
+        """Lấy pool dùng chung của tiến trình."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                # Đăng ký hàm cleanup khi thoát
+                atexit.register(cls._instance.close)
+            return cls._instance
+
+    def checkout(self, timeout=CHROME_CHECKOUT_TIMEOUT):
+        """Mượn một driver còn hoạt động, khởi động driver mới nếu pool chưa đầy."""
+        deadline = time.monotonic() + timeout
+        while True:
+            pooled = None
+            with self._condition:
+                if not self._idle and self._size >= self.max_size:
+                    self.stats["waits"] += 1
+                while not self._closed and not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Hết thời gian chờ Chrome driver rảnh")
+                    self._condition.wait(remaining)
+                if self._closed:
+                    raise RuntimeError("Chrome driver pool đã đóng")
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._size += 1
+                self.stats["checkouts"] += 1
+
+            if pooled is None:
+                try:
+                    pooled = PooledDriver(create_chrome_driver())
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._condition:
+                    self.stats["created"] += 1
+                logger.info("Đã khởi động Chrome driver mới cho pool")
+                return pooled
+
+            if self._is_healthy(pooled):
+                return pooled
+            logger.warning("Chrome driver không phản hồi, khởi động lại")
+            self._discard(pooled)
+
+    def checkin(self, pooled, broken=False):
+        """Trả driver về pool, đóng driver nếu bị lỗi hoặc đã dùng quá max_pages lượt."""
+        pooled.pages += 1
+        if broken or self._closed or pooled.pages >= self.max_pages:
+            self._discard(pooled)
+            return
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def close(self):
+        """Đóng tất cả driver đang rảnh."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                **self.stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size
+            }
+
+    def _is_healthy(self, pooled):
+        try:
+            pooled.driver.switch_to.window(pooled.main_handle)
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _discard(self, pooled):
+        pooled.quit()
+        with self._condition:
+            self.stats["recycled"] += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
 
 @contextmanager
-def get_chrome_driver():
-    """Context manager để quản lý Chrome driver."""
-    driver_manager = ChromeDriverManager()
-    driver = driver_manager.get_driver()
+def get_chrome_driver(store_id=None):
+    """
+    Context manager để mượn Chrome driver từ pool.
+    Mỗi lượt dùng chạy trong một tab riêng, tab này được đóng khi trả driver.
+    store_id dùng để chọn danh sách tài nguyên bị chặn trong tab (xem StoreConfig.resource_allowlist).
+    """
+    pool = ChromeDriverPool.instance()
+    pooled = pool.checkout(timeout=get_remaining_time(CHROME_CHECKOUT_TIMEOUT))
+    driver = pooled.driver
+    broken = False
     try:
-        # Đóng tất cả tab trừ tab đầu tiên trước khi sử dụng
-        if len(driver.window_handles) > 1:
-            main_window = driver.window_handles[0]
-            for handle in driver.window_handles[1:]:
-                driver.switch_to.window(handle)
-                driver.close()
-            driver.switch_to.window(main_window)
-            
+        # Tải trang không vượt quá thời hạn còn lại của lượt crawl (driver trong pool dùng lại nên đặt mỗi lượt)
+        driver.set_page_load_timeout(max(1, get_remaining_time(CHROME_PAGE_LOAD_TIMEOUT)))
+        driver.switch_to.new_window('tab')
+        apply_resource_blocking(driver, store_id)
         yield driver
-    except Exception as e:
+    except WebDriverException as e:
+        broken = True
         logger.error(f"Lỗi khi sử dụng Chrome driver: {str(e)}")
         raise
     finally:
-        # Đóng các tab phụ sau khi sử dụng
-        if len(driver.window_handles) > 1:
-            main_window = driver.window_handles[0]
-            for handle in driver.window_handles[1:]:
-                driver.switch_to.window(handle)
-                driver.close()
-            driver.switch_to.window(main_window)
+        try:
+            close_extra_tabs(driver, pooled.main_handle)
+        except Exception:
+            broken = True
+        pool.checkin(pooled, broken=broken)
+
+# Chờ tối đa bao lâu để trang render thêm sản phẩm sau khi cuộn/bấm "Xem thêm" (giây)
+LOAD_MORE_TIMEOUT = 3
+LOAD_MORE_POLL_INTERVAL = 0.2
+
+# Đọc các sản phẩm từ vị trí start trở đi ngay trong trình duyệt, chỉ trả về các trường cần thiết
+EXTRACT_NEW_ITEMS_JS = """
+const [start, itemSelector, priceSelector, nameSelector, linkSelector, imageSelector] = arguments;
+const items = document.querySelectorAll(itemSelector);
+const result = [];
+for (let i = start; i < items.length; i++) {
+    const item = items[i];
+    const name = item.querySelector(nameSelector);
+    const price = item.querySelector(priceSelector);
+    const link = item.matches(linkSelector) ? item : item.querySelector(linkSelector);
+    const img = item.querySelector(imageSelector);
+    result.push({
+        name: name ? name.textContent : '',
+        price: price ? price.textContent : '',
+        href: link ? (link.getAttribute('href') || '') : '',
+        image: img ? (img.getAttribute('data-src') || img.getAttribute('src') || '') : ''
+    });
+}
+return result;
+"""
+
+# Bấm "Xem thêm" nếu trang có nút (và nút không bị vô hiệu hóa), sau đó cuộn xuống cuối trang.
+# Không dựa vào việc nút có đang hiển thị hay không: trang còn tải thêm được hay không
+# được quyết định bằng số sản phẩm có tăng lên sau đó (wait_for_item_growth)
+LOAD_MORE_JS = """
+const button = document.querySelector(arguments[0]);
+const clicked = Boolean(button && !button.disabled && button.getAttribute('aria-disabled') !== 'true');
+if (clicked) {
+    button.click();
+}
+window.scrollTo(0, document.body.scrollHeight);
+return clicked;
+"""
+
+COUNT_ITEMS_JS = "return document.querySelectorAll(arguments[0]).length;"
+
+def wait_for_item_growth(driver, item_selector, previous_count, timeout=LOAD_MORE_TIMEOUT):
+    """Chờ cho đến khi số sản phẩm trên trang tăng lên (hoặc hết thời gian), trả về số sản phẩm hiện tại."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=LOAD_MORE_POLL_INTERVAL).until(
+            lambda d: d.execute_script(COUNT_ITEMS_JS, item_selector) > previous_count
+        )
+    except TimeoutException:
+        pass
+    return driver.execute_script(COUNT_ITEMS_JS, item_selector)
+
+def iter_new_list_items(driver, item_selector="ul.listproduct li.item", price_selector="strong.price, .price",
+                        load_more_selector=".view-more", max_items=50, max_rounds=10,
+                        name_selector="h3", link_selector="a", image_selector="img[data-src], img[src]"):
+    """
+    Trả về dần các sản phẩm trên trang danh sách (dict: name, price, href, image).
+    Mỗi vòng chỉ đọc các sản phẩm mới xuất hiện, sau đó bấm "Xem thêm"/cuộn trang và chờ
+    số sản phẩm tăng lên thay vì ngủ cố định; dừng khi trang không tải thêm được nữa.
+    max_rounds=1 chỉ đọc những gì đang có trên trang.
+    """
+    seen = 0
+    for round_index in range(max_rounds):
+        items = driver.execute_script(EXTRACT_NEW_ITEMS_JS, seen, item_selector, price_selector,
+                                      name_selector, link_selector, image_selector) or []
+        for item in items:
+            yield item
+        seen += len(items)
+        if seen >= max_items or round_index == max_rounds - 1:
+            return
+        if crawl_deadline_passed():
+            logger.info(f"Hết thời hạn crawl, dừng tải thêm (đã có {seen} sản phẩm)")
+            return
+
+        driver.execute_script(LOAD_MORE_JS, load_more_selector)
+        if wait_for_item_growth(driver, item_selector, seen, timeout=get_remaining_time(LOAD_MORE_TIMEOUT)) <= seen:
+            logger.info(f"Trang không tải thêm sản phẩm mới (đã có {seen} sản phẩm)")
+            return
 
 def standardize_product_name(name):
-    """Chuẩn hóa tên sản phẩm."""
-    if not name:
-        return ""
-    # Mapping tiếng Việt
-    vietnamese_map = {
-        'à': 'a', 'á': 'a', 'ả': 'a', 'ã': 'a', 'ạ': 'a',
-        'ă': 'a', 'ằ': 'a', 'ắ': 'a', 'ẳ': 'a', 'ẵ': 'a', 'ặ': 'a',
-        'â': 'a', 'ầ': 'a', 'ấ': 'a', 'ẩ': 'a', 'ẫ': 'a', 'ậ': 'a',
-        'đ': 'd',
-        'è': 'e', 'é': 'e', 'ẻ': 'e', 'ẽ': 'e', 'ẹ': 'e',
-        'ê': 'e', 'ề': 'e', 'ế': 'e', 'ể': 'e', 'ễ': 'e', 'ệ': 'e',
-        'ì': 'i', 'í': 'i', 'ỉ': 'i', 'ĩ': 'i', 'ị': 'i',
-        'ò': 'o', 'ó': 'o', 'ỏ': 'o', 'õ': 'o', 'ọ': 'o',
-        'ô': 'o', 'ồ': 'o', 'ố': 'o', 'ổ': 'o', 'ỗ': 'o', 'ộ': 'o',
-        'ơ': 'o', 'ờ': 'o', 'ớ': 'o', 'ở': 'o', 'ỡ': 'o', 'ợ': 'o',
-        'ù': 'u', 'ú': 'u', 'ủ': 'u', 'ũ': 'u', 'ụ': 'u',
-        'ư': 'u', 'ừ': 'u', 'ứ': 'u', 'ử': 'u', 'ữ': 'u', 'ự': 'u',
-        'ỳ': 'y', 'ý': 'y', 'ỷ': 'y', 'ỹ': 'y', 'ỵ': 'y'
-    }
-    
-    # Chuyển về chữ thường và chuẩn hóa Unicode
-    name = unicodedata.normalize('NFKD', name.lower())
-    
-    # Thay thế các ký tự tiếng Việt
-    for vietnamese, latin in vietnamese_map.items():
-        name = name.replace(vietnamese, latin)
-    
-    # Loại bỏ các ký tự không phải chữ cái, số hoặc khoảng trắng
-    name = re.sub(r'[^\w\s-]', '', name)
-    
-    # Loại bỏ khoảng trắng thừa
-    name = ' '.join(name.split())
-    
-    return name
+    """Chuẩn hóa tên sản phẩm: bỏ ký tự đặc biệt, giữ dấu tiếng Việt và chữ hoa để hiển thị."""
+    return standardize_name(name)
 
 def get_category_id_from_keyword(keyword):
     """Lấy ID danh mục từ từ khóa."""
@@ -176,45 +386,30 @@ def get_category_id_from_keyword(keyword):
     return None
 
 def extract_price(price_text):
-    """
-    Trích xuất giá từ text:
-    - Bỏ các ký tự không phải số
-    - Chuyển về kiểu float
-    """
+    """Trích xuất giá từ text (bỏ mọi ký tự không phải số, kể cả dấu chấm phân cách hàng nghìn)."""
     if not price_text:
         return 0.0
-    try:
-        price = ''.join(c for c in price_text if c.isdigit() or c == '.')
-        return float(price)
-    except:
-        return 0.0
+    price_text = re.sub(r'[^\d]', '', price_text)
+    return float(price_text) if price_text else 0.0
 
-def clean_url(url, base_url=None):
-    """
-    Chuẩn hóa URL:
-    - Thêm base_url nếu là relative URL
-    - Bỏ các query params không cần thiết
-    """
+def clean_url(url, base_url=""):
+    """Làm sạch URL, thêm base_url nếu là đường dẫn tương đối."""
     if not url:
         return ""
-    
-    url = url.split('?')[0]
-    
-    if base_url and not url.startswith(('http://', 'https://')):
-        return f"{base_url.rstrip('/')}/{url.lstrip('/')}"
-    
+    url = url.strip()
+    if url.startswith("//"):
+        return "https:" + url
+    if not url.startswith(("http://", "https://")):
+        return urljoin(base_url, url)
     return url
 
 def get_store_name(store_id):
     """
     Lấy tên store từ ID
     """
-    store_names = {
-        1: "Điện Máy Xanh",
-        2: "Thế Giới Di Động",
-        3: "Chợ Tốt"
-    }
-    return store_names.get(store_id, "Unknown")
+    from .stores import get_store_config
+    store = get_store_config(store_id)
+    return store.name if store else "Unknown"
 
 def validate_image_url(url):
     """
@@ -276,5 +471,25 @@ def setup_chrome_driver():
     options.add_argument('--disable-web-security')
     options.add_argument('--disable-site-isolation-trials')
     options.page_load_strategy = 'eager'
+
+    if CHROME_LEAN_PROFILE:
+        # Tắt các tính năng chạy nền không cần cho crawl. Ảnh/font/media được chặn theo từng tab
+        # (apply_resource_blocking) để resource_allowlist của cửa hàng vẫn mở lại được
+        options.add_argument('--mute-audio')
+        options.add_argument('--autoplay-policy=user-gesture-required')
+        options.add_argument('--no-first-run')
+        options.add_argument('--no-default-browser-check')
+        options.add_argument('--disable-background-networking')
+        options.add_argument('--disable-default-apps')
+        options.add_argument('--disable-sync')
+        options.add_argument('--disable-component-update')
+        options.add_argument('--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication')
+        options.add_experimental_option('prefs', {
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+            'profile.default_content_setting_values.media_stream': 2,
+            'profile.default_content_setting_values.plugins': 2,
+            'profile.default_content_setting_values.popups': 2,
+        })
     
     return options
\ No newline at end of file
@@ -1,9 +1,12 @@
 import pyodbc
 import logging
 import os
+import time
+import threading
 from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from Services.normalize import normalize_text, normalize_many
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,6 +18,26 @@ DB_NAME = 'TMDR'
 DB_TRUSTED_CONNECTION = 'yes'
 DB_DRIVER = 'ODBC Driver 17 for SQL Server'
 
+# Cấu hình connection pool
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 10
+DB_POOL_TIMEOUT = 30  # Thời gian chờ tối đa để mượn kết nối (giây)
+DB_POOL_IDLE_TIMEOUT = 300  # Đóng kết nối rảnh quá lâu (giây)
+DB_POOL_VALIDATE_AFTER = 30  # Kiểm tra lại kết nối đã rảnh quá lâu trước khi cho mượn (giây)
+
+# Kiểu cột Products.price (khớp với CREATE TABLE trong init_db và SQL/schema.sql), dùng khi ép kiểu tham số giá
+PRICE_SQL_TYPE = 'DECIMAL(18,2)'
+
+# Full-text search trên Products.name_normalized (None: chưa kiểm tra)
+FULLTEXT_CATALOG = 'ProductsCatalog'
+_fulltext_available = None
+
+# Các hàm được gọi sau khi dữ liệu Products thay đổi (vd: cập nhật index tìm kiếm trong bộ nhớ)
+_data_change_listeners = []
+
+# Số dòng tối đa cho mỗi lần executemany khi lưu sản phẩm theo lô
+BULK_SAVE_BATCH_SIZE = 1000
+
 def get_connection_string() -> str:
     """Tạo chuỗi kết nối database."""
     return f'DRIVER={{{DB_DRIVER}}};SERVER={DB_SERVER};DATABASE=master;Trusted_Connection={DB_TRUSTED_CONNECTION};charset=UTF8'
@@ -46,26 +69,208 @@ def get_db_connection_string() -> str:
     """Tạo chuỗi kết nối đến database TMDR."""
     return f'DRIVER={{{DB_DRIVER}}};SERVER={DB_SERVER};DATABASE={DB_NAME};Trusted_Connection={DB_TRUSTED_CONNECTION};charset=UTF8'
 
+class ConnectionPool:
+    """
+    Pool kết nối pyodbc dùng chung, an toàn giữa các thread.
+    Kết nối rảnh quá lâu sẽ được kiểm tra lại trước khi cho mượn và bị đóng
+    khi vượt quá idle_timeout (vẫn giữ tối thiểu min_size kết nối).
+    """
+    def __init__(self, connection_string_factory, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_TIMEOUT, idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                 validate_after=DB_POOL_VALIDATE_AFTER):
+        self.connection_string_factory = connection_string_factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self._idle = []  # Danh sách (connection, thời điểm trả về)
+        self._size = 0
+        self._condition = threading.Condition()
+        self.stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "validation_failures": 0
+        }
+
+    def acquire(self):
+        """Mượn một kết nối, tạo mới nếu pool chưa đầy hoặc chờ tối đa timeout giây."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            conn = None
+            last_used = None
+            with self._condition:
+                expired = self._pop_expired()
+                if not self._idle and self._size >= self.max_size:
+                    self.stats["waits"] += 1
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Hết thời gian chờ kết nối database rảnh")
+                    self._condition.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                self.stats["checkouts"] += 1
+                self.stats["wait_time"] += time.monotonic() - start
+            self._close_all(expired)
+
+            if conn is None:
+                return self._create()
+
+            if time.monotonic() - last_used < self.validate_after or self._validate(conn):
+                return conn
+            with self._condition:
+                self.stats["validation_failures"] += 1
+            self._discard(conn)
+
+    def release(self, conn, discard=False):
+        """Trả kết nối về pool; đóng kết nối nếu đã hỏng."""
+        if not discard:
+            try:
+                # Đảm bảo không còn transaction dang dở trước khi cho mượn lại
+                conn.rollback()
+            except pyodbc.Error:
+                discard = True
+        if discard:
+            self._discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            expired = self._pop_expired()
+            self._condition.notify()
+        self._close_all(expired)
+
+    def prefill(self):
+        """Mở sẵn min_size kết nối."""
+        conns = []
+        try:
+            while True:
+                with self._condition:
+                    if self._size >= self.min_size:
+                        break
+                    self._size += 1
+                conns.append(self._create())
+        finally:
+            for conn in conns:
+                self.release(conn)
+
+    def close(self):
+        """Đóng tất cả kết nối đang rảnh."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        self._close_all([conn for conn, _ in idle])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            checkouts = self.stats["checkouts"]
+            return {
+                **self.stats,
+                "wait_time": round(self.stats["wait_time"], 3),
+                "avg_wait_ms": round(self.stats["wait_time"] / checkouts * 1000, 3) if checkouts else 0.0,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size
+            }
+
+    def _create(self):
+        try:
+            conn = pyodbc.connect(self.connection_string_factory())
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.stats["created"] += 1
+        return conn
+
+    def _validate(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _pop_expired(self):
+        """Lấy ra các kết nối rảnh quá idle_timeout (gọi khi đang giữ lock)."""
+        now = time.monotonic()
+        expired = []
+        keep = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout and self._size - len(expired) > self.min_size:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        self._size -= len(expired)
+        return expired
+
+    def _discard(self, conn):
+        self._close_all([conn])
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _close_all(self, conns):
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if conns:
+            with self._condition:
+                self.stats["closed"] += len(conns)
+
+# Pool kết nối dùng chung cho toàn bộ ứng dụng
+_connection_pool = ConnectionPool(get_db_connection_string)
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Lấy thông số của connection pool."""
+    return _connection_pool.get_stats()
+
 @contextmanager
 def get_db_cursor():
-    """Context manager để quản lý kết nối database."""
+    """Context manager để quản lý kết nối database (mượn kết nối từ pool)."""
     conn = None
     cursor = None
+    broken = False
     try:
-        conn = pyodbc.connect(get_db_connection_string())
+        conn = _connection_pool.acquire()
         cursor = conn.cursor()
         yield cursor
         conn.commit()
     except Exception as e:
         logger.error(f"Database error: {str(e)}")
+        if isinstance(e, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+            # Kết nối có thể đã bị ngắt, không trả lại pool
+            broken = True
         if conn:
-            conn.rollback()
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                broken = True
         raise
     finally:
         if cursor:
-            cursor.close()
+            try:
+                cursor.close()
+            except pyodbc.Error:
+                broken = True
         if conn:
-            conn.close()
+            _connection_pool.release(conn, discard=broken)
 
 def init_db():
     """Khởi tạo database và các bảng cần thiết."""
@@ -103,6 +308,8 @@ def init_db():
 
             # Thêm các cửa hàng mặc định nếu chưa có
             cursor.execute("IF NOT EXISTS (SELECT * FROM Stores) BEGIN INSERT INTO Stores (name, url) VALUES ('Điện Máy Xanh', 'https://www.dienmayxanh.com'), ('Thế Giới Di Động', 'https://www.thegioididong.com'), ('Chợ Tốt', 'https://www.chotot.com') END")
+            # Cửa hàng thêm sau (database cũ đã có 3 cửa hàng đầu)
+            cursor.execute("IF NOT EXISTS (SELECT * FROM Stores WHERE id = 4) BEGIN SET IDENTITY_INSERT Stores ON; INSERT INTO Stores (id, name, url) VALUES (4, N'Nguyễn Kim', 'https://www.nguyenkim.com'); SET IDENTITY_INSERT Stores OFF; END")
 
             # Tạo bảng Products nếu chưa tồn tại
             cursor.execute("""
@@ -111,6 +318,7 @@ def init_db():
                     CREATE TABLE Products (
                         id INT PRIMARY KEY IDENTITY(1,1),
                         name NVARCHAR(255) NOT NULL,
+                        name_normalized NVARCHAR(255),
                         price DECIMAL(18,2) NOT NULL,
                         store_id INT FOREIGN KEY REFERENCES Stores(id),
                         category_id INT,
@@ -177,101 +385,421 @@ def init_db():
                 END
             """)
 
+            # Migration: cột tên đã chuẩn hóa và các index phục vụ tìm kiếm
+            migrate_search_indexes(cursor)
+
             logger.info("Đã khởi tạo database thành công")
+
+        # Full-text index cần chạy ngoài transaction nên tạo riêng
+        init_fulltext_index()
+
+        # Mở sẵn các kết nối tối thiểu của pool
+        _connection_pool.prefill()
     except Exception as e:
         logger.error(f"Lỗi khi khởi tạo database: {str(e)}")
         raise
 
-def save_products(products: List[Dict[str, Any]], search_query: str):
-    """Lưu danh sách sản phẩm vào database."""
+def migrate_search_indexes(cursor):
+    """
+    Thêm cột name_normalized (tên không dấu, chữ thường - giống normalize_text),
+    điền giá trị cho các dòng cũ và tạo các index dùng cho tìm kiếm, lọc, sắp xếp.
+    """
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.columns WHERE name = 'name_normalized' AND object_id = OBJECT_ID('Products'))
+        BEGIN
+            ALTER TABLE Products ADD name_normalized NVARCHAR(255)
+        END
+    """)
+
+    # Điền name_normalized cho các sản phẩm chưa có
+    cursor.execute("SELECT id, name FROM Products WHERE name_normalized IS NULL")
+    fetched = cursor.fetchall()
+    normalized_names = normalize_many(name for _, name in fetched)
+    rows = [(normalized[:255], product_id) for (product_id, _), normalized in zip(fetched, normalized_names)]
+    if rows:
+        cursor.fast_executemany = True
+        try:
+            for i in range(0, len(rows), BULK_SAVE_BATCH_SIZE):
+                cursor.executemany(
+                    "UPDATE Products SET name_normalized = ? WHERE id = ?",
+                    rows[i:i + BULK_SAVE_BATCH_SIZE]
+                )
+        finally:
+            cursor.fast_executemany = False
+        logger.info(f"Đã cập nhật name_normalized cho {len(rows)} sản phẩm")
+
+    indexes = [
+        ("IX_Products_name_normalized", "Products", "(name_normalized) INCLUDE (price, store_id)"),
+        # link là NVARCHAR(MAX) nên chỉ có thể nằm trong INCLUDE
+        ("IX_Products_store_name_link", "Products", "(store_id, name) INCLUDE (link, price)"),
+        ("IX_Products_price", "Products", "(price)"),
+        ("IX_Products_last_updated", "Products", "(last_updated)"),
+        ("IX_PriceHistory_product_recorded", "PriceHistory", "(product_id, recorded_at)"),
+        ("IX_Notifications_is_read_created", "Notifications", "(is_read, created_at)"),
+    ]
+    for index_name, table_name, definition in indexes:
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{index_name}' AND object_id = OBJECT_ID('{table_name}'))
+            BEGIN
+                CREATE INDEX {index_name} ON {table_name} {definition}
+            END
+        """)
+
+def init_fulltext_index() -> bool:
+    """
+    Tạo full-text catalog (không phân biệt dấu) và full-text index trên Products.name_normalized.
+    Trả về False nếu SQL Server không cài Full-Text Search, khi đó tìm kiếm dùng LIKE.
+    """
+    global _fulltext_available
+    conn = None
+    try:
+        # CREATE FULLTEXT CATALOG/INDEX không chạy được trong transaction
+        conn = pyodbc.connect(get_db_connection_string())
+        conn.autocommit = True
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT CAST(SERVERPROPERTY('IsFullTextInstalled') AS INT)")
+        if not cursor.fetchone()[0]:
+            logger.warning("SQL Server chưa cài Full-Text Search, tìm kiếm sẽ dùng LIKE")
+            _fulltext_available = False
+            return False
+
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sys.fulltext_catalogs WHERE name = '{FULLTEXT_CATALOG}')
+            BEGIN
+                CREATE FULLTEXT CATALOG {FULLTEXT_CATALOG} WITH ACCENT_SENSITIVITY = OFF
+            END
+        """)
+
+        # Full-text index cần khóa chính của bảng, tên khóa do SQL Server tự sinh
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('Products'))
+            BEGIN
+                DECLARE @pk SYSNAME = (
+                    SELECT name FROM sys.indexes
+                    WHERE object_id = OBJECT_ID('Products') AND is_primary_key = 1
+                );
+                DECLARE @sql NVARCHAR(MAX) =
+                    N'CREATE FULLTEXT INDEX ON Products (name_normalized LANGUAGE 0) '
+                    + N'KEY INDEX ' + QUOTENAME(@pk) + N' ON {FULLTEXT_CATALOG} '
+                    + N'WITH CHANGE_TRACKING AUTO, STOPLIST = OFF';
+                EXEC sp_executesql @sql;
+            END
+        """)
+
+        _fulltext_available = True
+        logger.info("Đã khởi tạo full-text index cho Products")
+        return True
+    except Exception as e:
+        logger.warning(f"Không thể khởi tạo full-text index, tìm kiếm sẽ dùng LIKE: {str(e)}")
+        _fulltext_available = False
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def is_fulltext_available() -> bool:
+    """Kiểm tra full-text index đã sẵn sàng chưa."""
+    return bool(_fulltext_available)
+
+def register_data_change_listener(listener):
+    """
+    Đăng ký hàm nhận thông báo khi dữ liệu Products thay đổi.
+    listener(event, product_ids) với event là "save" (các id vừa thêm/cập nhật) hoặc "clear".
+    """
+    if listener not in _data_change_listeners:
+        _data_change_listeners.append(listener)
+
+def notify_data_changed(event: str, product_ids: Optional[List[int]] = None):
+    """Thông báo cho các listener sau khi transaction thay đổi Products đã commit."""
+    for listener in list(_data_change_listeners):
+        try:
+            listener(event, product_ids or [])
+        except Exception as e:
+            logger.warning(f"Lỗi khi xử lý thông báo thay đổi dữ liệu ({event}): {str(e)}")
+
+def save_products(products: List[Dict[str, Any]], search_query: str, bulk: bool = True,
+                  record_history: bool = True):
+    """
+    Lưu danh sách sản phẩm vào database.
+    Mặc định lưu theo lô bằng một câu MERGE; nếu thất bại sẽ lưu lại từng sản phẩm.
+    record_history=False khi lưu từ tác vụ nền (không phải người dùng tìm kiếm).
+    """
     try:
         with get_db_cursor() as cursor:
-            # Lưu từng sản phẩm
             logger.info(f"Bắt đầu lưu {len(products)} sản phẩm vào database")
-            for product in products:
+            saved = False
+            changed_ids = []
+            if bulk and products:
                 try:
-                    # Kiểm tra sản phẩm đã tồn tại
-                    cursor.execute("""
-                        SELECT id, price FROM Products 
-                        WHERE name = ? AND store_id = ? AND link = ?
-                    """, (product['name'], product['store_id'], product['link']))
-                    existing_product = cursor.fetchone()
-                    
-                    if existing_product:
-                        # Cập nhật sản phẩm và lưu lịch sử giá
-                        product_id = existing_product[0]
-                        old_price = existing_product[1]
-                        
-                        if old_price != product['price']:
-                            # Cập nhật sản phẩm
-                            cursor.execute("""
-                                UPDATE Products 
-                                SET price = ?, 
-                                    rating = ?,
-                                    image_url = ?,
-                                    last_updated = GETDATE()
-                                WHERE id = ?
-                            """, (
-                                product['price'],
-                                product.get('rating'),
-                                product.get('image_url'),
-                                product_id
-                            ))
-                            
-                            # Lưu lịch sử giá
-                            cursor.execute("""
-                                INSERT INTO PriceHistory (product_id, price)
-                                VALUES (?, ?)
-                            """, (product_id, product['price']))
-
-                            # Tạo thông báo thay đổi giá
-                            price_change = product['price'] - old_price
-                            cursor.execute("""
-                                INSERT INTO Notifications (product_id, message)
-                                VALUES (?, ?)
-                            """, (
-                                product_id,
-                                f"Giá sản phẩm {product['name']} đã thay đổi từ {old_price:,.0f}đ thành {product['price']:,.0f}đ"
-                            ))
-                    else:
-                        # Thêm sản phẩm mới
-                        cursor.execute("""
-                            INSERT INTO Products (name, price, store_id, link, image_url, rating, last_updated)
-                            VALUES (?, ?, ?, ?, ?, ?, GETDATE())
-                        """, (
-                            product['name'],
-                            product['price'],
-                            product['store_id'],
-                            product['link'],
-                            product.get('image_url'),
-                            product.get('rating')
-                        ))
-                        
-                        # Lấy ID của sản phẩm vừa thêm
-                        cursor.execute("SELECT @@IDENTITY")
-                        product_id = cursor.fetchone()[0]
-                        
-                        # Lưu lịch sử giá cho sản phẩm mới
-                        cursor.execute("""
-                            INSERT INTO PriceHistory (product_id, price)
-                            VALUES (?, ?)
-                        """, (product_id, product['price']))
-                        
-                except Exception as e:
-                    logger.error(f"Lỗi khi lưu sản phẩm {product.get('name', 'Unknown')}: {str(e)}")
-                    continue  # Tiếp tục với sản phẩm tiếp theo
-                    
+                    changes = _save_products_bulk(cursor, products)
+                    saved = True
+                    changed_ids = [int(c[1]) for c in changes]
+                    logger.info(f"Đã lưu theo lô: {sum(1 for c in changes if c[0] == 'INSERT')} sản phẩm mới, "
+                                f"{sum(1 for c in changes if c[0] == 'UPDATE')} sản phẩm thay đổi giá")
+                except pyodbc.Error as e:
+                    logger.warning(f"Lưu theo lô thất bại, chuyển sang lưu từng sản phẩm: {str(e)}")
+                    cursor.connection.rollback()
+
+            if not saved:
+                changed_ids = _save_products_rowwise(cursor, products)
+
             # Lưu lịch sử tìm kiếm
-            cursor.execute("""
-                INSERT INTO SearchHistory (query, user_id)
-                VALUES (?, 1)  -- Sử dụng user_id mặc định là 1
-            """, (search_query,))
+            if record_history:
+                cursor.execute("""
+                    INSERT INTO SearchHistory (query, user_id)
+                    VALUES (?, 1)  -- Sử dụng user_id mặc định là 1
+                """, (search_query,))
             
             logger.info("Đã lưu sản phẩm và lịch sử tìm kiếm thành công")
     except Exception as e:
         logger.error(f"Lỗi khi lưu sản phẩm vào database: {str(e)}")
         raise
 
+    if changed_ids:
+        notify_data_changed("save", changed_ids)
+
+def _save_products_bulk(cursor, products: List[Dict[str, Any]]):
+    """
+    Lưu sản phẩm theo lô: nạp vào bảng tạm bằng fast_executemany, sau đó một câu MERGE
+    cập nhật/thêm Products và ghi PriceHistory, Notifications từ mệnh đề OUTPUT.
+    Trả về danh sách (action, product_id, name, price) của các sản phẩm đã thay đổi.
+    """
+    # Loại bỏ sản phẩm trùng (name, store_id, link) trong cùng lô, giữ bản ghi sau cùng
+    rows = {}
+    normalized_names = normalize_many(product['name'] for product in products)
+    for product, normalized_name in zip(products, normalized_names):
+        key = (product['name'], product['store_id'], product['link'])
+        rows[key] = (
+            product['name'],
+            normalized_name[:255],
+            product['price'],
+            product['store_id'],
+            product['link'],
+            product.get('image_url'),
+            product.get('rating')
+        )
+
+    cursor.execute("""
+        IF OBJECT_ID('tempdb..#IncomingProducts') IS NOT NULL DROP TABLE #IncomingProducts;
+        CREATE TABLE #IncomingProducts (
+            name NVARCHAR(255) NOT NULL,
+            name_normalized NVARCHAR(255),
+            price DECIMAL(18,2) NOT NULL,
+            store_id INT NOT NULL,
+            link NVARCHAR(4000) NOT NULL,
+            image_url NVARCHAR(4000),
+            rating FLOAT
+        )
+    """)
+
+    values = list(rows.values())
+    cursor.fast_executemany = True
+    try:
+        for i in range(0, len(values), BULK_SAVE_BATCH_SIZE):
+            cursor.executemany("""
+                INSERT INTO #IncomingProducts (name, name_normalized, price, store_id, link, image_url, rating)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, values[i:i + BULK_SAVE_BATCH_SIZE])
+    finally:
+        cursor.fast_executemany = False
+
+    cursor.execute("""
+        SET NOCOUNT ON;
+        DECLARE @changes TABLE (
+            action NVARCHAR(10),
+            product_id INT,
+            name NVARCHAR(255),
+            old_price DECIMAL(18,2),
+            new_price DECIMAL(18,2)
+        );
+
+        MERGE Products WITH (HOLDLOCK) AS target
+        USING #IncomingProducts AS source
+            ON target.name = source.name
+            AND target.store_id = source.store_id
+            AND target.link = source.link
+        WHEN MATCHED AND target.price <> source.price THEN
+            UPDATE SET price = source.price,
+                       name_normalized = source.name_normalized,
+                       rating = source.rating,
+                       image_url = source.image_url,
+                       last_updated = GETDATE()
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (name, name_normalized, price, store_id, link, image_url, rating, last_updated)
+            VALUES (source.name, source.name_normalized, source.price, source.store_id, source.link,
+                    source.image_url, source.rating, GETDATE())
+        OUTPUT $action, inserted.id, inserted.name, deleted.price, inserted.price INTO @changes;
+
+        -- Lưu lịch sử giá cho sản phẩm mới và sản phẩm thay đổi giá
+        INSERT INTO PriceHistory (product_id, price)
+        SELECT product_id, new_price FROM @changes;
+
+        -- Tạo thông báo thay đổi giá
+        INSERT INTO Notifications (product_id, message)
+        SELECT product_id,
+               N'Giá sản phẩm ' + name + N' đã thay đổi từ ' + FORMAT(old_price, 'N0', 'en-US')
+               + N'đ thành ' + FORMAT(new_price, 'N0', 'en-US') + N'đ'
+        FROM @changes
+        WHERE action = 'UPDATE';
+
+        DROP TABLE #IncomingProducts;
+
+        SELECT action, product_id, name, new_price FROM @changes;
+    """)
+    return [tuple(row) for row in cursor.fetchall()]
+
+def _save_products_rowwise(cursor, products: List[Dict[str, Any]]):
+    """Lưu từng sản phẩm một (dùng khi không lưu theo lô được). Trả về id các sản phẩm đã thay đổi."""
+    changed_ids = []
+    for product in products:
+        try:
+            # Kiểm tra sản phẩm đã tồn tại
+            cursor.execute("""
+                SELECT id, price FROM Products 
+                WHERE name = ? AND store_id = ? AND link = ?
+            """, (product['name'], product['store_id'], product['link']))
+            existing_product = cursor.fetchone()
+            
+            if existing_product:
+                # Cập nhật sản phẩm và lưu lịch sử giá
+                product_id = existing_product[0]
+                old_price = existing_product[1]
+                
+                if old_price != product['price']:
+                    # Cập nhật sản phẩm
+                    cursor.execute("""
+                        UPDATE Products 
+                        SET price = ?, 
+                            rating = ?,
+                            image_url = ?,
+                            last_updated = GETDATE()
+                        WHERE id = ?
+                    """, (
+                        product['price'],
+                        product.get('rating'),
+                        product.get('image_url'),
+                        product_id
+                    ))
+                    
+                    # Lưu lịch sử giá
+                    cursor.execute("""
+                        INSERT INTO PriceHistory (product_id, price)
+                        VALUES (?, ?)
+                    """, (product_id, product['price']))
+
+                    changed_ids.append(product_id)
+
+                    # Tạo thông báo thay đổi giá
+                    price_change = product['price'] - old_price
+                    cursor.execute("""
+                        INSERT INTO Notifications (product_id, message)
+                        VALUES (?, ?)
+                    """, (
+                        product_id,
+                        f"Giá sản phẩm {product['name']} đã thay đổi từ {old_price:,.0f}đ thành {product['price']:,.0f}đ"
+                    ))
+            else:
+                # Thêm sản phẩm mới
+                cursor.execute("""
+                    INSERT INTO Products (name, name_normalized, price, store_id, link, image_url, rating, last_updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, GETDATE())
+                """, (
+                    product['name'],
+                    normalize_text(product['name'])[:255],
+                    product['price'],
+                    product['store_id'],
+                    product['link'],
+                    product.get('image_url'),
+                    product.get('rating')
+                ))
+                
+                # Lấy ID của sản phẩm vừa thêm
+                cursor.execute("SELECT @@IDENTITY")
+                product_id = int(cursor.fetchone()[0])
+                changed_ids.append(product_id)
+                
+                # Lưu lịch sử giá cho sản phẩm mới
+                cursor.execute("""
+                    INSERT INTO PriceHistory (product_id, price)
+                    VALUES (?, ?)
+                """, (product_id, product['price']))
+                
+        except Exception as e:
+            logger.error(f"Lỗi khi lưu sản phẩm {product.get('name', 'Unknown')}: {str(e)}")
+            continue  # Tiếp tục với sản phẩm tiếp theo
+    return changed_ids
+
+def update_product_prices(prices: Dict[int, float]) -> List[int]:
+    """
+    Cập nhật giá mới theo id sản phẩm (làm mới theo link đã lưu) bằng một lượt UPDATE theo lô.
+    Mọi sản phẩm trong prices đều được cập nhật last_updated; sản phẩm đổi giá được ghi
+    PriceHistory và Notifications. Trả về id các sản phẩm đã đổi giá.
+    """
+    if not prices:
+        return []
+    try:
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                IF OBJECT_ID('tempdb..#PriceUpdates') IS NOT NULL DROP TABLE #PriceUpdates;
+                CREATE TABLE #PriceUpdates (
+                    product_id INT PRIMARY KEY,
+                    price DECIMAL(18,2) NOT NULL
+                )
+            """)
+            values = list(prices.items())
+            cursor.fast_executemany = True
+            try:
+                for i in range(0, len(values), BULK_SAVE_BATCH_SIZE):
+                    cursor.executemany(
+                        "INSERT INTO #PriceUpdates (product_id, price) VALUES (?, ?)",
+                        values[i:i + BULK_SAVE_BATCH_SIZE]
+                    )
+            finally:
+                cursor.fast_executemany = False
+
+            cursor.execute("""
+                SET NOCOUNT ON;
+                DECLARE @changes TABLE (
+                    product_id INT,
+                    name NVARCHAR(255),
+                    old_price DECIMAL(18,2),
+                    new_price DECIMAL(18,2)
+                );
+
+                UPDATE p
+                SET price = u.price,
+                    last_updated = GETDATE()
+                OUTPUT inserted.id, inserted.name, deleted.price, inserted.price INTO @changes
+                FROM Products p
+                JOIN #PriceUpdates u ON p.id = u.product_id;
+
+                -- Lưu lịch sử giá cho sản phẩm thay đổi giá
+                INSERT INTO PriceHistory (product_id, price)
+                SELECT product_id, new_price FROM @changes WHERE old_price <> new_price;
+
+                -- Tạo thông báo thay đổi giá
+                INSERT INTO Notifications (product_id, message)
+                SELECT product_id,
+                       N'Giá sản phẩm ' + name + N' đã thay đổi từ ' + FORMAT(old_price, 'N0', 'en-US')
+                       + N'đ thành ' + FORMAT(new_price, 'N0', 'en-US') + N'đ'
+                FROM @changes
+                WHERE old_price <> new_price;
+
+                DROP TABLE #PriceUpdates;
+
+                SELECT product_id FROM @changes WHERE old_price <> new_price;
+            """)
+            changed_ids = [int(row[0]) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Lỗi khi cập nhật giá sản phẩm: {str(e)}")
+        raise
+
+    notify_data_changed("save", list(prices))
+    if changed_ids:
+        logger.info(f"Đã cập nhật giá theo link: {len(changed_ids)}/{len(prices)} sản phẩm thay đổi giá")
+    return changed_ids
+
 def clear_history():
     """Xóa lịch sử sản phẩm và giá, nhưng giữ lại các sản phẩm trong Favorites."""
     try:
@@ -297,11 +825,13 @@ def clear_history():
             """)
             
             logger.info("Đã xóa lịch sử sản phẩm thành công, giữ lại các sản phẩm yêu thích")
-            return True
     except Exception as e:
         logger.error(f"Lỗi khi xóa lịch sử sản phẩm: {str(e)}")
         raise
 
+    notify_data_changed("clear")
+    return True
+
 def create_price_change_notification(product_id: int, old_price: float, new_price: float):
     """Tạo thông báo khi giá sản phẩm thay đổi."""
     try:
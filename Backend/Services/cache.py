@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from Database.db import register_data_change_listener
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Giới hạn mặc định của cache response
+CACHE_TTL = 300  # Thời gian sống của mỗi mục (giây)
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50MB
+
+# Kết quả crawl được giữ lại để các lượt tìm giống nhau (khác trang/bộ lọc) không crawl lại
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_MAX_ENTRIES = 100
+
+def estimate_size(value: Any) -> int:
+    """Ước lượng kích thước (byte) của response khi serialize sang JSON."""
+    try:
+        return len(json.dumps(value, default=str, ensure_ascii=False).encode('utf-8'))
+    except (TypeError, ValueError):
+        return 0
+
+class CacheEntry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+class ResponseCache:
+    """
+    Cache response giới hạn theo số mục và tổng dung lượng, loại bỏ theo LRU và hết hạn theo TTL.
+    get_or_compute gộp các request giống nhau đang chạy đồng thời (single-flight):
+    chỉ request đầu tiên thực sự tính toán, các request còn lại chờ cùng kết quả.
+    """
+    def __init__(self, name: str, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Các lượt tính đang chạy (task dùng chung cho mọi request cùng key), chỉ truy cập từ event loop
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Tăng mỗi khi cache bị xóa để bỏ qua kết quả được tính từ dữ liệu cũ
+        self._generation = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "coalesced": 0,
+            "oversized": 0
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                self.stats["oversized"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(value, size, time.monotonic() + (ttl or self.ttl))
+            self._bytes += size
+            # Loại bỏ các mục ít được dùng nhất cho đến khi nằm trong giới hạn
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """Xóa toàn bộ cache (khi dữ liệu gốc thay đổi)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self.stats["invalidations"] += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             ttl: Optional[float] = None,
+                             should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Lấy giá trị từ cache, nếu chưa có thì gọi compute() (chỉ một lần cho mỗi key đang chạy).
+        Lỗi từ compute() không được cache; should_cache(value) = False để không lưu kết quả.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        return await asyncio.shield(self.compute_shared(key, compute, ttl, should_cache))
+
+    def get_inflight(self, key: str) -> Optional[asyncio.Task]:
+        """Task đang tính key (None nếu không có lượt nào đang chạy), chỉ gọi từ event loop."""
+        return self._inflight.get(key)
+
+    def compute_shared(self, key: str, compute: Callable[[], Awaitable[Any]],
+                       ttl: Optional[float] = None,
+                       should_cache: Optional[Callable[[Any], bool]] = None) -> asyncio.Task:
+        """
+        Task dùng chung đang tính key, tạo task mới gọi compute() nếu chưa có (không đọc cache).
+        Task được đăng ký ngay khi hàm trả về nên các request sau đó cùng key sẽ dùng lại nó.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            with self._lock:
+                self.stats["coalesced"] += 1
+            return task
+        # compute() chạy trong task riêng: request đầu tiên bị hủy (client ngắt kết nối)
+        # chỉ hủy lượt chờ của chính nó, các request đang chờ cùng key vẫn nhận được kết quả
+        task = asyncio.ensure_future(self._compute(key, compute, ttl, should_cache))
+        self._inflight[key] = task
+        task.add_done_callback(self._finish_compute(key))
+        return task
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: Optional[float],
+                       should_cache: Optional[Callable[[Any], bool]]) -> Any:
+        generation = self._generation
+        value = await compute()
+        if generation == self._generation and (should_cache is None or should_cache(value)):
+            self.set(key, value, ttl)
+        return value
+
+    def _finish_compute(self, key: str):
+        def done(task: asyncio.Task):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # Đánh dấu lỗi đã được xử lý nếu không còn request nào chờ task này
+            if not task.cancelled():
+                task.exception()
+        return done
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "inflight": len(self._inflight),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl
+            }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+# Cache cho các response đọc từ database: xóa khi Products/Favorites thay đổi
+query_cache = ResponseCache("query")
+# Cache kết quả crawl theo từ khóa: hết hạn theo TTL (chính lượt crawl đã ghi vào database),
+# bị xóa khi dữ liệu bị xóa để lượt tìm tiếp theo crawl và ghi lại sản phẩm
+search_cache = ResponseCache("search", max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL)
+
+def get_search_cache_key(normalized_query: str, condition: Optional[str] = None) -> str:
+    """Key của search_cache, dùng chung cho mọi endpoint tìm kiếm (từ khóa đã qua normalize_text)."""
+    return f"search:{normalized_query}:{condition}"
+
+def _invalidate_on_data_change(event: str, product_ids):
+    query_cache.clear()
+    if event == "clear":
+        # Kết quả crawl trong cache không còn trong Products: trả cache sẽ bỏ qua bước lưu lại
+        search_cache.clear()
+
+register_data_change_listener(_invalidate_on_data_change)
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Lấy thông số của các cache response."""
+    return {
+        "query": query_cache.get_stats(),
+        "search": search_cache.get_stats()
+    }
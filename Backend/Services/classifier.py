@@ -0,0 +1,163 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from Services.normalize import normalize_text
+
+# Định nghĩa từ khóa cho các danh mục sản phẩm
+required_keywords = {
+    1: {  # Điện thoại
+        "keywords": ["dien thoai", "smartphone", "iphone", "samsung", "xiaomi", "oppo", "vivo", "realme", "nokia", "huawei"],
+        "name": "Điện thoại"
+    },
+    2: {  # Laptop
+        "keywords": ["laptop", "macbook", "dell", "hp", "asus", "lenovo", "acer", "msi", "lg gram"],
+        "name": "Laptop"
+    },
+    3: {  # Máy tính bảng
+        "keywords": ["may tinh bang", "tablet", "ipad", "samsung tab", "xiaomi pad", "huawei matepad"],
+        "name": "Máy tính bảng"
+    },
+    4: {  # Tai nghe
+        "keywords": ["tai nghe", "headphone", "earphone", "airpods", "sony", "bluetooth", "true wireless"],
+        "name": "Tai nghe"
+    },
+    5: {  # Tivi
+        "keywords": ["tivi", "tv", "smart tv", "samsung tv", "lg tv", "tcl", "sony tv"],
+        "name": "Tivi"
+    },
+    6: {  # Máy hút bụi
+        "keywords": ["may hut bui", "máy hút bụi", "vacuum", "robot hút bụi", "máy lau nhà", "dyson", "electrolux"],
+        "name": "Máy hút bụi"
+    },
+    7: {  # Máy giặt
+        "keywords": ["may giat", "máy giặt", "washing machine", "lg", "samsung", "electrolux", "panasonic"],
+        "name": "Máy giặt"
+    },
+    8: {  # Tủ lạnh
+        "keywords": ["tu lanh", "tủ lạnh", "refrigerator", "side by side", "mini", "inverter"],
+        "name": "Tủ lạnh"
+    },
+    9: {  # Điều hòa
+        "keywords": ["dieu hoa", "điều hòa", "máy lạnh", "air conditioner", "inverter"],
+        "name": "Điều hòa"
+    },
+    10: {  # Nồi cơm điện
+        "keywords": ["noi com dien", "nồi cơm điện", "rice cooker", "toshiba", "sharp", "cuckoo"],
+        "name": "Nồi cơm điện"
+    },
+    11: {  # Khác
+        "keywords": [],
+        "name": "Khác"
+    }
+}
+
+DEFAULT_CATEGORY_ID = 11  # Danh mục "Khác"
+
+class AhoCorasickMatcher:
+    """
+    Bộ so khớp nhiều mẫu cùng lúc (Aho–Corasick): đọc text một lượt và trả về mọi mẫu xuất hiện,
+    chi phí không phụ thuộc số lượng mẫu. Chỉ nhận các khớp trọn từ (biên là khoảng trắng hoặc
+    đầu/cuối chuỗi) vì text đầu vào đã được normalize_text.
+    """
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        # Mỗi trạng thái: bảng chuyển, liên kết thất bại, danh sách (độ dài mẫu, giá trị) kết thúc tại đây
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+        for pattern, value in patterns:
+            if pattern:
+                self._add(pattern, value)
+        self._build_fail_links()
+
+    def _add(self, pattern: str, value: object):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), value))
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Gộp sẵn đầu ra của trạng thái thất bại để không phải đi theo chuỗi fail khi so khớp
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[object]:
+        """Trả về giá trị của mọi mẫu khớp trọn từ trong text (một mẫu có thể khớp nhiều lần)."""
+        matches = []
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        length = len(text)
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            # Chỉ nhận khớp kết thúc ở cuối một từ và bắt đầu ở đầu một từ
+            if index + 1 < length and text[index + 1] != ' ':
+                continue
+            for pattern_length, value in output[state]:
+                start = index - pattern_length + 1
+                if start == 0 or text[start - 1] == ' ':
+                    matches.append(value)
+        return matches
+
+class CategoryClassifier:
+    """
+    Phân loại sản phẩm theo tên bằng một lượt Aho–Corasick trên tên đã chuẩn hóa.
+    Mỗi từ khóa khớp cộng điểm cho danh mục của nó: từ khóa nhiều từ (cụ thể hơn) nặng hơn,
+    từ khóa dùng chung cho nhiều danh mục (ví dụ tên hãng "samsung") được chia nhỏ trọng số.
+    Danh mục điểm cao nhất thắng, hòa điểm thì lấy danh mục có id nhỏ hơn.
+    """
+    def __init__(self, categories: Dict[int, Dict], default_category: int = DEFAULT_CATEGORY_ID):
+        self.default_category = default_category
+        keyword_categories: Dict[str, set] = {}
+        for category_id, category_info in categories.items():
+            for keyword in category_info["keywords"]:
+                normalized = normalize_text(keyword)
+                if normalized:
+                    keyword_categories.setdefault(normalized, set()).add(category_id)
+
+        patterns = []
+        for keyword, category_ids in keyword_categories.items():
+            weight = len(keyword.split()) / len(category_ids)
+            for category_id in category_ids:
+                patterns.append((keyword, (category_id, weight)))
+        self.keyword_count = len(keyword_categories)
+        self._matcher = AhoCorasickMatcher(patterns)
+
+    def scores(self, product_name: str, normalized: bool = False) -> Dict[int, float]:
+        """Điểm của từng danh mục khớp với tên (rỗng nếu không khớp danh mục nào)."""
+        text = product_name if normalized else normalize_text(product_name)
+        result: Dict[int, float] = {}
+        for category_id, weight in self._matcher.find_all(text):
+            result[category_id] = result.get(category_id, 0.0) + weight
+        return result
+
+    def classify(self, product_name: Optional[str], normalized: bool = False) -> int:
+        """Danh mục phù hợp nhất với tên sản phẩm, default_category nếu không khớp."""
+        if not product_name:
+            return self.default_category
+        category_scores = self.scores(product_name, normalized)
+        if not category_scores:
+            return self.default_category
+        return min(category_scores, key=lambda category_id: (-category_scores[category_id], category_id))
+
+    def classify_many(self, product_names: Iterable[Optional[str]]) -> List[int]:
+        """Phân loại cả danh sách tên (ví dụ toàn bộ kết quả của một lượt crawl)."""
+        return [self.classify(name) for name in product_names]
+
+category_classifier = CategoryClassifier(required_keywords)
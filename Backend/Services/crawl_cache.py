@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from Services.normalize import normalize_text
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Thư mục lưu kết quả crawl (giữ lại sau khi khởi động lại server)
+CRAWL_CACHE_DIR = os.getenv(
+    "CRAWL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".crawl_cache")
+)
+# Kết quả mới hơn khoảng này được dùng luôn, không crawl lại (giây)
+CRAWL_CACHE_FRESH_SECONDS = int(os.getenv("CRAWL_CACHE_FRESH_SECONDS", "600"))
+# Kết quả cũ hơn FRESH nhưng chưa quá MAX_AGE được trả ngay và làm mới ở nền (giây)
+CRAWL_CACHE_MAX_AGE = int(os.getenv("CRAWL_CACHE_MAX_AGE", "86400"))
+
+FRESH = "fresh"
+STALE = "stale"
+
+class CrawlCache:
+    """
+    Cache kết quả crawl theo (cửa hàng, từ khóa đã chuẩn hóa), lưu mỗi mục thành một file JSON
+    đặt tên theo sha1 của từ khóa. Dùng kiểu stale-while-revalidate: kết quả cũ vẫn được trả ngay
+    trong khi một lượt crawl nền làm mới nó.
+    """
+    def __init__(self, cache_dir: str = CRAWL_CACHE_DIR, fresh_seconds: int = CRAWL_CACHE_FRESH_SECONDS,
+                 max_age: int = CRAWL_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.fresh_seconds = fresh_seconds
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.stats = {
+            "fresh_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "refreshes": 0,
+            "errors": 0
+        }
+
+    def _path(self, store_id: int, query: str) -> str:
+        digest = hashlib.sha1(normalize_text(query).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, str(store_id), f"{digest}.json")
+
+    def get(self, store_id: int, query: str) -> Optional[Tuple[List[Dict[str, Any]], str, float]]:
+        """Trả về (kết quả, FRESH/STALE, tuổi tính bằng giây) hoặc None nếu chưa có/đã quá hạn."""
+        path = self._path(store_id, query)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Không đọc được cache crawl {path}: {str(e)}")
+            self._count("errors")
+            self._count("misses")
+            return None
+
+        age = time.time() - entry.get("fetched_at", 0)
+        if age > self.max_age:
+            self._count("misses")
+            return None
+        if age <= self.fresh_seconds:
+            self._count("fresh_hits")
+            return entry.get("results", []), FRESH, age
+        self._count("stale_hits")
+        return entry.get("results", []), STALE, age
+
+    def put(self, store_id: int, query: str, results: List[Dict[str, Any]]):
+        """Lưu kết quả crawl (ghi file tạm rồi đổi tên để không bao giờ đọc phải file dở dang)."""
+        path = self._path(store_id, query)
+        entry = {
+            "query": normalize_text(query),
+            "store_id": store_id,
+            "fetched_at": time.time(),
+            "results": results
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False, default=str)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._count("writes")
+        except OSError as e:
+            logger.warning(f"Không ghi được cache crawl {path}: {str(e)}")
+            self._count("errors")
+
+    def start_refresh(self, store_id: int, query: str) -> bool:
+        """Đánh dấu bắt đầu làm mới; False nếu đã có lượt làm mới khác cho cùng mục."""
+        key = (store_id, normalize_text(query))
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.stats["refreshes"] += 1
+            return True
+
+    def finish_refresh(self, store_id: int, query: str):
+        with self._lock:
+            self._refreshing.discard((store_id, normalize_text(query)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "refreshing": len(self._refreshing),
+                "fresh_seconds": self.fresh_seconds,
+                "max_age": self.max_age
+            }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+crawl_cache = CrawlCache()
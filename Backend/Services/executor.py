@@ -0,0 +1,106 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Dict
+from Database.db import DB_POOL_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Số thread cho các truy vấn database (bằng số kết nối tối đa của pool)
+DB_EXECUTOR_WORKERS = DB_POOL_MAX_SIZE
+# Số lượt crawl chạy đồng thời và số lượt được phép xếp hàng chờ
+CRAWL_EXECUTOR_WORKERS = 2
+CRAWL_QUEUE_LIMIT = 10
+
+class ExecutorQueueFullError(Exception):
+    """Hàng đợi của executor đã đầy."""
+
+class BoundedExecutor:
+    """
+    Thread pool theo dõi số tác vụ đang chờ/đang chạy.
+    Nếu có max_queue, tác vụ mới sẽ bị từ chối khi hàng đợi đã đầy.
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: int = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "max_queue_depth": 0,
+            "queue_wait_time": 0.0
+        }
+
+    def submit(self, func, *args, **kwargs) -> concurrent.futures.Future:
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise ExecutorQueueFullError(f"Hàng đợi {self.name} đã đầy ({self.max_queue} tác vụ)")
+            self._queued += 1
+            self.stats["submitted"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queued)
+
+        enqueued_at = time.monotonic()
+
+        def task():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self.stats["queue_wait_time"] += time.monotonic() - enqueued_at
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self.stats["completed"] += 1
+
+        return self._executor.submit(task)
+
+    async def run(self, func, *args, **kwargs):
+        """Chạy hàm blocking trong pool và chờ kết quả mà không chặn event loop."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.stats["completed"]
+            return {
+                **self.stats,
+                "queue_wait_time": round(self.stats["queue_wait_time"], 3),
+                "avg_queue_wait_ms": round(self.stats["queue_wait_time"] / completed * 1000, 3) if completed else 0.0,
+                "queue_depth": self._queued,
+                "active": self._active,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+# Pool cho các truy vấn database và pool riêng, có giới hạn, cho các lượt crawl
+db_executor = BoundedExecutor("db", DB_EXECUTOR_WORKERS)
+crawl_executor = BoundedExecutor("crawl", CRAWL_EXECUTOR_WORKERS, max_queue=CRAWL_QUEUE_LIMIT)
+
+async def run_db(func, *args, **kwargs):
+    """Chạy truy vấn database blocking trong db_executor."""
+    return await db_executor.run(func, *args, **kwargs)
+
+async def run_crawl(func, *args, **kwargs):
+    """Chạy lượt crawl blocking trong crawl_executor (có thể raise ExecutorQueueFullError)."""
+    return await crawl_executor.run(func, *args, **kwargs)
+
+def get_executor_stats() -> Dict[str, Any]:
+    """Lấy thông số hàng đợi của các executor."""
+    return {
+        "db": db_executor.get_stats(),
+        "crawl": crawl_executor.get_stats()
+    }
@@ -1,6 +1,10 @@
 import logging
-from Database.db import get_db_cursor
-from Services.search import normalize_text, text_contains
+from Database.db import get_db_cursor, is_fulltext_available
+from Services.search import (
+    normalize_text, text_contains, get_product_category,
+    build_fulltext_condition, search_in_database
+)
+from Services.search_index import product_index, is_index_ready
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,21 +14,28 @@ def filter_products(query: str, min_price: float = None, max_price: float = None
     """
     Lọc sản phẩm theo từ khóa và khoảng giá với khả năng tìm kiếm nâng cao
     """
+    if is_index_ready():
+        # Trả lời từ index trong bộ nhớ, không cần truy vấn SQL Server
+        return product_index.search(query, min_price, max_price, match_all=True)
+
     try:
         with get_db_cursor() as cursor:
             # Xây dựng câu truy vấn SQL cơ bản
             sql = """
-                SELECT p.*, s.name as store_name,
-                       CASE WHEN ? IS NULL THEN 0 ELSE 1 END as has_query
+                SELECT p.*, s.name as store_name
                 FROM Products p
                 JOIN Stores s ON p.store_id = s.id
                 WHERE 1=1
             """
-            params = [query]
+            params = []
+            normalized_query = normalize_text(query) if query else ""
 
             # Thêm điều kiện tìm kiếm theo từ khóa
-            if query:
-                normalized_query = normalize_text(query)
+            if normalized_query and is_fulltext_available():
+                # Dùng full-text index thay vì quét LIKE '%...%' trên toàn bảng
+                sql += " AND CONTAINS(p.name_normalized, ?)"
+                params.append(build_fulltext_condition(query, match_all=True))
+            elif normalized_query:
                 search_terms = normalized_query.split()
                 
                 if search_terms:
@@ -33,15 +44,15 @@ def filter_products(query: str, min_price: float = None, max_price: float = None
                     
                     for term in search_terms:
                         # Tìm kiếm chính xác
-                        exact_match = f"LOWER(p.name) LIKE ?"
+                        exact_match = f"p.name_normalized LIKE ?"
                         params.append(f"%{term}%")
                         
                         # Tìm kiếm với dấu cách
-                        space_match = f"LOWER(p.name) LIKE ?"
+                        space_match = f"p.name_normalized LIKE ?"
                         params.append(f"% {term} %")
                         
                         # Tìm kiếm đầu từ
-                        start_match = f"LOWER(p.name) LIKE ?"
+                        start_match = f"p.name_normalized LIKE ?"
                         params.append(f"{term}%")
                         
                         term_conditions.append(f"({exact_match} OR {space_match} OR {start_match})")
@@ -60,14 +71,14 @@ def filter_products(query: str, min_price: float = None, max_price: float = None
             sql += """
                 ORDER BY 
                     CASE 
-                        WHEN has_query = 1 AND LOWER(p.name) LIKE ? THEN 1  -- Ưu tiên 1: Khớp chính xác
-                        WHEN has_query = 1 AND LOWER(p.name) LIKE ? THEN 2  -- Ưu tiên 2: Chứa từ khóa
-                        ELSE 3                                              -- Ưu tiên 3: Các kết quả khác
+                        WHEN p.name_normalized LIKE ? THEN 1  -- Ưu tiên 1: Khớp chính xác
+                        WHEN p.name_normalized LIKE ? THEN 2  -- Ưu tiên 2: Chứa từ khóa
+                        ELSE 3                                -- Ưu tiên 3: Các kết quả khác
                     END,
                     p.price ASC
             """
-            if query:
-                params.extend([f"%{normalized_query}%", f"%{normalized_query}%"])
+            if normalized_query:
+                params.extend([normalized_query, f"%{normalized_query}%"])
             else:
                 params.extend([None, None])
 
@@ -79,10 +90,7 @@ def filter_products(query: str, min_price: float = None, max_price: float = None
             results = []
             
             for row in cursor.fetchall():
-                product = dict(zip(columns, row))
-                if 'has_query' in product:
-                    del product['has_query']
-                results.append(product)
+                results.append(dict(zip(columns, row)))
 
             return results
 
@@ -130,6 +138,23 @@ def search_local_products(query: str):
     """
     Tìm kiếm sản phẩm trong database local với độ linh hoạt cao
     """
+    if is_index_ready():
+        results = product_index.search(query)
+        return {
+            "query": query,
+            "total": len(results),
+            "results": results
+        }
+
+    if is_fulltext_available():
+        # Full-text index đã xếp hạng theo độ phù hợp, không cần chấm điểm lại trong Python
+        result = search_in_database(query)
+        return {
+            "query": query,
+            "total": result["total"],
+            "results": result["results"]
+        }
+
     try:
         with get_db_cursor() as cursor:
             # Chuẩn hóa query và tách từ khóa
@@ -158,19 +183,19 @@ def search_local_products(query: str):
             
             # 1. Tìm kiếm từng từ riêng lẻ
             for term in search_terms:
-                conditions.append("LOWER(p.name) LIKE ?")
+                conditions.append("p.name_normalized LIKE ?")
                 params.append(f"%{term}%")
             
             # 2. Tìm kiếm cả cụm từ
             if len(search_terms) > 1:
                 full_query = ' '.join(search_terms)
-                conditions.append("LOWER(p.name) LIKE ?")
+                conditions.append("p.name_normalized LIKE ?")
                 params.append(f"%{full_query}%")
             
             # 3. Tìm kiếm với dấu cách linh hoạt
             if len(search_terms) > 1:
                 flexible_query = '%'.join(search_terms)
-                conditions.append("LOWER(p.name) LIKE ?")
+                conditions.append("p.name_normalized LIKE ?")
                 params.append(f"%{flexible_query}%")
             
             sql += " OR ".join(conditions) + ")"
@@ -178,10 +203,12 @@ def search_local_products(query: str):
             cursor.execute(sql, params)
             columns = [column[0] for column in cursor.description]
             results = []
+            # Danh mục của từ khóa chỉ cần tính một lần cho cả lượt tìm
+            search_category = get_product_category(query)
             
             for row in cursor.fetchall():
                 product = dict(zip(columns, row))
-                name = product['name'].lower()
+                name = product['name_normalized'] or normalize_text(product['name'])
                 relevance_score = 0
                 
                 # 1. Điểm cho từng từ khóa riêng lẻ
@@ -213,7 +240,6 @@ def search_local_products(query: str):
                 
                 # 5. Điểm cho khớp category
                 category_id = get_product_category(name)
-                search_category = get_product_category(query)
                 if category_id and search_category and category_id == search_category:
                     relevance_score += 1
                 
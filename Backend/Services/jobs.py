@@ -0,0 +1,448 @@
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from Services.normalize import normalize_text
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# File SQLite chứa hàng đợi (dùng chung giữa server web và các process worker)
+JOBS_DB_PATH = os.getenv(
+    "JOBS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".jobs.sqlite3")
+)
+# Chạy các process worker cùng server web, mặc định tắt, đặt JOBS_ENABLED=1 để bật
+# (hoặc chạy riêng bằng python -m Services.jobs)
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "0") == "1"
+# Số process worker (mỗi process có pool Chrome và HTTP client riêng)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Số Chrome tối đa trong pool của mỗi process worker: tổng số Chrome tối đa là
+# CHROME_POOL_SIZE của server web + JOB_WORKERS x JOB_WORKER_CHROME_POOL_SIZE
+JOB_WORKER_CHROME_POOL_SIZE = int(os.getenv("JOB_WORKER_CHROME_POOL_SIZE", "1"))
+# Số job được phép chờ trong hàng đợi, vượt quá sẽ từ chối job mới
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+# Khoảng nghỉ của worker khi hàng đợi trống (giây)
+JOB_POLL_INTERVAL = 0.5
+# Job chạy quá thời gian này được coi là treo và được xếp lại hàng đợi (giây)
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "300"))
+JOB_MAX_ATTEMPTS = 2
+# Kết quả của job đã xong được giữ lại trong khoảng này (giây)
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+# Chu kỳ kiểm tra worker, job treo và job đã xong của thread giám sát (giây)
+JOB_MONITOR_INTERVAL = 2.0
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS SearchJobs (
+        id TEXT PRIMARY KEY,
+        dedup_key TEXT NOT NULL,
+        query TEXT NOT NULL,
+        condition TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        result TEXT,
+        changed_ids TEXT,
+        error TEXT,
+        notified INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    );
+    -- Mỗi từ khóa chỉ có tối đa một job đang chờ/đang chạy
+    CREATE UNIQUE INDEX IF NOT EXISTS UX_SearchJobs_Active
+        ON SearchJobs(dedup_key) WHERE status IN ('queued', 'running');
+    CREATE INDEX IF NOT EXISTS IX_SearchJobs_Status ON SearchJobs(status, created_at);
+"""
+
+class JobQueueFullError(Exception):
+    """Hàng đợi job đã đầy."""
+
+def get_dedup_key(query: str, condition: Optional[str] = None) -> str:
+    """Key để gộp các job trùng nhau: từ khóa đã chuẩn hóa và tình trạng sản phẩm."""
+    return f"search:{normalize_text(query)}:{condition}"
+
+class JobQueue:
+    """
+    Hàng đợi job tìm kiếm lưu trong SQLite. Mỗi thao tác mở một kết nối riêng nên dùng được
+    từ nhiều thread và nhiều process; việc nhận job dùng BEGIN IMMEDIATE để hai worker
+    không nhận trùng một job.
+    """
+    def __init__(self, db_path: str = JOBS_DB_PATH, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.db_path = db_path
+        self.queue_limit = queue_limit
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        self._ensure_schema()
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction ghi (khóa ghi ngay từ đầu để các bước đọc-rồi-ghi không bị chen ngang)."""
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+            finally:
+                connection.close()
+            self._initialized = True
+
+    def enqueue(self, query: str, condition: Optional[str] = None) -> Tuple[str, str, bool]:
+        """
+        Thêm job tìm kiếm, trả về (job_id, trạng thái, deduplicated).
+        Nếu đã có job cùng từ khóa đang chờ/đang chạy thì trả về job đó thay vì tạo job mới.
+        """
+        dedup_key = get_dedup_key(query, condition)
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id, status FROM SearchJobs WHERE dedup_key = ? AND status IN (?, ?)",
+                (dedup_key, STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchone()
+            if row:
+                return row["id"], row["status"], True
+
+            queued = connection.execute(
+                "SELECT COUNT(*) FROM SearchJobs WHERE status = ?", (STATUS_QUEUED,)
+            ).fetchone()[0]
+            if queued >= self.queue_limit:
+                raise JobQueueFullError(f"Hàng đợi tìm kiếm đã đầy ({self.queue_limit} job)")
+
+            job_id = uuid.uuid4().hex
+            connection.execute("""
+                INSERT INTO SearchJobs (id, dedup_key, query, condition, status, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (job_id, dedup_key, query, condition, STATUS_QUEUED, time.time()))
+            return job_id, STATUS_QUEUED, False
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Nhận job chờ lâu nhất và chuyển sang trạng thái running (None nếu hàng đợi trống)."""
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id, query, condition FROM SearchJobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (STATUS_QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute("""
+                UPDATE SearchJobs SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1
+                WHERE id = ?
+            """, (STATUS_RUNNING, worker, time.time(), row["id"]))
+            return dict(row)
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any], changed_ids: List[int]) -> bool:
+        """
+        Ghi kết quả của job do worker đang giữ. Trả về False nếu job không còn thuộc worker này
+        (đã bị trả về hàng đợi hoặc đánh dấu failed vì quá hạn), khi đó kết quả bị bỏ qua.
+        """
+        with self._transaction() as connection:
+            return connection.execute("""
+                UPDATE SearchJobs SET status = ?, result = ?, changed_ids = ?, finished_at = ?
+                WHERE id = ? AND status = ? AND worker = ?
+            """, (STATUS_DONE, json.dumps(result, ensure_ascii=False, default=str),
+                  json.dumps(changed_ids), time.time(), job_id, STATUS_RUNNING, worker)).rowcount > 0
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        """Đánh dấu job do worker đang giữ là failed (False nếu job không còn thuộc worker này)."""
+        with self._transaction() as connection:
+            return connection.execute("""
+                UPDATE SearchJobs SET status = ?, error = ?, finished_at = ?
+                WHERE id = ? AND status = ? AND worker = ?
+            """, (STATUS_FAILED, error, time.time(), job_id, STATUS_RUNNING, worker)).rowcount > 0
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Trạng thái của job (không kèm kết quả); job đang chờ có thêm vị trí trong hàng đợi."""
+        with self._connect() as connection:
+            row = connection.execute("""
+                SELECT id, query, condition, status, attempts, error, created_at, started_at, finished_at,
+                       json_extract(result, '$.total') AS total
+                FROM SearchJobs WHERE id = ?
+            """, (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == STATUS_QUEUED:
+                job["position"] = connection.execute(
+                    "SELECT COUNT(*) FROM SearchJobs WHERE status = ? AND created_at < ?",
+                    (STATUS_QUEUED, job["created_at"])
+                ).fetchone()[0] + 1
+            return job
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Kết quả tìm kiếm của job đã xong (None nếu job chưa xong hoặc không tồn tại)."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT result FROM SearchJobs WHERE id = ? AND status = ?", (job_id, STATUS_DONE)
+            ).fetchone()
+        return json.loads(row["result"]) if row and row["result"] else None
+
+    def requeue_running(self, worker: Optional[str] = None, older_than: Optional[float] = None) -> int:
+        """
+        Trả các job running của worker đã chết (hoặc chạy quá older_than giây) về hàng đợi;
+        job đã thử JOB_MAX_ATTEMPTS lần bị đánh dấu failed. Trả về số job được xử lý.
+        """
+        conditions, params = ["status = ?"], [STATUS_RUNNING]
+        if worker is not None:
+            conditions.append("worker = ?")
+            params.append(worker)
+        if older_than is not None:
+            conditions.append("started_at < ?")
+            params.append(time.time() - older_than)
+        where = " AND ".join(conditions)
+        with self._transaction() as connection:
+            failed = connection.execute(f"""
+                UPDATE SearchJobs SET status = ?, error = ?, finished_at = ?
+                WHERE {where} AND attempts >= ?
+            """, (STATUS_FAILED, "Worker dừng hoặc quá thời gian xử lý", time.time(), *params, JOB_MAX_ATTEMPTS)).rowcount
+            requeued = connection.execute(
+                f"UPDATE SearchJobs SET status = ?, worker = NULL, started_at = NULL WHERE {where}",
+                (STATUS_QUEUED, *params)
+            ).rowcount
+        return failed + requeued
+
+    def get_running_workers(self) -> List[str]:
+        """Các worker đang giữ job running."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT worker FROM SearchJobs WHERE status = ? AND worker IS NOT NULL", (STATUS_RUNNING,)
+            ).fetchall()
+        return [row["worker"] for row in rows]
+
+    def take_unnotified(self) -> List[int]:
+        """Lấy id sản phẩm thay đổi bởi các job mới xong và đánh dấu đã thông báo."""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, changed_ids FROM SearchJobs WHERE status = ? AND notified = 0", (STATUS_DONE,)
+            ).fetchall()
+            if not rows:
+                return []
+            connection.executemany("UPDATE SearchJobs SET notified = 1 WHERE id = ?", [(row["id"],) for row in rows])
+        product_ids = []
+        for row in rows:
+            product_ids.extend(json.loads(row["changed_ids"] or "[]"))
+        return product_ids
+
+    def purge(self, max_age: float = JOB_RESULT_TTL) -> int:
+        """Xóa các job đã xong/thất bại cũ hơn max_age giây."""
+        with self._transaction() as connection:
+            return connection.execute("""
+                DELETE FROM SearchJobs
+                WHERE finished_at < ? AND (status = ? OR (status = ? AND notified = 1))
+            """, (time.time() - max_age, STATUS_FAILED, STATUS_DONE)).rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._connect() as connection:
+            counts = dict(connection.execute(
+                "SELECT status, COUNT(*) FROM SearchJobs GROUP BY status"
+            ).fetchall())
+            timing = connection.execute("""
+                SELECT AVG(started_at - created_at), AVG(finished_at - started_at)
+                FROM SearchJobs WHERE status = ?
+            """, (STATUS_DONE,)).fetchone()
+        return {
+            **{status: counts.get(status, 0) for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)},
+            "avg_wait_ms": round((timing[0] or 0) * 1000, 1),
+            "avg_run_ms": round((timing[1] or 0) * 1000, 1)
+        }
+
+def _worker_main(db_path: str, worker: str, parent_pid: int):
+    """Vòng lặp của một process worker: nhận job, chạy search_product, ghi kết quả."""
+    # Giới hạn pool Chrome của worker trước khi import các module crawl (pool đọc CHROME_POOL_SIZE khi import)
+    os.environ["CHROME_POOL_SIZE"] = str(JOB_WORKER_CHROME_POOL_SIZE)
+    # Import trong process con để process cha không phải khởi tạo lại các module crawl
+    from Database.db import register_data_change_listener
+    from Services.search import search_product
+
+    queue = JobQueue(db_path)
+    changed_ids = []
+
+    def collect_changes(event, product_ids):
+        if event == "save":
+            changed_ids.extend(product_ids)
+
+    register_data_change_listener(collect_changes)
+    logger.info(f"Worker {worker} (pid {os.getpid()}) bắt đầu nhận job")
+
+    while os.getppid() == parent_pid:
+        try:
+            job = queue.claim(worker)
+        except sqlite3.Error as e:
+            logger.error(f"Worker {worker} không đọc được hàng đợi: {str(e)}")
+            job = None
+        if job is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+
+        changed_ids.clear()
+        logger.info(f"Worker {worker} chạy job {job['id']}: '{job['query']}'")
+        try:
+            result = search_product(job["query"], job["condition"])
+            saved = queue.complete(job["id"], worker, result, list(dict.fromkeys(changed_ids)))
+        except Exception as e:
+            logger.error(f"Lỗi khi chạy job {job['id']}: {str(e)}")
+            saved = queue.fail(job["id"], worker, str(e))
+        if not saved:
+            logger.warning(f"Job {job['id']} không còn thuộc worker {worker} (quá hạn), bỏ qua kết quả")
+    logger.info(f"Worker {worker} dừng vì process cha đã thoát")
+
+class JobWorkerPool:
+    """
+    Các process worker chạy job tìm kiếm tách khỏi process web (crawl nặng không chiếm thread
+    của server). Một thread giám sát trong process cha khởi động lại worker bị chết, trả job treo
+    về hàng đợi và thông báo cho cache/index của process cha các sản phẩm mà worker đã lưu.
+    """
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS):
+        self.queue = queue
+        self.workers = workers
+        # Tên worker gồm host và pid của process cha: nhiều pool (server web, python -m Services.jobs)
+        # dùng chung một hàng đợi không nhận nhầm job của nhau
+        self.pool_id = f"{socket.gethostname()}:{os.getpid()}"
+        # Dùng spawn: process cha có nhiều thread (event loop HTTP, pool DB) nên fork không an toàn
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._monitor = None
+        self._stop = threading.Event()
+        self.stats = {"restarts": 0, "requeued": 0, "purged": 0, "notified_products": 0}
+
+    def start(self):
+        """Khởi động các process worker và thread giám sát (gọi một lần khi khởi động server)."""
+        if self._monitor is not None:
+            return
+        self._stop.clear()
+        # Job running của pool đã thoát trên cùng máy không còn worker nào xử lý;
+        # job của pool trên máy khác được trả về hàng đợi khi quá JOB_TIMEOUT
+        for worker in self.queue.get_running_workers():
+            if self._is_orphaned(worker):
+                self.stats["requeued"] += self.queue.requeue_running(worker=worker)
+        for i in range(self.workers):
+            self._start_worker(f"{self.pool_id}:worker-{i}")
+        self._monitor = threading.Thread(target=self._monitor_loop, name="job-monitor", daemon=True)
+        self._monitor.start()
+        atexit.register(self.stop)
+        logger.info(f"Đã khởi động {self.workers} process worker cho hàng đợi tìm kiếm")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(timeout)
+        self._processes.clear()
+        self._monitor = None
+
+    def _is_orphaned(self, worker: str) -> bool:
+        """Worker thuộc một pool trên máy này mà process cha đã thoát."""
+        try:
+            host, pid, _ = worker.rsplit(":", 2)
+            pid = int(pid)
+        except ValueError:
+            return False
+        if host != socket.gethostname():
+            return False
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def _start_worker(self, name: str):
+        process = self._context.Process(
+            target=_worker_main, args=(self.queue.db_path, name, os.getpid()), name=f"job-{name}"
+        )
+        process.start()
+        self._processes[name] = process
+
+    def _monitor_loop(self):
+        while not self._stop.wait(JOB_MONITOR_INTERVAL):
+            try:
+                self._check_workers()
+                self.stats["requeued"] += self.queue.requeue_running(older_than=JOB_TIMEOUT)
+                product_ids = self.queue.take_unnotified()
+                if product_ids:
+                    # Worker lưu sản phẩm trong process khác nên cache và index ở đây cần được báo lại
+                    from Database.db import notify_data_changed
+                    notify_data_changed("save", product_ids)
+                    self.stats["notified_products"] += len(product_ids)
+                self.stats["purged"] += self.queue.purge()
+            except Exception as e:
+                logger.error(f"Lỗi khi giám sát hàng đợi job: {str(e)}")
+
+    def _check_workers(self):
+        for name, process in list(self._processes.items()):
+            if process.is_alive() or self._stop.is_set():
+                continue
+            logger.warning(f"Worker {name} đã dừng (exit code {process.exitcode}), khởi động lại")
+            self.stats["requeued"] += self.queue.requeue_running(worker=name)
+            self.stats["restarts"] += 1
+            self._start_worker(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "alive_workers": sum(1 for process in self._processes.values() if process.is_alive()),
+            "running": self._monitor is not None and not self._stop.is_set()
+        }
+
+job_queue = JobQueue()
+job_workers = JobWorkerPool(job_queue)
+
+def get_job_stats() -> Dict[str, Any]:
+    """Thông số hàng đợi và pool worker cho /api/metrics."""
+    try:
+        queue_stats = job_queue.get_stats()
+    except sqlite3.Error as e:
+        logger.warning(f"Không đọc được thông số hàng đợi job: {str(e)}")
+        queue_stats = {}
+    return {"queue": queue_stats, "workers": job_workers.get_stats()}
+
+if __name__ == "__main__":
+    # Chạy riêng các worker (không kèm server web): python -m Services.jobs trong thư mục Backend
+    job_workers.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        job_workers.stop()
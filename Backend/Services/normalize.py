@@ -0,0 +1,125 @@
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, List
+from unidecode import unidecode
+
+# Số chuỗi đã chuẩn hóa được nhớ lại (tên sản phẩm/từ khóa lặp lại rất nhiều giữa các lượt)
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "65536"))
+# Chuỗi dài hơn ngưỡng này không được đưa vào cache để cache không giữ các đoạn text lớn
+NORMALIZE_CACHE_MAX_LENGTH = 512
+
+# Bảng bỏ dấu tiếng Việt cho str.translate (chữ thường, dạng dựng sẵn NFC)
+_VIETNAMESE_CHARS = {
+    'a': 'àáảãạăằắẳẵặâầấẩẫậ',
+    'd': 'đ',
+    'e': 'èéẻẽẹêềếểễệ',
+    'i': 'ìíỉĩị',
+    'o': 'òóỏõọôồốổỗộơờớởỡợ',
+    'u': 'ùúủũụưừứửữự',
+    'y': 'ỳýỷỹỵ',
+}
+VIETNAMESE_TRANSLATION = str.maketrans({
+    char: latin for latin, chars in _VIETNAMESE_CHARS.items() for char in chars
+})
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+_DISPLAY_SPECIAL_RE = re.compile(r'[^\w\s\u0080-\u024F-]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _to_ascii_lower(text: str) -> str:
+    """Chữ thường, bỏ dấu: dùng bảng translate, chỉ gọi unidecode khi còn ký tự ngoài bảng."""
+    text = text.lower().translate(VIETNAMESE_TRANSLATION)
+    if not text.isascii():
+        text = unidecode(text)
+    return text
+
+def _normalize_uncached(text: str) -> str:
+    return _NON_ALNUM_RE.sub(' ', _to_ascii_lower(text)).strip()
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize_uncached)
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hóa text để so sánh: chữ thường, bỏ dấu, chỉ giữ chữ/số và một khoảng trắng giữa các từ."""
+    if not text:
+        return ""
+    if len(text) > NORMALIZE_CACHE_MAX_LENGTH:
+        return _normalize_uncached(text)
+    return _normalize_cached(text)
+
+def normalize_many(texts: Iterable[str]) -> List[str]:
+    """Chuẩn hóa cả danh sách trong một lượt (các chuỗi trùng nhau chỉ được xử lý một lần)."""
+    seen = {}
+    result = []
+    for text in texts:
+        normalized = seen.get(text)
+        if normalized is None:
+            normalized = seen[text] = normalize_text(text)
+        result.append(normalized)
+    return result
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def standardize_name(name: str) -> str:
+    """Chuẩn hóa tên sản phẩm để hiển thị: bỏ ký tự đặc biệt, giữ dấu tiếng Việt và chữ hoa."""
+    if not name:
+        return ""
+    # Loại bỏ các ký tự đặc biệt nhưng giữ lại dấu tiếng Việt, sau đó chuẩn hóa khoảng trắng
+    return _WHITESPACE_RE.sub(' ', _DISPLAY_SPECIAL_RE.sub('', name.strip()))
+
+def get_normalize_stats():
+    """Thông số cache của các hàm chuẩn hóa."""
+    info = _normalize_cached.cache_info()
+    display_info = standardize_name.cache_info()
+    return {
+        "normalize_text": {"hits": info.hits, "misses": info.misses, "size": info.currsize},
+        "standardize_name": {"hits": display_info.hits, "misses": display_info.misses, "size": display_info.currsize}
+    }
+
+def _legacy_normalize_text(text: str) -> str:
+    """Cách chuẩn hóa cũ (unidecode + regex không biên dịch), chỉ dùng để so sánh trong benchmark."""
+    text = unidecode(text.lower())
+    text = re.sub(r'[^a-z0-9\s]', ' ', text)
+    return ' '.join(text.split())
+
+def _legacy_standardize_product_name(name: str) -> str:
+    """Cách chuẩn hóa tên cũ trong Crawler/utils.py (60+ lượt str.replace), chỉ dùng cho benchmark."""
+    import unicodedata
+    name = unicodedata.normalize('NFKD', name.lower())
+    for latin, chars in _VIETNAMESE_CHARS.items():
+        for char in chars:
+            name = name.replace(char, latin)
+    name = re.sub(r'[^\w\s-]', '', name)
+    return ' '.join(name.split())
+
+def run_benchmark(rounds: int = 20):
+    """So sánh tốc độ các hàm chuẩn hóa cũ và mới trên một danh sách tên giống kết quả crawl."""
+    import timeit
+
+    base_names = [
+        "Điện thoại iPhone 15 Pro Max 256GB - Chính hãng VN/A",
+        "Laptop ASUS Vivobook 15 X1504ZA i3 1215U/8GB/512GB/Win11",
+        "Máy giặt Samsung Inverter 9 kg WW90T3040WW/SV",
+        "Tủ lạnh Panasonic Inverter 255 lít NR-TV261APSV",
+        "Tai nghe Bluetooth True Wireless Sony WF-1000XM5",
+        "Nồi cơm điện tử Sharp 1.8 lít KS-COM186EV-GY",
+    ]
+    # Kết quả crawl thực tế lặp lại rất nhiều tên giữa các lượt tìm kiếm
+    names = [f"{name} ({i % 50})" for i, name in enumerate(base_names * 200)]
+
+    def timed(label, func):
+        seconds = timeit.timeit(func, number=rounds) / rounds
+        print(f"{label:<45}{seconds * 1000:>10.2f} ms / {len(names)} tên")
+        return seconds
+
+    assert all(normalize_text(name) == _legacy_normalize_text(name) for name in names)
+
+    legacy = timed("normalize_text cũ (unidecode + re.sub)", lambda: [_legacy_normalize_text(n) for n in names])
+    _normalize_cached.cache_clear()
+    cold = timed("normalize_text mới, chưa có cache", lambda: (_normalize_cached.cache_clear(), normalize_many(names)))
+    warm = timed("normalize_many mới, cache đã nóng", lambda: normalize_many(names))
+    timed("standardize_product_name cũ (str.replace)", lambda: [_legacy_standardize_product_name(n) for n in names])
+    timed("standardize_name mới", lambda: [standardize_name(n) for n in names])
+    print(f"Tăng tốc normalize_text: {legacy / cold:.1f}x (chưa cache), {legacy / warm:.1f}x (cache nóng)")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,78 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional, Tuple
+from Database.db import PRICE_SQL_TYPE
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Các kiểu sắp xếp hỗ trợ phân trang theo cursor: tên -> (cột, chiều sắp xếp, kiểu SQL của cột)
+# id luôn được dùng làm khóa phụ để thứ tự là duy nhất
+KEYSET_SORTS = {
+    "last_updated": ("p.last_updated", "DESC", "DATETIME"),
+    "price_asc": ("p.price", "ASC", PRICE_SQL_TYPE),
+    "price_desc": ("p.price", "DESC", PRICE_SQL_TYPE),
+}
+DEFAULT_KEYSET_SORT = "last_updated"
+
+class InvalidCursorError(ValueError):
+    """Cursor phân trang không hợp lệ hoặc không khớp với cách sắp xếp."""
+
+def get_keyset_sort(sort: Optional[str]) -> str:
+    """Chuyển tham số sort của API sang tên kiểu sắp xếp keyset."""
+    return sort if sort in KEYSET_SORTS else DEFAULT_KEYSET_SORT
+
+def encode_cursor(sort: str, row: Dict[str, Any]) -> str:
+    """Tạo cursor (chuỗi base64) từ dòng cuối cùng của trang hiện tại."""
+    column = KEYSET_SORTS[sort][0].split('.')[-1]
+    key = row.get(column)
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    elif isinstance(key, (Decimal, float, int)):
+        key = str(key)
+    payload = json.dumps({"s": sort, "k": key, "id": row["id"]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Giải mã cursor, trả về (giá trị khóa sắp xếp, id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload["s"] != sort:
+            raise InvalidCursorError("Cursor không khớp với cách sắp xếp hiện tại")
+        key = payload["k"]
+        if key is not None:
+            if sort == "last_updated":
+                key = datetime.fromisoformat(key)
+            else:
+                key = Decimal(key)
+        return key, int(payload["id"])
+    except InvalidCursorError:
+        raise
+    except (ValueError, KeyError, TypeError, InvalidOperation) as e:
+        raise InvalidCursorError(f"Cursor không hợp lệ: {str(e)}")
+
+def build_seek_condition(sort: str, key: Any, last_id: int) -> Tuple[str, list]:
+    """
+    Điều kiện WHERE để lấy các dòng nằm sau (key, id) theo thứ tự sắp xếp,
+    thay cho OFFSET (không phải đọc lại các trang trước).
+    """
+    column, direction, sql_type = KEYSET_SORTS[sort]
+    # Ép tham số về đúng kiểu của cột để phép so sánh bằng không lệch do làm tròn DATETIME
+    value = f"CAST(? AS {sql_type})"
+    # SQL Server xếp NULL trước khi tăng dần và sau cùng khi giảm dần
+    if direction == 'ASC':
+        if key is None:
+            return f" AND (({column} IS NULL AND p.id > ?) OR {column} IS NOT NULL)", [last_id]
+        return f" AND ({column} > {value} OR ({column} = {value} AND p.id > ?))", [key, key, last_id]
+    if key is None:
+        return f" AND {column} IS NULL AND p.id < ?", [last_id]
+    return f" AND ({column} < {value} OR ({column} = {value} AND p.id < ?) OR {column} IS NULL)", [key, key, last_id]
+
+def build_keyset_order(sort: str) -> str:
+    column, direction, _ = KEYSET_SORTS[sort]
+    return f" ORDER BY {column} {direction}, p.id {direction}"
@@ -0,0 +1,399 @@
+import atexit
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from Database.db import get_db_cursor, save_products, notify_data_changed, update_product_prices
+from Services.normalize import normalize_text, standardize_name
+from Services.crawl_cache import crawl_cache
+from Services.search import STORE_CRAWLERS, run_crawler
+from Crawler.product_refresh import refresh_prices, supports_link_refresh
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Làm mới giá ở nền khi khởi động server (crawl lại các trang thật), mặc định tắt, đặt REFRESH_ENABLED=1 để bật
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "0") == "1"
+# Chu kỳ nạp thêm sản phẩm cũ vào hàng đợi (giây)
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", "300"))
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "3"))
+# Số sản phẩm cũ tối đa được nạp mỗi lượt
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "500"))
+# Sản phẩm được coi là cũ sau bao nhiêu giờ (sản phẩm yêu thích được làm mới sớm hơn)
+REFRESH_STALE_HOURS = 24
+REFRESH_FAVORITE_STALE_HOURS = 6
+# Sản phẩm không tìm thấy trong lượt crawl sẽ không được thử lại trong khoảng này (giây)
+REFRESH_RETRY_AFTER = 6 * 3600
+# Khoảng cách tối thiểu giữa hai lượt crawl làm mới của cùng cửa hàng (giây)
+REFRESH_STORE_INTERVAL = float(os.getenv("REFRESH_STORE_INTERVAL", "10"))
+REFRESH_STORE_INTERVALS = {
+    3: 5.0,  # Chợ Tốt dùng API JSON, nhẹ hơn các trang cần trình duyệt
+}
+# Số sản phẩm trong một lô làm mới theo link (các link trong lô được tải đồng thời)
+REFRESH_LINK_BATCH_SIZE = int(os.getenv("REFRESH_LINK_BATCH_SIZE", "100"))
+# Số từ đầu của tên sản phẩm dùng làm từ khóa crawl khi không khớp từ khóa phổ biến nào
+REFRESH_QUERY_WORDS = 4
+# Từ khóa phổ biến được lấy từ SearchHistory trong số ngày gần nhất
+POPULAR_QUERY_DAYS = 7
+POPULAR_QUERY_LIMIT = 100
+# Trọng số khi tính độ ưu tiên
+FAVORITE_WEIGHT = 2.0
+POPULARITY_WEIGHT = 1.0
+GROUP_SIZE_WEIGHT = 0.1
+# Số id tối đa trong một câu UPDATE ... WHERE id IN (...) (SQL Server giới hạn 2100 tham số)
+TOUCH_BATCH_SIZE = 500
+
+class RefreshGroup:
+    """
+    Một đơn vị làm mới của một cửa hàng: query=None là lô làm mới theo link đã lưu,
+    ngược lại là các sản phẩm được làm mới bằng một lượt crawl cùng từ khóa.
+    products: product_id -> (link, từ khóa tìm kiếm dự phòng).
+    """
+    __slots__ = ("store_id", "query", "products", "priority")
+
+    def __init__(self, store_id: int, query: Optional[str] = None):
+        self.store_id = store_id
+        self.query = query
+        self.products: Dict[int, tuple] = {}
+        self.priority = 0.0
+
+class RefreshScheduler:
+    """
+    Làm mới giá sản phẩm ở nền.
+    Định kỳ nạp các sản phẩm cũ: cửa hàng hỗ trợ làm mới theo link được gom thành lô tải đồng thời
+    trang/API chi tiết của từng sản phẩm; sản phẩm còn lại (hoặc lấy giá theo link thất bại) được gom
+    theo (cửa hàng, từ khóa) để một lượt crawl làm mới nhiều dòng. Các nhóm nằm trong hàng đợi ưu tiên
+    theo độ cũ, số lượt tìm kiếm và yêu thích.
+    Nhiều worker chạy song song nhưng mỗi cửa hàng chỉ có một lượt crawl tại một thời điểm
+    và cách nhau tối thiểu REFRESH_STORE_INTERVAL(S) giây.
+    """
+    def __init__(self, workers: int = REFRESH_WORKERS, interval: int = REFRESH_INTERVAL,
+                 store_intervals: bool = True):
+        self.workers = workers
+        self.interval = interval
+        # False: không chờ khoảng giãn cách giữa hai lượt crawl của cùng cửa hàng (run_once)
+        self.store_intervals = store_intervals
+        self._crawlers = {store_id: (crawler_func, name) for crawler_func, name, store_id, _ in STORE_CRAWLERS}
+        self._condition = threading.Condition()
+        # Mỗi cửa hàng một heap (-độ ưu tiên, thứ tự, nhóm)
+        self._queues: Dict[int, list] = {store_id: [] for store_id in self._crawlers}
+        self._busy_stores = set()
+        self._next_allowed: Dict[int, float] = {}
+        self._pending_ids = set()
+        self._attempted: Dict[int, float] = {}
+        self._sequence = itertools.count()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # Thời điểm và số sản phẩm của các lượt làm mới trong 60 giây gần nhất
+        self._recent = deque()
+        self.stats = {
+            "loads": 0,
+            "crawls": 0,
+            "link_batches": 0,
+            "refreshed": 0,
+            "refreshed_by_link": 0,
+            "refreshed_by_search": 0,
+            "link_fallbacks": 0,
+            "not_found": 0,
+            "errors": 0
+        }
+
+    def start(self):
+        """Chạy thread nạp hàng đợi và các worker (gọi một lần khi khởi động server)."""
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads.append(threading.Thread(target=self._load_loop, name="refresh-loader", daemon=True))
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._worker_loop, name=f"refresh-worker-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.stop)
+        logger.info(f"Đã khởi động lịch làm mới giá với {self.workers} worker")
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def run_once(self) -> int:
+        """
+        Nạp sản phẩm cũ và làm mới ngay trong thread hiện tại, trả về số sản phẩm đã làm mới.
+        Chạy trên một scheduler riêng (hàng đợi và cửa hàng đang bận riêng) để không lấy việc của
+        các worker nền, bỏ qua sản phẩm đang nằm trong hàng đợi nền và không chờ khoảng giãn cách.
+        """
+        scheduler = RefreshScheduler(workers=0, interval=self.interval, store_intervals=False)
+        with self._condition:
+            # Sản phẩm đã nằm trong hàng đợi nền sẽ do worker nền làm mới
+            scheduler._pending_ids = set(self._pending_ids)
+        scheduler.load_stale_products()
+        refreshed = 0
+        while True:
+            group = scheduler._next_group(return_when_empty=True)
+            if group is None:
+                break
+            refreshed += scheduler._process(group)
+        with self._condition:
+            for key in ("crawls", "link_batches", "refreshed", "refreshed_by_link", "refreshed_by_search",
+                        "link_fallbacks", "not_found", "errors"):
+                self.stats[key] += scheduler.stats[key]
+        return refreshed
+
+    def load_stale_products(self) -> int:
+        """Đọc các sản phẩm cũ từ database, gom nhóm và đưa vào hàng đợi. Trả về số nhóm mới."""
+        try:
+            with get_db_cursor() as cursor:
+                candidates = self._fetch_candidates(cursor)
+                popular_queries = self._fetch_popular_queries(cursor) if candidates else []
+        except Exception as e:
+            logger.error(f"Lỗi khi đọc sản phẩm cần làm mới: {str(e)}")
+            with self._condition:
+                self.stats["errors"] += 1
+            return 0
+
+        now = time.monotonic()
+        search_groups: Dict[tuple, RefreshGroup] = {}
+        link_batches: Dict[int, List[RefreshGroup]] = {}
+        with self._condition:
+            self.stats["loads"] += 1
+            # Bỏ các mốc thử lại đã hết hạn
+            self._attempted = {pid: t for pid, t in self._attempted.items() if now - t < REFRESH_RETRY_AFTER}
+            for product_id, name, name_normalized, store_id, link, age_minutes, is_favorite in candidates:
+                if store_id not in self._crawlers or product_id in self._pending_ids or product_id in self._attempted:
+                    continue
+                normalized_name = name_normalized or normalize_text(name)
+                query, popularity = self._pick_query(name, normalized_name, popular_queries)
+                if supports_link_refresh(store_id):
+                    # Các ứng viên đã được sắp theo độ ưu tiên nên lô đầu tiên là lô cần làm mới nhất
+                    batches = link_batches.setdefault(store_id, [])
+                    if not batches or len(batches[-1].products) >= REFRESH_LINK_BATCH_SIZE:
+                        batches.append(RefreshGroup(store_id))
+                    group = batches[-1]
+                else:
+                    group = self._search_group(search_groups, store_id, query)
+                group.products[product_id] = (link, query)
+                group.priority = max(group.priority, self._priority(age_minutes, is_favorite, popularity))
+                self._pending_ids.add(product_id)
+
+            groups = list(search_groups.values()) + [g for batches in link_batches.values() for g in batches]
+            self._enqueue(groups)
+
+        if groups:
+            logger.info(f"Đã xếp {sum(len(g.products) for g in groups)} sản phẩm cũ vào {len(groups)} nhóm làm mới")
+        return len(groups)
+
+    def _search_group(self, groups: Dict[tuple, RefreshGroup], store_id: int, query: str) -> RefreshGroup:
+        key = (store_id, normalize_text(query))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = RefreshGroup(store_id, query)
+        return group
+
+    def _enqueue(self, groups: List[RefreshGroup]):
+        """Đưa các nhóm vào hàng đợi của cửa hàng (gọi khi đang giữ self._condition)."""
+        for group in groups:
+            group.priority += GROUP_SIZE_WEIGHT * len(group.products)
+            heapq.heappush(self._queues[group.store_id], (-group.priority, next(self._sequence), group))
+        self._condition.notify_all()
+
+    def _fetch_candidates(self, cursor):
+        cursor.execute("""
+            SELECT TOP (?) p.id, p.name, p.name_normalized, p.store_id, p.link,
+                   DATEDIFF(minute, p.last_updated, GETDATE()) AS age_minutes,
+                   CASE WHEN fav.product_id IS NOT NULL THEN 1 ELSE 0 END AS is_favorite
+            FROM Products p
+            LEFT JOIN (SELECT DISTINCT product_id FROM Favorites) fav ON fav.product_id = p.id
+            WHERE p.link IS NOT NULL
+              AND (p.last_updated IS NULL
+                   OR p.last_updated < DATEADD(hour, -?, GETDATE())
+                   OR (fav.product_id IS NOT NULL AND p.last_updated < DATEADD(hour, -?, GETDATE())))
+            ORDER BY is_favorite DESC, p.last_updated ASC
+        """, (REFRESH_BATCH_SIZE, REFRESH_STALE_HOURS, REFRESH_FAVORITE_STALE_HOURS))
+        return cursor.fetchall()
+
+    def _fetch_popular_queries(self, cursor):
+        """Các từ khóa được tìm nhiều gần đây: [(từ khóa, tập từ đã chuẩn hóa, số lượt)]."""
+        cursor.execute("""
+            SELECT TOP (?) query, COUNT(*) AS searches
+            FROM SearchHistory
+            WHERE searched_at >= DATEADD(day, -?, GETDATE())
+            GROUP BY query
+            ORDER BY searches DESC
+        """, (POPULAR_QUERY_LIMIT, POPULAR_QUERY_DAYS))
+        popular = []
+        for query, searches in cursor.fetchall():
+            terms = set(normalize_text(query).split())
+            if terms:
+                popular.append((query, terms, searches))
+        return popular
+
+    def _pick_query(self, name, normalized_name, popular_queries):
+        """
+        Chọn từ khóa crawl cho sản phẩm: từ khóa phổ biến nhất mà tên sản phẩm chứa đủ các từ
+        (nhiều sản phẩm dùng chung một lượt crawl), nếu không có thì lấy các từ đầu của tên.
+        Trả về (từ khóa, số lượt tìm kiếm).
+        """
+        name_terms = set(normalized_name.split())
+        for query, terms, searches in popular_queries:
+            if terms <= name_terms:
+                return query, searches
+        return ' '.join(standardize_name(name).split()[:REFRESH_QUERY_WORDS]), 0
+
+    def _priority(self, age_minutes, is_favorite, popularity):
+        staleness = (age_minutes / 60.0 / REFRESH_STALE_HOURS) if age_minutes is not None else 10.0
+        return staleness + FAVORITE_WEIGHT * is_favorite + POPULARITY_WEIGHT * math.log1p(popularity)
+
+    def _next_group(self, return_when_empty: bool = False) -> Optional[RefreshGroup]:
+        """
+        Lấy nhóm có độ ưu tiên cao nhất trong các cửa hàng đang được phép crawl, chờ nếu các cửa hàng
+        còn việc đều đang bận hoặc chưa hết khoảng giãn cách. Trả về None khi scheduler dừng
+        (hoặc khi hàng đợi rỗng nếu return_when_empty).
+        """
+        with self._condition:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                best_store = None
+                wait = None
+                for store_id, queue in self._queues.items():
+                    if not queue or store_id in self._busy_stores:
+                        continue
+                    allowed_at = self._next_allowed.get(store_id, 0.0) if self.store_intervals else 0.0
+                    if allowed_at > now:
+                        wait = allowed_at - now if wait is None else min(wait, allowed_at - now)
+                        continue
+                    if best_store is None or queue[0] < self._queues[best_store][0]:
+                        best_store = store_id
+
+                if best_store is not None:
+                    _, _, group = heapq.heappop(self._queues[best_store])
+                    self._busy_stores.add(best_store)
+                    return group
+
+                if return_when_empty and not any(self._queues.values()):
+                    return None
+                # Chờ nhóm mới, cửa hàng đang bận crawl xong hoặc hết khoảng giãn cách
+                self._condition.wait(wait if wait is not None else 1.0)
+            return None
+
+    def _process(self, group: RefreshGroup) -> int:
+        """Làm mới một nhóm (theo link hoặc bằng tìm kiếm lại), trả về số sản phẩm đã cập nhật."""
+        matched_ids: List[int] = []
+        fallback_groups: List[RefreshGroup] = []
+        try:
+            if group.query is None:
+                matched_ids, fallback_groups = self._refresh_by_link(group)
+            else:
+                matched_ids = self._refresh_by_search(group)
+        except Exception as e:
+            logger.error(f"Lỗi khi làm mới nhóm '{group.query or 'link'}' của cửa hàng {group.store_id}: {str(e)}")
+            with self._condition:
+                self.stats["errors"] += 1
+        finally:
+            self._finish(group, matched_ids, fallback_groups)
+        return len(matched_ids)
+
+    def _refresh_by_link(self, group: RefreshGroup):
+        """
+        Lấy giá của cả lô qua link đã lưu (tải đồng thời), cập nhật theo lô.
+        Sản phẩm không lấy được giá được gom lại theo từ khóa để làm mới bằng tìm kiếm.
+        """
+        prices = refresh_prices(
+            (product_id, group.store_id, link) for product_id, (link, _) in group.products.items()
+        )
+        found = {product_id: price for product_id, price in prices.items() if price}
+        if found:
+            update_product_prices(found)
+
+        fallback: Dict[tuple, RefreshGroup] = {}
+        for product_id, (link, query) in group.products.items():
+            if product_id not in found and query:
+                fallback_group = self._search_group(fallback, group.store_id, query)
+                fallback_group.products[product_id] = (link, query)
+                fallback_group.priority = group.priority
+        logger.info(f"Làm mới theo link cửa hàng {group.store_id}: {len(found)}/{len(group.products)} sản phẩm, "
+                    f"{len(group.products) - len(found)} chuyển sang tìm kiếm lại")
+        return list(found), list(fallback.values())
+
+    def _refresh_by_search(self, group: RefreshGroup) -> List[int]:
+        """Crawl lại một nhóm, lưu kết quả và đánh dấu các sản phẩm tìm thấy là vừa cập nhật."""
+        crawler_func, source_name = self._crawlers[group.store_id]
+        results = run_crawler(crawler_func, group.query, source_name, group.store_id)
+        if not results:
+            return []
+        crawl_cache.put(group.store_id, group.query, results)
+        save_products(results, group.query, record_history=False)
+        found_links = {product.get('link') for product in results}
+        matched_ids = [pid for pid, (link, _) in group.products.items() if link in found_links]
+        if matched_ids:
+            self._touch(matched_ids)
+            logger.info(f"Đã làm mới {len(matched_ids)}/{len(group.products)} sản phẩm của {source_name} "
+                        f"qua từ khóa: {group.query}")
+        return matched_ids
+
+    def _touch(self, product_ids: List[int]):
+        """Cập nhật last_updated của các sản phẩm đã được kiểm tra lại (kể cả khi giá không đổi)."""
+        with get_db_cursor() as cursor:
+            for i in range(0, len(product_ids), TOUCH_BATCH_SIZE):
+                batch = product_ids[i:i + TOUCH_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                cursor.execute(f"UPDATE Products SET last_updated = GETDATE() WHERE id IN ({placeholders})", batch)
+        notify_data_changed("save", product_ids)
+
+    def _finish(self, group: RefreshGroup, matched_ids: List[int], fallback_groups: List[RefreshGroup]):
+        now = time.monotonic()
+        matched = set(matched_ids)
+        requeued = {product_id for fallback in fallback_groups for product_id in fallback.products}
+        by_link = group.query is None
+        with self._condition:
+            self._busy_stores.discard(group.store_id)
+            interval = REFRESH_STORE_INTERVALS.get(group.store_id, REFRESH_STORE_INTERVAL)
+            self._next_allowed[group.store_id] = now + interval
+            for product_id in group.products:
+                if product_id in requeued:
+                    continue
+                self._pending_ids.discard(product_id)
+                if product_id not in matched:
+                    self._attempted[product_id] = now
+            self.stats["link_batches" if by_link else "crawls"] += 1
+            self.stats["refreshed"] += len(matched)
+            self.stats["refreshed_by_link" if by_link else "refreshed_by_search"] += len(matched)
+            self.stats["link_fallbacks"] += len(requeued)
+            self.stats["not_found"] += len(group.products) - len(matched) - len(requeued)
+            if matched:
+                self._recent.append((now, len(matched)))
+            self._enqueue(fallback_groups)
+
+    def _load_loop(self):
+        while not self._stop.is_set():
+            self.load_stale_products()
+            self._stop.wait(self.interval)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            group = self._next_group()
+            if group is not None:
+                self._process(group)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._condition:
+            while self._recent and now - self._recent[0][0] > 60:
+                self._recent.popleft()
+            return {
+                **self.stats,
+                "refreshed_per_minute": sum(count for _, count in self._recent),
+                "queued_groups": sum(len(queue) for queue in self._queues.values()),
+                "queued_products": len(self._pending_ids),
+                "busy_stores": sorted(self._busy_stores),
+                "cooldown_products": len(self._attempted),
+                "running": bool(self._threads) and not self._stop.is_set(),
+                "workers": self.workers
+            }
+
+refresh_scheduler = RefreshScheduler()
@@ -1,77 +1,123 @@
 import threading
 import logging
 import re
+import time
 import unicodedata
-from Database.db import init_db, save_products, get_db_cursor
-from Crawler.dienmayxanh import crawl_dienmayxanh
-from Crawler.thegioididong import crawl_thegioididong
-from Crawler.chotot import crawl_chotot
-import requests
-from bs4 import BeautifulSoup
+from Database.db import init_db, save_products, get_db_cursor, is_fulltext_available
+from Services.normalize import normalize_text
+from Services.classifier import category_classifier
+from Services.crawl_cache import crawl_cache, STALE
+from Crawler.stores import STORES, get_store_config
+from Crawler.engine import get_store_tiers
+from Crawler.utils import crawl_deadline, crawl_deadline_passed
 from typing import List, Dict, Any
 import concurrent.futures
-from urllib.parse import urljoin
+from collections import OrderedDict
+from functools import partial
 from datetime import datetime
-from unidecode import unidecode
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Định nghĩa từ khóa cho các danh mục sản phẩm
-required_keywords = {
-    1: {  # Điện thoại
-        "keywords": ["dien thoai", "smartphone", "iphone", "samsung", "xiaomi", "oppo", "vivo", "realme", "nokia", "huawei"],
-        "name": "Điện thoại"
-    },
-    2: {  # Laptop
-        "keywords": ["laptop", "macbook", "dell", "hp", "asus", "lenovo", "acer", "msi", "lg gram"],
-        "name": "Laptop"
-    },
-    3: {  # Máy tính bảng
-        "keywords": ["may tinh bang", "tablet", "ipad", "samsung tab", "xiaomi pad", "huawei matepad"],
-        "name": "Máy tính bảng"
-    },
-    4: {  # Tai nghe
-        "keywords": ["tai nghe", "headphone", "earphone", "airpods", "sony", "bluetooth", "true wireless"],
-        "name": "Tai nghe"
-    },
-    5: {  # Tivi
-        "keywords": ["tivi", "tv", "smart tv", "samsung tv", "lg tv", "tcl", "sony tv"],
-        "name": "Tivi"
-    },
-    6: {  # Máy hút bụi
-        "keywords": ["may hut bui", "máy hút bụi", "vacuum", "robot hút bụi", "máy lau nhà", "dyson", "electrolux"],
-        "name": "Máy hút bụi"
-    },
-    7: {  # Máy giặt
-        "keywords": ["may giat", "máy giặt", "washing machine", "lg", "samsung", "electrolux", "panasonic"],
-        "name": "Máy giặt"
-    },
-    8: {  # Tủ lạnh
-        "keywords": ["tu lanh", "tủ lạnh", "refrigerator", "side by side", "mini", "inverter"],
-        "name": "Tủ lạnh"
-    },
-    9: {  # Điều hòa
-        "keywords": ["dieu hoa", "điều hòa", "máy lạnh", "air conditioner", "inverter"],
-        "name": "Điều hòa"
-    },
-    10: {  # Nồi cơm điện
-        "keywords": ["noi com dien", "nồi cơm điện", "rice cooker", "toshiba", "sharp", "cuckoo"],
-        "name": "Nồi cơm điện"
-    },
-    11: {  # Khác
-        "keywords": [],
-        "name": "Khác"
-    }
-}
-
 # Định nghĩa danh mục sản phẩm cho từng store - cho phép crawl tất cả
 store_categories = {
     1: set(range(1, 12)),  # Điện Máy Xanh - tất cả danh mục từ 1-11
     2: set(range(1, 12)),  # Thế Giới Di Động - tất cả danh mục từ 1-11
     3: set(range(1, 12)),  # Chợ Tốt - tất cả danh mục từ 1-11
+    4: set(range(1, 12)),  # Nguyễn Kim - tất cả danh mục từ 1-11
+}
+
+# Số kết quả tối đa trả về trong một lần tìm kiếm trong database
+DB_SEARCH_MAX_RESULTS = 200
+
+# Các cột được phép export và biểu thức SQL tương ứng
+EXPORT_FIELDS = {
+    "id": "p.id",
+    "name": "p.name",
+    "name_normalized": "p.name_normalized",
+    "price": "p.price",
+    "store_id": "p.store_id",
+    "store_name": "s.name",
+    "category_id": "p.category_id",
+    "rating": "p.rating",
+    "link": "p.link",
+    "image_url": "p.image_url",
+    "last_updated": "p.last_updated",
 }
+# Số dòng đọc từ database mỗi lần khi export
+EXPORT_BATCH_SIZE = 1000
+
+# Thời gian tối đa (giây) cho toàn bộ lượt tìm kiếm (thời hạn từng cửa hàng nằm trong Crawler/stores.py)
+SEARCH_TIMEOUT = 60
+
+# Số lượt crawl gần nhất được ghi nhận tầng phục vụ
+TIER_HISTORY_SIZE = 500
+
+class CrawlTierTracker:
+    """Ghi nhận tầng crawl (http, browser, ...) đã phục vụ mỗi từ khóa của từng cửa hàng."""
+    def __init__(self, history_size=TIER_HISTORY_SIZE):
+        self.history_size = history_size
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def record(self, store_id, query, tier):
+        key = (store_id, normalize_text(query))
+        with self._lock:
+            self._recent[key] = tier
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.history_size:
+                self._recent.popitem(last=False)
+            store_stats = self.stats.setdefault(store_id, {})
+            store_stats[tier] = store_stats.get(tier, 0) + 1
+
+    def get_tier(self, store_id, query):
+        with self._lock:
+            return self._recent.get((store_id, normalize_text(query)))
+
+    def get_stats(self):
+        with self._lock:
+            return {store_id: dict(tiers) for store_id, tiers in self.stats.items()}
+
+crawl_tiers = CrawlTierTracker()
+
+def crawl_tiered(query, store_id, tiers):
+    """
+    Thử lần lượt các tầng crawl của một cửa hàng, tầng nhẹ (HTTP) trước, trình duyệt sau,
+    cho đến khi có kết quả. Tầng đã phục vụ được ghi nhận vào crawl_tiers.
+    Dừng khi lượt crawl hết thời hạn (xem run_crawler), không thử tiếp các tầng còn lại.
+    """
+    for tier_name, crawl_func in tiers:
+        if crawl_deadline_passed():
+            logger.warning(f"Cửa hàng {store_id} hết thời hạn crawl trước tầng {tier_name}")
+            return []
+        try:
+            results = crawl_func(query) or []
+        except Exception as e:
+            logger.warning(f"Tầng {tier_name} của cửa hàng {store_id} lỗi: {str(e)}")
+            results = []
+        if results:
+            crawl_tiers.record(store_id, query, tier_name)
+            return results
+        logger.info(f"Tầng {tier_name} của cửa hàng {store_id} không có kết quả, chuyển sang tầng tiếp theo")
+    crawl_tiers.record(store_id, query, "none")
+    return []
+
+# Crawler của từng cửa hàng: (hàm crawl, tên cửa hàng, store_id, thời hạn riêng)
+# Sinh từ cấu hình trong Crawler/stores.py: các tầng được thử theo thứ tự khai báo
+# (ví dụ trang tĩnh bằng HTTP trước, chỉ mở Chrome khi trang tĩnh không có sản phẩm)
+STORE_CRAWLERS = [
+    (partial(crawl_tiered, store_id=store.store_id, tiers=get_store_tiers(store)),
+     store.name, store.store_id, store.timeout)
+    for store in STORES if store.enabled
+]
+
+# Thread pool dùng chung cho các crawler, dư chỗ cho các crawler quá hạn chưa kịp dừng
+_crawler_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=len(STORE_CRAWLERS) * 2,
+    thread_name_prefix="store-crawler"
+)
 
 class ResultCollector:
     def __init__(self):
@@ -83,16 +129,8 @@ class ResultCollector:
             self.results.extend(results)
 
     def get_results(self):
-        return self.results
-
-def normalize_text(text: str) -> str:
-    """Chuẩn hóa text để so sánh"""
-    # Chuyển về chữ thường và bỏ dấu
-    text = unidecode(text.lower())
-    # Loại bỏ ký tự đặc biệt
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    # Chuẩn hóa khoảng trắng
-    return ' '.join(text.split())
+        with self.lock:
+            return list(self.results)
 
 def text_contains(text: str, keywords: str) -> bool:
     """Kiểm tra xem text có chứa keywords hay không."""
@@ -102,235 +140,199 @@ def text_contains(text: str, keywords: str) -> bool:
     keywords = normalize_text(keywords)
     return all(keyword in text for keyword in keywords.split())
 
-def crawl_dienmayanh(query: str) -> List[Dict[str, Any]]:
-    """Crawl dữ liệu từ Điện Máy Xanh."""
-    try:
-        url = f"https://www.dienmayxanh.com/tim-kiem?key={query}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-        }
-        
-        # Thêm timeout để tránh treo
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        products = []
-        
-        # Thử các selector khác nhau
-        items = (
-            soup.select('.product-item') or
-            soup.select('.product-list .item') or
-            soup.select('.listproduct .item')
-        )
-        
-        if not items:
-            logger.warning(f"Không tìm thấy sản phẩm nào trên Điện Máy Xanh với query: {query}")
-            return []
-            
-        for item in items:
-            try:
-                name = item.select_one('.product-name, h3')
-                price = item.select_one('.product-price, .price')
-                link = item.select_one('a')
-                img = item.select_one('img')
-                
-                if name and price and link:
-                    price_text = price.text.strip().replace('.', '').replace('₫', '').replace('đ', '')
-                    price_value = int(re.sub(r'[^\d]', '', price_text))
-                    
-                    product = {
-                        'name': name.text.strip(),
-                        'price': price_value,
-                        'store_id': 1,  # ID của Điện Máy Xanh
-                        'link': urljoin('https://www.dienmayxanh.com', link['href']),
-                        'image_url': img['src'] if img and 'src' in img.attrs else None,
-                        'condition': 'new',  # Sản phẩm từ DMX luôn là mới
-                        'category_id': get_product_category(name.text.strip()) or 'Chưa phân loại',
-                        'rating': None  # Chưa có đánh giá
-                    }
-                    products.append(product)
-            except Exception as e:
-                logger.error(f"Lỗi khi xử lý sản phẩm từ Điện Máy Xanh: {str(e)}")
-                continue
-                
-        return products
-    except requests.Timeout:
-        logger.error("Timeout khi crawl Điện Máy Xanh")
-        return []
-    except requests.RequestException as e:
-        logger.error(f"Lỗi kết nối khi crawl Điện Máy Xanh: {str(e)}")
-        return []
-    except Exception as e:
-        logger.error(f"Lỗi không xác định khi crawl Điện Máy Xanh: {str(e)}")
-        return []
+def run_crawler(crawler_func, product_name, source_name, store_id, timeout=None, deadline=None, started_at=None):
+    """
+    Chạy crawler của một cửa hàng và chuẩn hóa kết quả trả về.
+    timeout (mặc định là thời hạn của cửa hàng) tính từ lúc crawler thực sự bắt đầu chạy, không tính
+    thời gian chờ trong thread pool; deadline (time.monotonic()) là mốc muộn nhất nếu có.
+    Thời hạn được áp dụng bên trong các tầng crawl để lượt crawl quá hạn dừng lại và trả thread.
+    started_at (dict) nhận thời điểm bắt đầu chạy theo store_id.
+    """
+    logger.debug(f"Khởi chạy crawler {source_name} với từ khóa: {product_name}")
+    start = time.monotonic()
+    if started_at is not None:
+        started_at[store_id] = start
+    store = get_store_config(store_id)
+    if timeout is None and store is not None:
+        timeout = store.timeout
+    if timeout is not None:
+        deadline = min(start + timeout, deadline) if deadline is not None else start + timeout
+    with crawl_deadline(deadline):
+        results = crawler_func(product_name) or []
 
-def crawl_tgdd(query: str) -> List[Dict[str, Any]]:
-    """Crawl dữ liệu từ Thế Giới Di Động."""
-    try:
-        url = f"https://www.thegioididong.com/tim-kiem?key={query}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-        }
-        
-        # Thêm timeout để tránh treo
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        products = []
-        
-        # Thử các selector khác nhau
-        items = (
-            soup.select('.item') or
-            soup.select('.product-item') or
-            soup.select('.product__item')
-        )
-        
-        if not items:
-            logger.warning(f"Không tìm thấy sản phẩm nào trên TGDĐ với query: {query}")
-            return []
-            
-        for item in items:
-            try:
-                name = item.select_one('h3, .product-name')
-                price = item.select_one('.price, .product-price')
-                link = item.select_one('a')
-                img = item.select_one('img')
-                
-                if name and price and link:
-                    price_text = price.text.strip().replace('.', '').replace('₫', '').replace('đ', '')
-                    price_value = int(re.sub(r'[^\d]', '', price_text))
-                    
-                    product = {
-                        'name': name.text.strip(),
-                        'price': price_value,
-                        'store_id': 2,  # ID của Thế Giới Di Động
-                        'link': urljoin('https://www.thegioididong.com', link['href']),
-                        'image_url': img['src'] if img and 'src' in img.attrs else None,
-                        'condition': 'new',  # Sản phẩm từ TGDD luôn là mới
-                        'category_id': get_product_category(name.text.strip()) or 'Chưa phân loại',
-                        'rating': None  # Chưa có đánh giá
-                    }
-                    products.append(product)
-            except Exception as e:
-                logger.error(f"Lỗi khi xử lý sản phẩm từ TGDĐ: {str(e)}")
-                continue
-                
-        return products
-    except requests.Timeout:
-        logger.error("Timeout khi crawl TGDĐ")
-        return []
-    except requests.RequestException as e:
-        logger.error(f"Lỗi kết nối khi crawl TGDĐ: {str(e)}")
-        return []
-    except Exception as e:
-        logger.error(f"Lỗi không xác định khi crawl TGDĐ: {str(e)}")
-        return []
+    # Lọc kết quả của các nguồn nhiều tin không liên quan (Chợ Tốt) để đảm bảo độ chính xác
+    if store is not None and store.filter_relevance:
+        results = [
+            product for product in results
+            if is_relevant_product(product['name'], product_name)
+        ]
 
-def run_crawler(crawler_func, product_name, source_name, collector):
-    """Chạy crawler và thu thập kết quả."""
-    try:
-        logger.debug(f"Khởi chạy crawler {source_name} với từ khóa: {product_name}")
-        
-        # Gọi hàm crawler tương ứng
-        if source_name == "Điện Máy Xanh":
-            results = crawl_dienmayxanh(product_name)
-        elif source_name == "Thế Giới Di Động":
-            results = crawl_thegioididong(product_name)
-        else:
-            results = crawler_func(product_name)
-        
-        if results:
-            # Thêm store_id vào mỗi sản phẩm
-            for product in results:
-                if source_name == "Điện Máy Xanh":
-                    product['store_id'] = 1
-                elif source_name == "Thế Giới Di Động":
-                    product['store_id'] = 2
-                elif source_name == "Chợ Tốt":
-                    product['store_id'] = 3
-                    
-                # Thêm category_id dựa trên tên sản phẩm
-                product['category_id'] = get_product_category(product['name'])
-            
-            collector.add_results(results)
-            logger.info(f"Crawler {source_name} hoàn thành, thu thập được {len(results)} sản phẩm")
-        else:
-            logger.info(f"Crawler {source_name} không tìm thấy kết quả nào")
-            
-    except Exception as e:
-        logger.error(f"Lỗi khi chạy crawler {source_name}: {str(e)}")
+    # Thêm category_id dựa trên tên sản phẩm (phân loại cả lượt crawl một lần)
+    category_ids = category_classifier.classify_many(product['name'] for product in results)
+    for product, category_id in zip(results, category_ids):
+        product['store_id'] = store_id
+        product['category_id'] = category_id
+
+    if results:
+        logger.info(f"Crawler {source_name} hoàn thành, thu thập được {len(results)} sản phẩm")
+    else:
+        logger.info(f"Crawler {source_name} không tìm thấy kết quả nào")
+    return results
 
 def get_product_category(product_name):
-    """Xác định danh mục sản phẩm dựa trên tên."""
-    if not product_name:
-        return 11  # Trả về ID của danh mục "Khác"
-        
-    normalized_name = normalize_text(product_name)
-    
-    # Kiểm tra từng danh mục
-    for category_id, category_info in required_keywords.items():
-        # Bỏ qua danh mục "Khác"
-        if category_id == 11:
-            continue
-            
-        # Kiểm tra xem tên sản phẩm có chứa bất kỳ từ khóa nào của danh mục
-        if any(keyword.lower() in normalized_name for keyword in category_info["keywords"]):
-            return category_id
-            
-    # Nếu không thuộc danh mục nào, trả về ID của danh mục "Khác"
-    return 11
+    """Xác định danh mục sản phẩm dựa trên tên (11 - "Khác" nếu không khớp danh mục nào)."""
+    return category_classifier.classify(product_name)
 
 def should_crawl_store(store_id, category_id):
     """Luôn cho phép crawl từ mọi store."""
     return True
 
-def search_official_stores(product_name, collector):
-    """Tìm kiếm trên Điện Máy Xanh và Thế Giới Di Động."""
-    logger.info("Bắt đầu tìm kiếm trên các cửa hàng chính thức")
-
-    # Chạy tất cả crawler
-    crawlers = [
-        (crawl_dienmayxanh, "Điện Máy Xanh"),
-        (crawl_thegioididong, "Thế Giới Di Động")
-    ]
-
-    threads = []
-    for crawler_func, source_name in crawlers:
-        thread = threading.Thread(
-            target=run_crawler,
-            args=(crawler_func, product_name, source_name, collector)
-        )
-        threads.append(thread)
-        thread.start()
+def refresh_store_cache(crawler_func, query, source_name, store_id):
+    """Crawl lại một cửa hàng ở nền để làm mới kết quả cache đã cũ."""
+    try:
+        results = run_crawler(crawler_func, query, source_name, store_id)
+        if results:
+            crawl_cache.put(store_id, query, results)
+            save_products(results, query)
+            logger.info(f"Đã làm mới cache crawl {source_name} cho từ khóa: {query}")
+    except Exception as e:
+        logger.error(f"Lỗi khi làm mới cache crawl {source_name}: {str(e)}")
+    finally:
+        crawl_cache.finish_refresh(store_id, query)
+
+def get_cached_store_results(crawler_func, query, source_name, store_id):
+    """
+    Lấy kết quả crawl đã lưu của một cửa hàng.
+    Trả về (kết quả, trạng thái) hoặc None nếu phải crawl; kết quả cũ sẽ được làm mới ở nền.
+    """
+    cached = crawl_cache.get(store_id, query)
+    if cached is None:
+        return None
+    results, freshness, age = cached
+    if freshness == STALE and crawl_cache.start_refresh(store_id, query):
+        _crawler_executor.submit(refresh_store_cache, crawler_func, query, source_name, store_id)
+    logger.info(f"Dùng kết quả crawl đã lưu của {source_name} ({freshness}, {age:.0f}s)")
+    return results, {"status": "cached", "freshness": freshness, "age": round(age, 1), "count": len(results)}
+
+def iter_store_results(query, global_timeout=SEARCH_TIMEOUT, use_cache=True):
+    """
+    Chạy crawler của các cửa hàng song song và trả về kết quả theo thứ tự hoàn thành.
+    Mỗi phần tử là (tên cửa hàng, danh sách sản phẩm, trạng thái). Cửa hàng vượt quá
+    thời hạn riêng (tính từ lúc crawler bắt đầu chạy) hoặc thời hạn chung sẽ bị bỏ qua
+    với trạng thái "timeout".
+    Cửa hàng có kết quả trong cache crawl được trả về ngay với trạng thái "cached".
+    """
+    start = time.monotonic()
+    global_deadline = start + global_timeout
+
+    futures = {}
+    # Thời điểm từng crawler thực sự bắt đầu chạy (có thể phải chờ thread rảnh trong pool)
+    started_at = {}
+
+    def store_deadline(future):
+        _, store_timeout, store_id = futures[future]
+        # Crawler chưa chạy thì thời hạn riêng sớm nhất có thể là bây giờ + thời hạn của cửa hàng
+        store_start = started_at.get(store_id, time.monotonic())
+        return min(store_start + store_timeout, global_deadline)
+
+    cached_stores = []
+    for crawler_func, source_name, store_id, store_timeout in STORE_CRAWLERS:
+        cached = get_cached_store_results(crawler_func, query, source_name, store_id) if use_cache else None
+        if cached is not None:
+            cached_stores.append((source_name, *cached))
+            continue
+        future = _crawler_executor.submit(run_crawler, crawler_func, query, source_name, store_id,
+                                          timeout=store_timeout, deadline=global_deadline, started_at=started_at)
+        futures[future] = (source_name, store_timeout, store_id)
         logger.info(f"Đã khởi chạy crawler cho {source_name}")
 
-    for thread in threads:
-        thread.join()
+    for source_name, results, status in cached_stores:
+        yield source_name, results, {**status, "elapsed": round(time.monotonic() - start, 2)}
 
-def search_chotot(product_name, collector):
-    """Tìm kiếm trên Chợ Tốt."""
+    pending = set(futures)
     try:
-        logger.info("Bắt đầu tìm kiếm trên Chợ Tốt")
-        results = crawl_chotot(product_name)
-        if results:
-            # Thêm store_id và category_id cho mỗi sản phẩm
-            for product in results:
-                product['store_id'] = 3
-                product['category_id'] = get_product_category(product['name'])
-            collector.add_results(results)
-        logger.info(f"Hoàn thành tìm kiếm trên Chợ Tốt, thu được {len(results)} kết quả")
-    except Exception as e:
-        logger.error(f"Lỗi khi tìm kiếm trên Chợ Tốt: {str(e)}")
+        while pending:
+            next_deadline = min(store_deadline(future) for future in pending)
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=max(0, next_deadline - time.monotonic()),
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+            for future in done:
+                pending.discard(future)
+                source_name = futures[future][0]
+                elapsed = round(time.monotonic() - start, 2)
+                try:
+                    results = future.result()
+                    store_id = futures[future][2]
+                    if use_cache and results:
+                        crawl_cache.put(store_id, query, results)
+                    yield source_name, results, {
+                        "status": "ok",
+                        "count": len(results),
+                        "elapsed": elapsed,
+                        "tier": crawl_tiers.get_tier(store_id, query)
+                    }
+                except Exception as e:
+                    logger.error(f"Lỗi khi chạy crawler {source_name}: {str(e)}")
+                    yield source_name, [], {"status": "error", "count": 0, "elapsed": elapsed}
+
+            # Bỏ qua các cửa hàng đã quá hạn
+            now = time.monotonic()
+            for future in [f for f in pending if store_deadline(f) <= now]:
+                pending.discard(future)
+                future.cancel()
+                source_name = futures[future][0]
+                logger.warning(f"Crawler {source_name} vượt quá thời gian cho phép, bỏ qua kết quả")
+                yield source_name, [], {"status": "timeout", "count": 0, "elapsed": round(now - start, 2)}
+    finally:
+        for future in pending:
+            future.cancel()
+
+def query_page_with_facets(cursor, from_where_sql: str, params: list, order_sql: str,
+                           order_params: list, offset: int, limit: int):
+    """
+    Lấy một trang kết quả và các facet (tổng số, giá thấp/cao nhất, số sản phẩm theo cửa hàng)
+    trong cùng một lần gửi lên SQL Server: trang dùng OFFSET/FETCH, facet dùng GROUPING SETS.
+    from_where_sql phải JOIN Stores với alias s và Products với alias p.
+    """
+    sql = f"""
+        SET NOCOUNT ON;
+        SELECT p.*, s.name as store_name
+        {from_where_sql}
+        {order_sql}
+        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY;
+
+        SELECT s.name AS store_name, GROUPING(s.name) AS is_total,
+               COUNT(*) AS product_count, MIN(p.price) AS min_price, MAX(p.price) AS max_price
+        {from_where_sql}
+        GROUP BY GROUPING SETS ((s.name), ());
+    """
+    cursor.execute(sql, params + order_params + [offset, limit] + params)
+
+    columns = [column[0] for column in cursor.description]
+    results = []
+    for row in cursor.fetchall():
+        product = dict(zip(columns, row))
+        # Chuyển đổi decimal sang float cho JSON serialization
+        if product.get('price') is not None:
+            product['price'] = float(product['price'])
+        results.append(product)
+
+    facets = {"total": 0, "min_price": None, "max_price": None, "stores": {}}
+    if cursor.nextset():
+        for store_name, is_total, product_count, min_price, max_price in cursor.fetchall():
+            if is_total:
+                facets["total"] = product_count
+                facets["min_price"] = float(min_price) if min_price is not None else None
+                facets["max_price"] = float(max_price) if max_price is not None else None
+            else:
+                facets["stores"][store_name] = product_count
+    return results, facets
 
-def search_in_database(query: str, min_price: float = None, max_price: float = None, sort_order: str = 'asc'):
+def search_in_database(query: str, min_price: float = None, max_price: float = None, sort_order: str = 'asc',
+                       page: int = 1, page_size: int = DB_SEARCH_MAX_RESULTS):
     """
     Tìm kiếm sản phẩm trong database với khả năng tìm kiếm linh hoạt
     Args:
@@ -338,91 +340,107 @@ def search_in_database(query: str, min_price: float = None, max_price: float = N
         min_price (float, optional): Giá tối thiểu. Defaults to None.
         max_price (float, optional): Giá tối đa. Defaults to None.
         sort_order (str, optional): Thứ tự sắp xếp giá ('asc' hoặc 'desc'). Defaults to 'asc'.
+        page (int): Số trang (bắt đầu từ 1)
+        page_size (int): Số sản phẩm mỗi trang, tối đa DB_SEARCH_MAX_RESULTS (0 = tối đa)
     """
+    page = max(page, 1)
+    page_size = min(page_size, DB_SEARCH_MAX_RESULTS) if page_size > 0 else DB_SEARCH_MAX_RESULTS
     try:
         with get_db_cursor() as cursor:
-            sql = """
-                SELECT p.*, s.name as store_name
-                FROM Products p
-                JOIN Stores s ON p.store_id = s.id
-                WHERE 1=1
-            """
-            params = []
+            normalized_query = normalize_text(query) if query else ""
+            use_fulltext = bool(normalized_query) and is_fulltext_available()
+
+            if use_fulltext:
+                # Full-text index lọc và xếp hạng ngay trong SQL Server
+                from_where_sql = """
+                    FROM CONTAINSTABLE(Products, name_normalized, ?, LANGUAGE 0) ft
+                    JOIN Products p ON p.id = ft.[KEY]
+                    JOIN Stores s ON p.store_id = s.id
+                    WHERE 1=1
+                """
+                params = [build_fulltext_condition(query)]
+            else:
+                from_where_sql = """
+                    FROM Products p
+                    JOIN Stores s ON p.store_id = s.id
+                    WHERE 1=1
+                """
+                params = []
 
             # Thêm điều kiện tìm kiếm theo từ khóa
-            if query:
-                normalized_query = normalize_text(query)
+            if normalized_query and not use_fulltext:
                 search_terms = normalized_query.split()
                 
                 if search_terms:
-                    sql += " AND ("
+                    from_where_sql += " AND ("
                     term_conditions = []
                     
                     for term in search_terms:
                         # Tìm kiếm chính xác
-                        term_conditions.append("LOWER(p.name) LIKE ?")
+                        term_conditions.append("p.name_normalized LIKE ?")
                         params.append(f"%{term}%")
                         
                         # Tìm kiếm với dấu cách
-                        term_conditions.append("LOWER(p.name) LIKE ?")
+                        term_conditions.append("p.name_normalized LIKE ?")
                         params.append(f"% {term} %")
                         
                         # Tìm kiếm đầu từ
-                        term_conditions.append("LOWER(p.name) LIKE ?")
+                        term_conditions.append("p.name_normalized LIKE ?")
                         params.append(f"{term}%")
                         
                         # Tìm kiếm theo từ đồng nghĩa
                         related_terms = get_related_terms(term)
                         for related_term in related_terms:
-                            term_conditions.append("LOWER(p.name) LIKE ?")
-                            params.append(f"%{related_term}%")
+                            term_conditions.append("p.name_normalized LIKE ?")
+                            params.append(f"%{normalize_text(related_term)}%")
                     
-                    sql += " OR ".join(term_conditions) + ")"
+                    from_where_sql += " OR ".join(term_conditions) + ")"
 
             # Thêm điều kiện giá nếu có
             if min_price is not None:
-                sql += " AND p.price >= ?"
+                from_where_sql += " AND p.price >= ?"
                 params.append(min_price)
             if max_price is not None:
-                sql += " AND p.price <= ?"
+                from_where_sql += " AND p.price <= ?"
                 params.append(max_price)
 
             # Sắp xếp kết quả theo độ phù hợp và giá
-            sql += """
-                ORDER BY 
-                    CASE 
-                        WHEN LOWER(p.name) LIKE ? THEN 3  -- Khớp chính xác
-                        WHEN LOWER(p.name) LIKE ? THEN 2  -- Chứa từ khóa ở đầu
-                        ELSE 1                            -- Chứa từ khóa ở bất kỳ đâu
-                    END DESC,
-                    p.price {}
-            """.format('ASC' if sort_order.lower() == 'asc' else 'DESC')
-            
-            # Thêm tham số cho ORDER BY
-            params.extend([f"%{normalized_query}%", f"{normalized_query}%"])
+            price_order = 'ASC' if sort_order.lower() == 'asc' else 'DESC'
+            order_params = []
+            if use_fulltext:
+                order_sql = f"ORDER BY ft.[RANK] DESC, p.price {price_order}, p.id"
+            else:
+                order_sql = """
+                    ORDER BY 
+                        CASE 
+                            WHEN p.name_normalized LIKE ? THEN 3  -- Khớp chính xác
+                            WHEN p.name_normalized LIKE ? THEN 2  -- Chứa từ khóa ở đầu
+                            ELSE 1                            -- Chứa từ khóa ở bất kỳ đâu
+                        END DESC,
+                        p.price {},
+                        p.id
+                """.format(price_order)
+                
+                # Thêm tham số cho ORDER BY
+                order_params = [f"%{normalized_query}%", f"{normalized_query}%"]
 
-            # Thực thi truy vấn
-            cursor.execute(sql, params)
-            
-            # Chuyển kết quả thành list of dict
-            columns = [column[0] for column in cursor.description]
-            results = []
-            
-            for row in cursor.fetchall():
-                product = dict(zip(columns, row))
-                # Chuyển đổi decimal sang float cho JSON serialization
-                if 'price' in product:
-                    product['price'] = float(product['price'])
-                results.append(product)
+            # Lấy trang kết quả và facet trong cùng một lần truy vấn
+            results, facets = query_page_with_facets(
+                cursor, from_where_sql, params, order_sql, order_params,
+                (page - 1) * page_size, page_size
+            )
 
             return {
                 "query": query,
-                "total": len(results),
+                "total": facets["total"],
+                "page": page,
+                "page_size": page_size,
                 "results": results,
                 "filters": {
-                    "min_price": min(p['price'] for p in results) if results else None,
-                    "max_price": max(p['price'] for p in results) if results else None,
-                    "stores": list(set(p['store_name'] for p in results)),
+                    "min_price": facets["min_price"],
+                    "max_price": facets["max_price"],
+                    "stores": list(facets["stores"]),
+                    "store_counts": facets["stores"],
                     "sort_order": sort_order
                 }
             }
@@ -466,6 +484,36 @@ def get_related_terms(term: str) -> list:
     
     return []
 
+def build_fulltext_condition(query: str, match_all: bool = False) -> str:
+    """
+    Tạo điều kiện full-text (CONTAINS/CONTAINSTABLE) từ từ khóa tìm kiếm.
+    Mỗi từ khớp chính xác hoặc theo tiền tố, từ đồng nghĩa được tính với trọng số thấp hơn.
+    Args:
+        query (str): Từ khóa tìm kiếm
+        match_all (bool): True để yêu cầu khớp tất cả các từ (dùng với CONTAINS),
+                          False để xếp hạng theo trọng số (ISABOUT, dùng với CONTAINSTABLE)
+    """
+    term_groups = []
+    for term in normalize_text(query).split():
+        related_terms = dict.fromkeys(
+            normalize_text(related_term) for related_term in get_related_terms(term)
+        )
+        related_terms.pop(term, None)
+        term_groups.append((term, [t for t in related_terms if t]))
+
+    if match_all:
+        return " AND ".join(
+            "(" + " OR ".join([f'"{term}*"'] + [f'"{t}"' for t in related]) + ")"
+            for term, related in term_groups
+        )
+
+    weighted_terms = []
+    for term, related in term_groups:
+        weighted_terms.append(f'"{term}" WEIGHT(1.0)')
+        weighted_terms.append(f'"{term}*" WEIGHT(0.8)')
+        weighted_terms.extend(f'"{t}" WEIGHT(0.5)' for t in related)
+    return f"ISABOUT({', '.join(weighted_terms)})" if weighted_terms else ""
+
 def is_relevant_product(product_name, search_query):
     """Kiểm tra xem sản phẩm có phù hợp với từ khóa tìm kiếm không"""
     normalized_name = normalize_text(product_name)
@@ -488,47 +536,91 @@ def is_relevant_product(product_name, search_query):
     # Nếu có ít nhất 50% số từ khớp, coi là phù hợp
     return len(matching_words) >= len(query_words) * 0.5
 
-def search_product(query):
+def dedupe_products(products):
+    """Loại sản phẩm trùng (cùng cửa hàng và link), giữ bản xuất hiện đầu tiên."""
+    seen = set()
+    unique = []
+    for product in products:
+        key = (product.get('store_id'), product.get('link'))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(product)
+    return unique
+
+def search_product(query, condition=None, parallel=True, global_timeout=SEARCH_TIMEOUT, use_cache=True):
     """
     Tìm kiếm sản phẩm từ các nguồn và lưu vào database
+    Args:
+        query (str): Từ khóa tìm kiếm
+        condition (str, optional): Chỉ giữ sản phẩm có tình trạng tương ứng (vd: 'new')
+        parallel (bool): Crawl các cửa hàng song song (mặc định) hoặc lần lượt
+        global_timeout (float): Thời gian tối đa cho toàn bộ lượt crawl song song (giây)
+        use_cache (bool): Dùng kết quả crawl đã lưu theo từng cửa hàng nếu còn hạn
     """
     try:
-        results = []
-        
-        # Tìm kiếm trên Điện Máy Xanh
-        dmx_results = crawl_dienmayxanh(query)
-        if dmx_results:
-            # Tin tưởng kết quả từ Điện Máy Xanh
-            results.extend(dmx_results)
-            
-        # Tìm kiếm trên Thế Giới Di Động
-        tgdd_results = crawl_thegioididong(query)
-        if tgdd_results:
-            # Tin tưởng kết quả từ Thế Giới Di Động
-            results.extend(tgdd_results)
-            
-        # Tìm kiếm trên Chợ Tốt
-        ct_results = crawl_chotot(query)
-        if ct_results:
-            # Lọc kết quả từ Chợ Tốt để đảm bảo độ chính xác
-            filtered_ct = [
-                product for product in ct_results 
-                if is_relevant_product(product['name'], query)
-            ]
-            results.extend(filtered_ct)
-        
+        collector = ResultCollector()
+        stores = {}
+
+        if parallel:
+            # Gộp kết quả ngay khi từng cửa hàng hoàn thành
+            for source_name, results, status in iter_store_results(query, global_timeout, use_cache):
+                collector.add_results(results)
+                stores[source_name] = status
+        else:
+            for crawler_func, source_name, store_id, _ in STORE_CRAWLERS:
+                try:
+                    cached = get_cached_store_results(crawler_func, query, source_name, store_id) if use_cache else None
+                    if cached is not None:
+                        collector.add_results(cached[0])
+                        stores[source_name] = cached[1]
+                        continue
+                    results = run_crawler(crawler_func, query, source_name, store_id)
+                    if use_cache and results:
+                        crawl_cache.put(store_id, query, results)
+                    collector.add_results(results)
+                except Exception as e:
+                    logger.error(f"Lỗi khi chạy crawler {source_name}: {str(e)}")
+
+        results = dedupe_products(collector.get_results())
+        if condition:
+            results = [p for p in results if p.get('condition', condition) == condition]
+
         # Lưu kết quả vào database
         save_products(results, query)
-        
+
         return {
             "total": len(results),
-            "results": results
+            "results": results,
+            "stores": stores
         }
-        
+
     except Exception as e:
         logger.error(f"Lỗi khi tìm kiếm sản phẩm: {str(e)}")
         return {"total": 0, "results": []}
 
+def search_product_stream(query, condition=None, global_timeout=SEARCH_TIMEOUT, use_cache=True):
+    """
+    Giống search_product nhưng trả về dần từng sự kiện (tên sự kiện, dữ liệu):
+    "store" ngay khi một cửa hàng crawl xong (kèm sản phẩm của cửa hàng đó), sau cùng là
+    "summary" với toàn bộ kết quả đã gộp, loại trùng và lưu vào database.
+    """
+    collector = ResultCollector()
+    stores = {}
+    for source_name, results, status in iter_store_results(query, global_timeout, use_cache):
+        if condition:
+            results = [p for p in results if p.get('condition', condition) == condition]
+        collector.add_results(results)
+        stores[source_name] = status
+        yield "store", {"store": source_name, "status": status, "results": results}
+
+    results = dedupe_products(collector.get_results())
+    try:
+        save_products(results, query)
+    except Exception as e:
+        logger.error(f"Lỗi khi lưu kết quả tìm kiếm '{query}': {str(e)}")
+    yield "summary", {"query": query, "total": len(results), "results": results, "stores": stores}
+
 def load_database_to_web():
     """Tải toàn bộ sản phẩm từ database."""
     try:
@@ -541,6 +633,7 @@ def load_database_to_web():
                         WHEN 1 THEN N'Điện Máy Xanh'
                         WHEN 2 THEN N'Thế Giới Di Động'
                         WHEN 3 THEN N'Chợ Tốt'
+                        WHEN 4 THEN N'Nguyễn Kim'
                         ELSE s.name
                     END as store_name
                 FROM Products p
@@ -569,4 +662,35 @@ def load_database_to_web():
             }
     except Exception as e:
         logger.error(f"Lỗi khi tải dữ liệu từ database: {str(e)}")
-        return {"total": 0, "results": []}
\ No newline at end of file
+        return {"total": 0, "results": []}
+
+def iter_products_export(fields: List[str] = None, since: datetime = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Duyệt toàn bộ sản phẩm theo từng lô (fetchmany) để export mà không giữ cả bảng trong bộ nhớ.
+    Args:
+        fields (list): Các cột cần lấy (trong EXPORT_FIELDS), mặc định lấy tất cả
+        since (datetime): Chỉ lấy sản phẩm có last_updated >= since (export tăng dần)
+        batch_size (int): Số dòng mỗi lần fetchmany
+    """
+    fields = fields or list(EXPORT_FIELDS)
+    select_sql = ", ".join(f"{EXPORT_FIELDS[field]} AS {field}" for field in fields)
+    sql = f"""
+        SELECT {select_sql}
+        FROM Products p
+        JOIN Stores s ON p.store_id = s.id
+    """
+    params = []
+    if since is not None:
+        sql += " WHERE p.last_updated >= ?"
+        params.append(since)
+    # Thứ tự theo last_updated để bên nhận có thể lưu mốc since cho lần export sau
+    sql += " ORDER BY p.last_updated, p.id"
+
+    with get_db_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(fields, row))
@@ -0,0 +1,302 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+from Database.db import get_db_cursor, register_data_change_listener
+from Services.normalize import normalize_text
+
+# Thiết lập logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Bật/tắt index tìm kiếm trong bộ nhớ (SEARCH_INDEX_ENABLED=0 để luôn truy vấn SQL Server)
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "1") == "1"
+# Độ dài tối thiểu của từ khóa để được sửa lỗi chính tả (sai 1 ký tự)
+FUZZY_MIN_TERM_LENGTH = 4
+# Số id tối đa trong mỗi câu truy vấn khi nạp lại các sản phẩm vừa thay đổi
+RELOAD_BATCH_SIZE = 500
+
+# Điểm cho từng kiểu khớp từ khóa
+EXACT_MATCH_SCORE = 1.5
+PREFIX_MATCH_SCORE = 1.0
+FUZZY_MATCH_SCORE = 0.5
+
+PRODUCT_SELECT_SQL = """
+    SELECT p.*, s.name as store_name
+    FROM Products p
+    JOIN Stores s ON p.store_id = s.id
+"""
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Kiểm tra hai từ có khác nhau tối đa 1 ký tự (thêm, xóa, thay thế hoặc đảo 2 ký tự kề nhau)."""
+    if a == b:
+        return True
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > 1:
+        return False
+    if len_a == len_b:
+        diffs = [i for i in range(len_a) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len_a > len_b:
+        a, b = b, a
+    # a ngắn hơn b đúng 1 ký tự: bỏ ký tự khác biệt đầu tiên của b
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+def _deletes(token: str) -> List[str]:
+    """Các biến thể của từ khi xóa đi 1 ký tự (dùng để tra cứu từ gần đúng)."""
+    return [token[:i] + token[i + 1:] for i in range(len(token))]
+
+class ProductSearchIndex:
+    """
+    Inverted index của bảng Products trong bộ nhớ.
+    - Posting list: từ đã chuẩn hóa -> array các slot (tăng dần) của sản phẩm chứa từ đó
+    - Cột giá, cửa hàng, id lưu bằng array để lọc nhanh
+    - Từ vựng sắp xếp để tra tiền tố bằng bisect, bảng "xóa 1 ký tự" để sửa lỗi chính tả
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self.stats = {
+            "loads": 0,
+            "last_load_ms": 0.0,
+            "upserts": 0,
+            "queries": 0,
+            "query_time": 0.0
+        }
+        self._reset()
+
+    def _reset(self):
+        self._rows: List[Dict[str, Any]] = []
+        self._ids = array('q')
+        self._prices = array('d')
+        self._store_ids = array('i')
+        self._tokens: List[tuple] = []
+        self._slot_by_id: Dict[int, int] = {}
+        self._postings: Dict[str, array] = {}
+        self._vocabulary: List[str] = []
+        self._delete_map: Dict[str, set] = {}
+
+    def load(self) -> bool:
+        """Nạp toàn bộ Products từ database và xây dựng lại index."""
+        started = time.monotonic()
+        try:
+            with get_db_cursor() as cursor:
+                cursor.execute(PRODUCT_SELECT_SQL + " ORDER BY p.id")
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Lỗi khi nạp index tìm kiếm: {str(e)}")
+            return False
+
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(row)
+            self._vocabulary = sorted(self._postings)
+            self.ready = True
+            elapsed = time.monotonic() - started
+            self.stats["loads"] += 1
+            self.stats["last_load_ms"] = round(elapsed * 1000, 3)
+        logger.info(f"Đã nạp index tìm kiếm: {len(rows)} sản phẩm, {len(self._vocabulary)} từ ({elapsed:.2f}s)")
+        return True
+
+    def refresh_products(self, product_ids: List[int]):
+        """Nạp lại các sản phẩm vừa được thêm/cập nhật và cập nhật index."""
+        if not self.ready or not product_ids:
+            return
+        rows = []
+        try:
+            with get_db_cursor() as cursor:
+                for i in range(0, len(product_ids), RELOAD_BATCH_SIZE):
+                    batch = product_ids[i:i + RELOAD_BATCH_SIZE]
+                    placeholders = ','.join('?' * len(batch))
+                    cursor.execute(PRODUCT_SELECT_SQL + f" WHERE p.id IN ({placeholders})", batch)
+                    columns = [column[0] for column in cursor.description]
+                    rows.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+        except Exception as e:
+            logger.error(f"Lỗi khi cập nhật index tìm kiếm: {str(e)}")
+            return
+
+        with self._lock:
+            for row in rows:
+                self._upsert(row)
+            self.stats["upserts"] += len(rows)
+
+    def on_data_changed(self, event: str, product_ids: List[int]):
+        """Listener đăng ký với Database.db: cập nhật index khi Products thay đổi."""
+        if event == "save":
+            self.refresh_products(product_ids)
+        elif event == "clear" and self.ready:
+            self.load()
+
+    def _prepare(self, row: Dict[str, Any]) -> tuple:
+        row['price'] = float(row['price']) if row.get('price') is not None else 0.0
+        name = row.get('name_normalized') or normalize_text(row.get('name') or '')
+        return tuple(dict.fromkeys(name.split()))
+
+    def _add(self, row: Dict[str, Any]) -> List[str]:
+        """Thêm sản phẩm vào cuối index, trả về các từ mới xuất hiện lần đầu."""
+        tokens = self._prepare(row)
+        new_tokens = []
+        slot = len(self._rows)
+        self._rows.append(row)
+        self._ids.append(int(row['id']))
+        self._prices.append(row['price'])
+        self._store_ids.append(int(row['store_id']))
+        self._tokens.append(tokens)
+        self._slot_by_id[int(row['id'])] = slot
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = array('i')
+                new_tokens.append(token)
+                for variant in _deletes(token):
+                    self._delete_map.setdefault(variant, set()).add(token)
+            # Slot mới luôn lớn nhất nên posting list vẫn giữ thứ tự tăng dần
+            posting.append(slot)
+        return new_tokens
+
+    def _upsert(self, row: Dict[str, Any]):
+        slot = self._slot_by_id.get(int(row['id']))
+        if slot is None:
+            for token in self._add(row):
+                bisect.insort(self._vocabulary, token)
+            return
+
+        tokens = self._prepare(row)
+        if tokens != self._tokens[slot]:
+            # Tên thay đổi (hiếm): gỡ slot khỏi posting list cũ rồi thêm vào posting list mới
+            for token in self._tokens[slot]:
+                posting = self._postings.get(token)
+                if posting is not None and slot in posting:
+                    posting.remove(slot)
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    posting = self._postings[token] = array('i')
+                    bisect.insort(self._vocabulary, token)
+                    for variant in _deletes(token):
+                        self._delete_map.setdefault(variant, set()).add(token)
+                posting.insert(bisect.bisect_left(posting, slot), slot)
+            self._tokens[slot] = tokens
+        self._rows[slot] = row
+        self._prices[slot] = row['price']
+        self._store_ids[slot] = int(row['store_id'])
+
+    def _expand_term(self, term: str) -> Dict[str, float]:
+        """Tìm các từ trong từ vựng khớp với từ khóa: chính xác, theo tiền tố hoặc sai 1 ký tự."""
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_MATCH_SCORE
+
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, PREFIX_MATCH_SCORE)
+
+        if len(term) >= FUZZY_MIN_TERM_LENGTH:
+            candidates = set(self._delete_map.get(term, ()))
+            for variant in _deletes(term) + [term]:
+                if variant in self._postings:
+                    candidates.add(variant)
+                candidates.update(self._delete_map.get(variant, ()))
+            for token in candidates:
+                if token not in matches and _within_one_edit(term, token):
+                    matches[token] = FUZZY_MATCH_SCORE
+        return matches
+
+    def search(self, query: Optional[str], min_price: float = None, max_price: float = None,
+               match_all: bool = False, sort: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Tìm kiếm sản phẩm trong index.
+        Args:
+            query (str): Từ khóa tìm kiếm (rỗng để lấy tất cả sản phẩm)
+            min_price, max_price (float): Khoảng giá
+            match_all (bool): True nếu sản phẩm phải khớp tất cả các từ khóa
+            sort (str): price_asc, price_desc, name; mặc định theo độ phù hợp rồi giá tăng dần
+        """
+        started = time.monotonic()
+        search_terms = [term for term in normalize_text(query or '').split() if len(term) > 1]
+
+        with self._lock:
+            if search_terms:
+                scores: Dict[int, float] = {}
+                matched_terms: Dict[int, int] = {}
+                for term in search_terms:
+                    term_scores: Dict[int, float] = {}
+                    for token, score in self._expand_term(term).items():
+                        for slot in self._postings[token]:
+                            if score > term_scores.get(slot, 0):
+                                term_scores[slot] = score
+                    for slot, score in term_scores.items():
+                        scores[slot] = scores.get(slot, 0) + score
+                        matched_terms[slot] = matched_terms.get(slot, 0) + 1
+                if match_all:
+                    slots = [slot for slot, count in matched_terms.items() if count == len(search_terms)]
+                else:
+                    slots = list(scores)
+            else:
+                scores = {}
+                slots = range(len(self._rows))
+
+            prices = self._prices
+            results = []
+            for slot in slots:
+                price = prices[slot]
+                if min_price is not None and price < min_price:
+                    continue
+                if max_price is not None and price > max_price:
+                    continue
+                score = scores.get(slot, 0)
+                # Ưu tiên TGDĐ/ĐMX và tên ngắn gọn, giống cách chấm điểm của search_local_products
+                if self._store_ids[slot] in (1, 2):
+                    score += 0.5
+                if len(self._tokens[slot]) <= 5:
+                    score += 0.5
+                results.append((score, slot))
+
+            if sort == "price_asc":
+                results.sort(key=lambda item: prices[item[1]])
+            elif sort == "price_desc":
+                results.sort(key=lambda item: -prices[item[1]])
+            elif sort == "name":
+                results.sort(key=lambda item: self._rows[item[1]].get('name') or '')
+            else:
+                results.sort(key=lambda item: (-item[0], prices[item[1]]))
+            products = [dict(self._rows[slot]) for _, slot in results]
+
+            elapsed = time.monotonic() - started
+            self.stats["queries"] += 1
+            self.stats["query_time"] += elapsed
+        return products
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queries = self.stats["queries"]
+            return {
+                **self.stats,
+                "query_time": round(self.stats["query_time"], 3),
+                "avg_query_ms": round(self.stats["query_time"] / queries * 1000, 3) if queries else 0.0,
+                "ready": self.ready,
+                "products": len(self._rows),
+                "tokens": len(self._postings)
+            }
+
+# Index dùng chung cho toàn ứng dụng
+product_index = ProductSearchIndex()
+if SEARCH_INDEX_ENABLED:
+    register_data_change_listener(product_index.on_data_changed)
+
+def is_index_ready() -> bool:
+    """Index đã được bật và nạp xong chưa."""
+    return SEARCH_INDEX_ENABLED and product_index.ready
@@ -1,29 +1,49 @@
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, HTMLResponse, FileResponse
+from fastapi.responses import Response, HTMLResponse, FileResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from Services.search import search_product, search_in_database, load_database_to_web
+from Services.search import (
+    search_product, search_in_database, load_database_to_web,
+    query_page_with_facets, DB_SEARCH_MAX_RESULTS, crawl_tiers, iter_products_export, EXPORT_FIELDS, EXPORT_BATCH_SIZE,
+    search_product_stream
+)
 from Services.filter import filter_products, filter_products_by_price, search_local_products, compare_products
 from Services.update_service import check_and_update_products
-from Database.db import init_db, get_db_cursor, clear_history
+from Services.refresh_scheduler import refresh_scheduler, REFRESH_ENABLED
+from Services.jobs import job_queue, job_workers, get_job_stats, JobQueueFullError, JOBS_ENABLED, STATUS_DONE, STATUS_FAILED
+from Database.db import init_db, get_db_cursor, clear_history, get_pool_stats, notify_data_changed
+from Crawler.utils import ChromeDriverPool
+from Crawler.async_http import get_async_client
+from Crawler.parsing import parse_pool
+from Services.executor import run_db, run_crawl, crawl_executor, get_executor_stats, ExecutorQueueFullError
+from Services.search_index import product_index, is_index_ready, SEARCH_INDEX_ENABLED
+from Services.cache import query_cache, search_cache, get_search_cache_key, get_cache_stats
+from Services.crawl_cache import crawl_cache
+from Services.normalize import normalize_text, get_normalize_stats
+from Services.pagination import (
+    get_keyset_sort, encode_cursor, decode_cursor, build_seek_condition,
+    build_keyset_order, InvalidCursorError
+)
 from pydantic import BaseModel, Field
+import asyncio
 import logging
 import os
 from typing import List, Optional, Dict, Any
 import json
 from json import JSONDecodeError
 from math import ceil
-from functools import lru_cache
-from datetime import datetime, timedelta
+from datetime import datetime
+from decimal import Decimal
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Constants for pagination and caching
+# Constants for pagination
 MAX_PAGE_SIZE = 50
 DEFAULT_PAGE_SIZE = 10
-CACHE_TIMEOUT = 300  # 5 minutes in seconds
+# Khoảng gửi comment giữ kết nối khi stream tìm kiếm chưa có sự kiện mới (giây)
+SSE_KEEPALIVE_SECONDS = 15
 
 class PaginationParams(BaseModel):
     page: int = Field(default=1, ge=1, description="Page number (starts from 1)")
@@ -51,37 +71,6 @@ class PaginationParams(BaseModel):
             "next_page": current_page + 1 if current_page < total_pages else None
         }
 
-class CachedResponse:
-    def __init__(self, data: dict):
-        self.data = data
-        self.timestamp = datetime.now()
-
-    def is_valid(self) -> bool:
-        return (datetime.now() - self.timestamp).total_seconds() < CACHE_TIMEOUT
-
-# Cache for pagination results
-pagination_cache: Dict[str, CachedResponse] = {}
-
-def get_cache_key(product_name: str, pagination: PaginationParams, sort: Optional[str], min_price: Optional[float], max_price: Optional[float]) -> str:
-    return f"{product_name}:{pagination.page}:{pagination.page_size}:{sort}:{min_price}:{max_price}"
-
-def get_cached_response(cache_key: str) -> Optional[dict]:
-    if cache_key in pagination_cache:
-        cached = pagination_cache[cache_key]
-        if cached.is_valid():
-            return cached.data
-        del pagination_cache[cache_key]
-    return None
-
-def set_cached_response(cache_key: str, response: dict):
-    pagination_cache[cache_key] = CachedResponse(response)
-    # Cleanup old cache entries
-    current_time = datetime.now()
-    expired_keys = [k for k, v in pagination_cache.items() 
-                   if (current_time - v.timestamp).total_seconds() >= CACHE_TIMEOUT]
-    for k in expired_keys:
-        del pagination_cache[k]
-
 app = FastAPI()
 
 # Cấu hình CORS
@@ -101,6 +90,15 @@ app.mount("/js", StaticFiles(directory="Frontend/JS"), name="js")
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    if SEARCH_INDEX_ENABLED:
+        # Nạp index tìm kiếm trong bộ nhớ (nếu lỗi sẽ tiếp tục dùng truy vấn SQL)
+        await run_db(product_index.load)
+    if REFRESH_ENABLED:
+        # Làm mới giá các sản phẩm cũ ở nền
+        refresh_scheduler.start()
+    if JOBS_ENABLED:
+        # Các process worker chạy job tìm kiếm xếp hàng qua /api/search-jobs
+        job_workers.start()
     logger.info("Đã khởi động ứng dụng")
 
 @app.get("/")
@@ -119,6 +117,24 @@ async def favorites_html():
 async def api_root():
     return {"message": "Welcome to Price Comparison API"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Thông số của các pool tài nguyên (kết nối database, Chrome driver, hàng đợi executor)"""
+    return {
+        "db_pool": get_pool_stats(),
+        "chrome_pool": ChromeDriverPool.instance().get_stats(),
+        "executors": get_executor_stats(),
+        "search_index": product_index.get_stats(),
+        "caches": get_cache_stats(),
+        "crawl_cache": crawl_cache.get_stats(),
+        "http_client": get_async_client().get_stats(),
+        "crawl_tiers": crawl_tiers.get_stats(),
+        "normalize": get_normalize_stats(),
+        "html_parsing": parse_pool.get_stats(),
+        "refresh": refresh_scheduler.get_stats(),
+        "jobs": await run_db(get_job_stats)
+    }
+
 @app.post("/api/search")
 async def search(
     product_name: str = Query(..., description="Tên sản phẩm cần tìm"),
@@ -130,14 +146,15 @@ async def search(
     """
     Tìm kiếm sản phẩm từ các nguồn và lưu vào database với phân trang
     """
+    pagination = pagination or PaginationParams()
     try:
         # Chuẩn hóa từ khóa tìm kiếm
         normalized_query = normalize_search_query(product_name)
         logger.info(f"Tìm kiếm với từ khóa chuẩn hóa: {normalized_query}")
 
-        # Tìm kiếm sản phẩm
-        result = search_product(normalized_query)
-        products = result.get("results", [])
+        # Tìm kiếm sản phẩm (các request cùng từ khóa dùng chung một lượt crawl)
+        result = await cached_search(normalized_query)
+        products = list(result.get("results", []))
         
         # Lọc theo khoảng giá nếu có
         if min_price is not None or max_price is not None:
@@ -172,12 +189,14 @@ async def search(
 
         return response
         
+    except ExecutorQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Lỗi khi tìm kiếm: {str(e)}")
         return {
             "total": 0,
-            "page": pagination.page if pagination else 1,
-            "page_size": pagination.page_size if pagination else DEFAULT_PAGE_SIZE,
+            "page": pagination.page,
+            "page_size": pagination.page_size,
             "total_pages": 0,
             "results": [],
             "query": product_name
@@ -191,40 +210,81 @@ def normalize_search_query(query: str) -> str:
     - Thay thế các ký tự đặc biệt bằng khoảng trắng
     - Chuẩn hóa khoảng trắng
     """
-    import re
-    from unidecode import unidecode
+    return normalize_text(query)
 
-    # Chuyển về chữ thường và bỏ dấu
-    normalized = unidecode(query.lower())
-    
-    # Thay thế các ký tự đặc biệt bằng khoảng trắng
-    normalized = re.sub(r'[^a-z0-9\s]', ' ', normalized)
-    
-    # Chuẩn hóa khoảng trắng
-    normalized = ' '.join(normalized.split())
-    
-    return normalized
+async def cached_search(normalized_query: str, condition: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Crawl theo từ khóa đã chuẩn hóa qua search_cache: các request cùng từ khóa (từ mọi endpoint)
+    dùng chung một lượt crawl và một mục cache.
+    """
+    return await search_cache.get_or_compute(
+        get_search_cache_key(normalized_query, condition),
+        lambda: run_crawl(search_product, normalized_query, condition),
+        should_cache=should_cache_search
+    )
+
+def should_cache_search(result: Dict[str, Any]) -> bool:
+    """Chỉ lưu vào search_cache các lượt tìm kiếm có kết quả."""
+    return bool(result.get("results"))
+
+def paginate_local_results(all_products: list, query: str, page: int, page_size: int) -> dict:
+    """Phân trang kết quả tìm kiếm local đã có sẵn trong bộ nhớ và tính facet."""
+    total = len(all_products)
+    start_idx = (page - 1) * page_size
+    current_page_products = all_products[start_idx:start_idx + page_size]
+
+    prices = [p['price'] for p in all_products]
+    store_counts = {}
+    for product in all_products:
+        store_counts[product['store_name']] = store_counts.get(product['store_name'], 0) + 1
+
+    return build_local_response(query, page, page_size, current_page_products, {
+        "total": total,
+        "min_price": min(prices) if prices else None,
+        "max_price": max(prices) if prices else None,
+        "stores": store_counts
+    })
+
+def build_local_response(query: str, page: int, page_size: int, results: list, facets: dict) -> dict:
+    total = facets["total"]
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size if total else 0,
+        "results": results,
+        "query": query,
+        "facets": facets,
+        "truncated": page * page_size < total
+    }
 
 @app.get("/api/search-local")
 async def search_local(
     query: str = Query(..., description="Từ khóa tìm kiếm"),
     page: int = Query(1, description="Số trang"),
-    page_size: int = Query(0, description="Số sản phẩm mỗi trang (0 để lấy tất cả)"),
+    page_size: int = Query(0, description=f"Số sản phẩm mỗi trang (0 để lấy tối đa {DB_SEARCH_MAX_RESULTS})"),
     sort: Optional[str] = Query(None, description="Cách sắp xếp (price_asc, price_desc, name)"),
     min_price: Optional[float] = Query(None, description="Giá tối thiểu"),
     max_price: Optional[float] = Query(None, description="Giá tối đa")
 ):
     """
-    Tìm kiếm sản phẩm trong database local với phân trang
+    Tìm kiếm sản phẩm trong database local với phân trang.
+    Lọc giá, sắp xếp và phân trang được thực hiện trong SQL; mỗi trang tối đa DB_SEARCH_MAX_RESULTS sản phẩm.
     """
+    page = max(page, 1)
+    page_size = min(page_size, DB_SEARCH_MAX_RESULTS) if page_size > 0 else DB_SEARCH_MAX_RESULTS
     try:
         # Chuẩn hóa từ khóa tìm kiếm
         normalized_query = normalize_search_query(query)
         logger.info(f"Tìm kiếm local với từ khóa chuẩn hóa: {normalized_query}")
 
+        if is_index_ready():
+            # Tìm trong index bộ nhớ (có sửa lỗi chính tả và tìm theo tiền tố)
+            all_products = product_index.search(query, min_price, max_price, match_all=True, sort=sort)
+            return paginate_local_results(all_products, query, page, page_size)
+
         # Xây dựng câu truy vấn SQL
-        sql = """
-            SELECT p.*, s.name as store_name
+        from_where_sql = """
             FROM Products p
             JOIN Stores s ON p.store_id = s.id
             WHERE 1=1
@@ -232,10 +292,10 @@ async def search_local(
         params = []
 
         # Thêm điều kiện tìm kiếm
-        sql += """
+        from_where_sql += """
             AND (
-                LOWER(p.name) LIKE ? 
-                OR ? LIKE CONCAT('%', LOWER(p.name), '%')
+                p.name_normalized LIKE ? 
+                OR ? LIKE CONCAT('%', p.name_normalized, '%')
             )
         """
         search_pattern = f"%{normalized_query}%"
@@ -243,48 +303,38 @@ async def search_local(
 
         # Thêm điều kiện lọc giá
         if min_price is not None:
-            sql += " AND p.price >= ?"
+            from_where_sql += " AND p.price >= ?"
             params.append(min_price)
         if max_price is not None:
-            sql += " AND p.price <= ?"
+            from_where_sql += " AND p.price <= ?"
             params.append(max_price)
 
-        # Thêm điều kiện sắp xếp
+        # Thêm điều kiện sắp xếp (id là khóa phụ để các trang không bị trùng/thiếu)
         if sort == "price_asc":
-            sql += " ORDER BY p.price ASC"
+            order_sql = "ORDER BY p.price ASC, p.id"
         elif sort == "price_desc":
-            sql += " ORDER BY p.price DESC"
+            order_sql = "ORDER BY p.price DESC, p.id"
         elif sort == "name":
-            sql += " ORDER BY p.name"
+            order_sql = "ORDER BY p.name, p.id"
         else:
-            sql += " ORDER BY p.last_updated DESC"
+            order_sql = "ORDER BY p.last_updated DESC, p.id DESC"
 
-        # Thực thi truy vấn
-        with get_db_cursor() as cursor:
-            cursor.execute(sql, params)
-            columns = [column[0] for column in cursor.description]
-            all_products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        # Lấy trang hiện tại và facet trong cùng một lần truy vấn
+        def query_db():
+            with get_db_cursor() as cursor:
+                return query_page_with_facets(
+                    cursor, from_where_sql, params, order_sql, [],
+                    (page - 1) * page_size, page_size
+                )
 
-            total = len(all_products)
+        async def build_response():
+            results, facets = await run_db(query_db)
+            return build_local_response(query, page, page_size, results, facets)
 
-            # Xử lý phân trang
-            if page_size > 0:
-                start_idx = (page - 1) * page_size
-                end_idx = start_idx + page_size
-                current_page_products = all_products[start_idx:end_idx]
-            else:
-                current_page_products = all_products
-                page_size = total
-                page = 1
-
-            return {
-                "total": total,
-                "page": page,
-                "page_size": page_size,
-                "total_pages": (total + page_size - 1) // page_size if page_size > 0 else 1,
-                "results": current_page_products,
-                "query": query
-            }
+        return await query_cache.get_or_compute(
+            f"search-local:{normalized_query}:{sort}:{min_price}:{max_price}:{page}:{page_size}",
+            build_response
+        )
 
     except Exception as e:
         logger.error(f"Lỗi khi tìm kiếm local: {str(e)}")
@@ -310,87 +360,153 @@ async def filter_results(
     Lọc kết quả tìm kiếm theo khoảng giá, sắp xếp và độ mới
     """
     try:
-        result = filter_products(query, min_price, max_price, sort, condition)
+        result = await run_db(filter_products, query, min_price, max_price)
         return {"results": result}
     except Exception as e:
         logger.error(f"Lỗi khi lọc sản phẩm: {str(e)}")
         return {"results": []}
 
+def build_products_filter(min_price: Optional[float], max_price: Optional[float]):
+    """Điều kiện lọc giá dùng chung cho truy vấn danh sách và truy vấn đếm sản phẩm."""
+    where = " WHERE 1=1"
+    params = []
+    if min_price is not None:
+        where += " AND p.price >= ?"
+        params.append(min_price)
+    if max_price is not None:
+        where += " AND p.price <= ?"
+        params.append(max_price)
+    return where, params
+
+def count_products(min_price: Optional[float], max_price: Optional[float]) -> int:
+    """Đếm chính xác số sản phẩm thỏa mãn điều kiện lọc giá."""
+    where, params = build_products_filter(min_price, max_price)
+    with get_db_cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM Products p{where}", params)
+        return cursor.fetchone()[0]
+
+def count_products_approx() -> int:
+    """Số dòng ước lượng của bảng Products lấy từ metadata (không quét bảng)."""
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+            WHERE object_id = OBJECT_ID('Products') AND index_id IN (0, 1)
+        """)
+        return int(cursor.fetchone()[0] or 0)
+
+async def get_products_total(count: str, min_price: Optional[float], max_price: Optional[float]) -> Optional[int]:
+    """
+    Lấy tổng số sản phẩm theo chế độ đếm:
+    - exact: COUNT(*) mỗi request
+    - cached: COUNT(*) được cache đến khi dữ liệu thay đổi
+    - approx: số dòng từ metadata khi không lọc giá (có lọc giá thì dùng cached)
+    - none: không đếm
+    """
+    if count == "none":
+        return None
+    if count == "approx" and min_price is None and max_price is None:
+        try:
+            return await run_db(count_products_approx)
+        except Exception as e:
+            logger.warning(f"Không lấy được số dòng ước lượng, chuyển sang đếm có cache: {str(e)}")
+            count = "cached"
+    if count == "exact":
+        return await run_db(count_products, min_price, max_price)
+    return await query_cache.get_or_compute(
+        f"products-count:{min_price}:{max_price}",
+        lambda: run_db(count_products, min_price, max_price)
+    )
+
 @app.get("/api/products")
 async def get_products(
-    page: int = Query(1, description="Số trang hiện tại"),
+    page: int = Query(1, description="Số trang hiện tại (bỏ qua khi có cursor)"),
     page_size: int = Query(20, description="Số sản phẩm mỗi trang"),
     min_price: Optional[float] = Query(None, description="Giá tối thiểu"),
     max_price: Optional[float] = Query(None, description="Giá tối đa"),
-    sort: Optional[str] = Query(None, description="Cách sắp xếp (price_asc, price_desc)")
+    sort: Optional[str] = Query(None, description="Cách sắp xếp (price_asc, price_desc)"),
+    cursor: Optional[str] = Query(None, description="Cursor của trang tiếp theo (next_cursor của response trước)"),
+    count: str = Query("exact", description="Cách đếm tổng số sản phẩm (exact, cached, approx, none)")
 ):
     """
-    Lấy danh sách tất cả sản phẩm với phân trang, lọc giá và sắp xếp
+    Lấy danh sách tất cả sản phẩm với phân trang, lọc giá và sắp xếp.
+    Có cursor thì phân trang theo keyset (seek) thay vì OFFSET nên trang sâu nhanh như trang đầu.
     """
+    if page_size <= 0:
+        page_size = 20
+    if count not in ("exact", "cached", "approx", "none"):
+        raise HTTPException(status_code=400, detail="count phải là exact, cached, approx hoặc none")
+    keyset_sort = get_keyset_sort(sort)
+    try:
+        seek = decode_cursor(cursor, keyset_sort) if cursor else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         logger.info("Bắt đầu lấy danh sách sản phẩm")
-        logger.info(f"Tham số: page={page}, page_size={page_size}, min_price={min_price}, max_price={max_price}, sort={sort}")
+        logger.info(f"Tham số: page={page}, page_size={page_size}, min_price={min_price}, max_price={max_price}, sort={sort}, cursor={cursor}, count={count}")
         
-        with get_db_cursor() as cursor:
-            # Xây dựng câu truy vấn cơ bản
-            base_query = """
-                SELECT p.*, 
-                       CASE s.id 
-                           WHEN 1 THEN N'Điện Máy Xanh'
-                           WHEN 2 THEN N'Thế Giới Di Động'
-                           WHEN 3 THEN N'Chợ Tốt'
-                           ELSE s.name 
-                       END as store_name,
-                       CASE WHEN f.id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
-                FROM Products p
-                JOIN Stores s ON p.store_id = s.id
-                LEFT JOIN Favorites f ON p.id = f.product_id AND f.user_id = 1
-                WHERE 1=1
-            """
-            
-            # Thêm điều kiện lọc giá
-            params = []
-            if min_price is not None:
-                base_query += " AND p.price >= ?"
-                params.append(min_price)
-            if max_price is not None:
-                base_query += " AND p.price <= ?"
-                params.append(max_price)
-            
-            # Đếm tổng số sản phẩm thỏa mãn điều kiện lọc giá
-            count_query = f"SELECT COUNT(*) FROM ({base_query}) as filtered_products"
-            cursor.execute(count_query, params)
-            total_products = cursor.fetchone()[0]
-            
-            # Thêm sắp xếp
-            if sort == "price_asc":
-                base_query += " ORDER BY p.price ASC"
-            elif sort == "price_desc":
-                base_query += " ORDER BY p.price DESC"
-            else:
-                # Mặc định sắp xếp theo thời gian cập nhật nếu không có yêu cầu sắp xếp theo giá
-                base_query += " ORDER BY p.last_updated DESC"
-            
-            # Thêm phân trang
-            offset = (page - 1) * page_size
-            base_query += " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-            params.extend([offset, page_size])
-            
-            # Thực thi truy vấn chính
-            cursor.execute(base_query, params)
-            columns = [column[0] for column in cursor.description]
-            products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        def query_db():
+            with get_db_cursor() as db_cursor:
+                # Xây dựng câu truy vấn cơ bản
+                base_query = """
+                    SELECT p.*, 
+                           CASE s.id 
+                               WHEN 1 THEN N'Điện Máy Xanh'
+                               WHEN 2 THEN N'Thế Giới Di Động'
+                               WHEN 3 THEN N'Chợ Tốt'
+                               WHEN 4 THEN N'Nguyễn Kim'
+                               ELSE s.name 
+                           END as store_name,
+                           CASE WHEN f.id IS NOT NULL THEN 1 ELSE 0 END as is_favorite
+                    FROM Products p
+                    JOIN Stores s ON p.store_id = s.id
+                    LEFT JOIN Favorites f ON p.id = f.product_id AND f.user_id = 1
+                """
             
-            total_pages = ceil(total_products / page_size) if page_size > 0 else 1
+                # Thêm điều kiện lọc giá
+                where, params = build_products_filter(min_price, max_price)
+                base_query += where
+
+                # Bắt đầu sau dòng cuối của trang trước (keyset) hoặc bỏ qua các trang trước (OFFSET)
+                if seek is not None:
+                    seek_condition, seek_params = build_seek_condition(keyset_sort, *seek)
+                    base_query += seek_condition
+                    params.extend(seek_params)
+                    offset = 0
+                else:
+                    offset = (page - 1) * page_size
+
+                # Thêm sắp xếp (id là khóa phụ để thứ tự ổn định giữa các trang)
+                base_query += build_keyset_order(keyset_sort)
             
-            logger.info(f"Đã tải {len(products)} sản phẩm cho trang {page}/{total_pages}")
+                # Lấy dư một dòng để biết còn trang sau hay không
+                base_query += " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+                params.extend([offset, page_size + 1])
             
+                # Thực thi truy vấn chính
+                db_cursor.execute(base_query, params)
+                columns = [column[0] for column in db_cursor.description]
+                products = [dict(zip(columns, row)) for row in db_cursor.fetchall()]
+                has_next = len(products) > page_size
+                return products[:page_size], has_next
+
+        async def build_response():
+            products, has_next = await run_db(query_db)
+            total_products = await get_products_total(count, min_price, max_price)
+            total_pages = ceil(total_products / page_size) if total_products is not None else None
+            current_page = page if seek is None else None
+
+            logger.info(f"Đã tải {len(products)} sản phẩm (trang {current_page or 'cursor'}/{total_pages})")
+
             return {
                 "total": total_products,
-                "page": page,
+                "page": current_page,
                 "page_size": page_size,
                 "total_pages": total_pages,
                 "results": products,
+                "has_next": has_next,
+                "next_cursor": encode_cursor(keyset_sort, products[-1]) if has_next and products else None,
+                "count_mode": count,
                 "stats": {
                     "total_products": total_products,
                     "min_price": min_price,
@@ -399,6 +515,10 @@ async def get_products(
                 },
                 "last_updated": datetime.now().isoformat()
             }
+        return await query_cache.get_or_compute(
+            f"products:{page}:{page_size}:{min_price}:{max_price}:{sort}:{cursor}:{count}",
+            build_response
+        )
             
     except Exception as e:
         logger.error(f"Lỗi khi lấy danh sách sản phẩm: {str(e)}")
@@ -419,27 +539,30 @@ async def get_favorites():
     Lấy danh sách sản phẩm yêu thích
     """
     try:
-        with get_db_cursor() as cursor:
-            # Sử dụng user_id mặc định là 1
-            default_user_id = 1
-            sql = """
-                SELECT p.*, 
-                       CASE s.id 
-                           WHEN 1 THEN N'Điện Máy Xanh'
-                           WHEN 2 THEN N'Thế Giới Di Động'
-                           WHEN 3 THEN N'Chợ Tốt'
-                           ELSE s.name 
-                       END as store_name,
-                       1 as is_favorite
-                FROM Products p
-                JOIN Stores s ON p.store_id = s.id
-                JOIN Favorites f ON p.id = f.product_id
-                WHERE f.user_id = ?
-            """
-            cursor.execute(sql, (default_user_id,))
-            columns = [column[0] for column in cursor.description]
-            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            return results
+        def query_db():
+            with get_db_cursor() as cursor:
+                # Sử dụng user_id mặc định là 1
+                default_user_id = 1
+                sql = """
+                    SELECT p.*, 
+                           CASE s.id 
+                               WHEN 1 THEN N'Điện Máy Xanh'
+                               WHEN 2 THEN N'Thế Giới Di Động'
+                               WHEN 3 THEN N'Chợ Tốt'
+                               WHEN 4 THEN N'Nguyễn Kim'
+                               ELSE s.name 
+                           END as store_name,
+                           1 as is_favorite
+                    FROM Products p
+                    JOIN Stores s ON p.store_id = s.id
+                    JOIN Favorites f ON p.id = f.product_id
+                    WHERE f.user_id = ?
+                """
+                cursor.execute(sql, (default_user_id,))
+                columns = [column[0] for column in cursor.description]
+                results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return results
+        return await run_db(query_db)
     except Exception as e:
         logger.error(f"Lỗi khi lấy danh sách yêu thích: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -450,19 +573,24 @@ async def add_to_favorites(product_id: int):
     Thêm sản phẩm vào danh sách yêu thích
     """
     try:
-        with get_db_cursor() as cursor:
-            # Sử dụng user_id mặc định là 1
-            default_user_id = 1
+        def query_db():
+            with get_db_cursor() as cursor:
+                # Sử dụng user_id mặc định là 1
+                default_user_id = 1
             
-            # Kiểm tra xem sản phẩm đã tồn tại trong yêu thích chưa
-            cursor.execute("SELECT id FROM Favorites WHERE product_id = ? AND user_id = ?", 
-                         (product_id, default_user_id))
-            if not cursor.fetchone():
-                cursor.execute(
-                    "INSERT INTO Favorites (product_id, user_id) VALUES (?, ?)",
-                    (product_id, default_user_id)
-                )
-            return {"message": "Đã thêm vào yêu thích"}
+                # Kiểm tra xem sản phẩm đã tồn tại trong yêu thích chưa
+                cursor.execute("SELECT id FROM Favorites WHERE product_id = ? AND user_id = ?", 
+                             (product_id, default_user_id))
+                if not cursor.fetchone():
+                    cursor.execute(
+                        "INSERT INTO Favorites (product_id, user_id) VALUES (?, ?)",
+                        (product_id, default_user_id)
+                    )
+                return {"message": "Đã thêm vào yêu thích"}
+        result = await run_db(query_db)
+        # Trạng thái yêu thích nằm trong response của /api/products
+        query_cache.clear()
+        return result
     except Exception as e:
         logger.error(f"Lỗi khi thêm vào yêu thích: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -473,14 +601,18 @@ async def remove_from_favorites(product_id: int):
     Xóa sản phẩm khỏi danh sách yêu thích
     """
     try:
-        with get_db_cursor() as cursor:
-            # Sử dụng user_id mặc định là 1
-            default_user_id = 1
-            cursor.execute(
-                "DELETE FROM Favorites WHERE product_id = ? AND user_id = ?",
-                (product_id, default_user_id)
-            )
-            return {"message": "Đã xóa khỏi yêu thích"}
+        def query_db():
+            with get_db_cursor() as cursor:
+                # Sử dụng user_id mặc định là 1
+                default_user_id = 1
+                cursor.execute(
+                    "DELETE FROM Favorites WHERE product_id = ? AND user_id = ?",
+                    (product_id, default_user_id)
+                )
+                return {"message": "Đã xóa khỏi yêu thích"}
+        result = await run_db(query_db)
+        query_cache.clear()
+        return result
     except Exception as e:
         logger.error(f"Lỗi khi xóa khỏi yêu thích: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -491,11 +623,15 @@ async def clear_favorites():
     Xóa tất cả sản phẩm khỏi danh sách yêu thích
     """
     try:
-        with get_db_cursor() as cursor:
-            # Sử dụng user_id mặc định là 1
-            default_user_id = 1
-            cursor.execute("DELETE FROM Favorites WHERE user_id = ?", (default_user_id,))
-            return {"message": "Đã xóa tất cả yêu thích"}
+        def query_db():
+            with get_db_cursor() as cursor:
+                # Sử dụng user_id mặc định là 1
+                default_user_id = 1
+                cursor.execute("DELETE FROM Favorites WHERE user_id = ?", (default_user_id,))
+                return {"message": "Đã xóa tất cả yêu thích"}
+        result = await run_db(query_db)
+        query_cache.clear()
+        return result
     except Exception as e:
         logger.error(f"Lỗi khi xóa tất cả yêu thích: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -506,7 +642,7 @@ async def compare_endpoint(product_ids: List[int]):
     if len(product_ids) < 2:
         return {"error": "Cần ít nhất 2 sản phẩm để so sánh"}
     logger.info(f"So sánh các sản phẩm: {product_ids}")
-    result = compare_products(product_ids)
+    result = await run_db(compare_products, product_ids)
     logger.info(f"So sánh trả về {result.get('total', 0)} kết quả")
     return result
 
@@ -516,56 +652,61 @@ async def clear_history_endpoint():
     Xóa lịch sử tìm kiếm, giá và sản phẩm, nhưng giữ lại các sản phẩm yêu thích
     """
     try:
-        with get_db_cursor() as cursor:
-            # Bắt đầu transaction
-            cursor.execute("BEGIN TRANSACTION")
-            try:
-                # 1. Xóa Notifications (phụ thuộc vào Products)
-                cursor.execute("""
-                    IF OBJECT_ID('Notifications', 'U') IS NOT NULL
-                        DELETE FROM Notifications 
-                        WHERE product_id NOT IN (
-                            SELECT DISTINCT product_id 
-                            FROM Favorites
-                        );
-                """)
+        def query_db():
+            with get_db_cursor() as cursor:
+                # Bắt đầu transaction
+                cursor.execute("BEGIN TRANSACTION")
+                try:
+                    # 1. Xóa Notifications (phụ thuộc vào Products)
+                    cursor.execute("""
+                        IF OBJECT_ID('Notifications', 'U') IS NOT NULL
+                            DELETE FROM Notifications 
+                            WHERE product_id NOT IN (
+                                SELECT DISTINCT product_id 
+                                FROM Favorites
+                            );
+                    """)
                 
-                # 2. Xóa PriceHistory (phụ thuộc vào Products)
-                cursor.execute("""
-                    IF OBJECT_ID('PriceHistory', 'U') IS NOT NULL
-                        DELETE FROM PriceHistory 
-                        WHERE product_id NOT IN (
-                            SELECT DISTINCT product_id 
-                            FROM Favorites
-                        );
-                """)
+                    # 2. Xóa PriceHistory (phụ thuộc vào Products)
+                    cursor.execute("""
+                        IF OBJECT_ID('PriceHistory', 'U') IS NOT NULL
+                            DELETE FROM PriceHistory 
+                            WHERE product_id NOT IN (
+                                SELECT DISTINCT product_id 
+                                FROM Favorites
+                            );
+                    """)
                 
-                # 3. Xóa SearchHistory (độc lập)
-                cursor.execute("""
-                    IF OBJECT_ID('SearchHistory', 'U') IS NOT NULL
-                        DELETE FROM SearchHistory;
-                """)
+                    # 3. Xóa SearchHistory (độc lập)
+                    cursor.execute("""
+                        IF OBJECT_ID('SearchHistory', 'U') IS NOT NULL
+                            DELETE FROM SearchHistory;
+                    """)
                 
-                # 4. Xóa Products nhưng giữ lại các sản phẩm trong Favorites
-                cursor.execute("""
-                    IF OBJECT_ID('Products', 'U') IS NOT NULL
-                        DELETE FROM Products 
-                        WHERE id NOT IN (
-                            SELECT DISTINCT product_id 
-                            FROM Favorites
-                        );
-                """)
+                    # 4. Xóa Products nhưng giữ lại các sản phẩm trong Favorites
+                    cursor.execute("""
+                        IF OBJECT_ID('Products', 'U') IS NOT NULL
+                            DELETE FROM Products 
+                            WHERE id NOT IN (
+                                SELECT DISTINCT product_id 
+                                FROM Favorites
+                            );
+                    """)
                 
-                # Commit transaction
-                cursor.execute("COMMIT")
+                    # Commit transaction
+                    cursor.execute("COMMIT")
                 
-                logger.info("Đã xóa lịch sử và dữ liệu sản phẩm thành công (giữ lại sản phẩm yêu thích)")
-                return {"message": "Đã xóa lịch sử và dữ liệu sản phẩm thành công (giữ lại sản phẩm yêu thích)", "success": True}
-            except Exception as e:
-                # Rollback nếu có lỗi
-                cursor.execute("ROLLBACK")
-                logger.error(f"Lỗi khi xóa lịch sử và dữ liệu, thực hiện rollback: {str(e)}")
-                raise
+                    logger.info("Đã xóa lịch sử và dữ liệu sản phẩm thành công (giữ lại sản phẩm yêu thích)")
+                    return {"message": "Đã xóa lịch sử và dữ liệu sản phẩm thành công (giữ lại sản phẩm yêu thích)", "success": True}
+                except Exception as e:
+                    # Rollback nếu có lỗi
+                    cursor.execute("ROLLBACK")
+                    logger.error(f"Lỗi khi xóa lịch sử và dữ liệu, thực hiện rollback: {str(e)}")
+                    raise
+        result = await run_db(query_db)
+        # Products đã thay đổi: nạp lại index tìm kiếm
+        await run_db(notify_data_changed, "clear")
+        return result
     except Exception as e:
         logger.error(f"Lỗi khi xóa lịch sử và dữ liệu: {str(e)}")
         return {"message": f"Lỗi khi xóa lịch sử và dữ liệu: {str(e)}", "success": False}
@@ -581,29 +722,31 @@ async def favicon():
 async def get_product_update_status(product_id: int):
     """Kiểm tra trạng thái cập nhật của sản phẩm"""
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                SELECT name, price, last_updated,
-                       DATEDIFF(hour, last_updated, GETDATE()) as hours_since_update
-                FROM Products
-                WHERE id = ?
-            """, (product_id,))
-            result = cursor.fetchone()
+        def query_db():
+            with get_db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT name, price, last_updated,
+                           DATEDIFF(hour, last_updated, GETDATE()) as hours_since_update
+                    FROM Products
+                    WHERE id = ?
+                """, (product_id,))
+                result = cursor.fetchone()
             
-            if not result:
-                raise HTTPException(status_code=404, detail="Không tìm thấy sản phẩm")
+                if not result:
+                    raise HTTPException(status_code=404, detail="Không tìm thấy sản phẩm")
                 
-            columns = ['name', 'price', 'last_updated', 'hours_since_update']
-            product_info = dict(zip(columns, result))
+                columns = ['name', 'price', 'last_updated', 'hours_since_update']
+                product_info = dict(zip(columns, result))
             
-            # Thêm cảnh báo nếu quá 24h
-            product_info['needs_update'] = product_info['hours_since_update'] >= 24
-            product_info['warning_message'] = (
-                "Thông tin sản phẩm có thể đã thay đổi do chưa được cập nhật trong 24h qua"
-                if product_info['needs_update'] else None
-            )
+                # Thêm cảnh báo nếu quá 24h
+                product_info['needs_update'] = product_info['hours_since_update'] >= 24
+                product_info['warning_message'] = (
+                    "Thông tin sản phẩm có thể đã thay đổi do chưa được cập nhật trong 24h qua"
+                    if product_info['needs_update'] else None
+                )
             
-            return product_info
+                return product_info
+        return await run_db(query_db)
     except Exception as e:
         logger.error(f"Lỗi khi kiểm tra trạng thái cập nhật: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -612,33 +755,35 @@ async def get_product_update_status(product_id: int):
 async def get_price_history(product_id: int):
     """Lấy lịch sử giá của sản phẩm"""
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                SELECT p.name as product_name,
-                       ph.price,
-                       ph.recorded_at,
-                       s.name as store_name
-                FROM PriceHistory ph
-                JOIN Products p ON ph.product_id = p.id
-                JOIN Stores s ON p.store_id = s.id
-                WHERE p.id = ?
-                ORDER BY ph.recorded_at DESC
-            """, (product_id,))
+        def query_db():
+            with get_db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT p.name as product_name,
+                           ph.price,
+                           ph.recorded_at,
+                           s.name as store_name
+                    FROM PriceHistory ph
+                    JOIN Products p ON ph.product_id = p.id
+                    JOIN Stores s ON p.store_id = s.id
+                    WHERE p.id = ?
+                    ORDER BY ph.recorded_at DESC
+                """, (product_id,))
             
-            columns = ['product_name', 'price', 'recorded_at', 'store_name']
-            history = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                columns = ['product_name', 'price', 'recorded_at', 'store_name']
+                history = [dict(zip(columns, row)) for row in cursor.fetchall()]
             
-            # Tính toán thay đổi giá
-            for i in range(len(history)-1):
-                current_price = float(history[i]['price'])
-                previous_price = float(history[i+1]['price'])
-                price_change = current_price - previous_price
-                price_change_percent = (price_change / previous_price) * 100
+                # Tính toán thay đổi giá
+                for i in range(len(history)-1):
+                    current_price = float(history[i]['price'])
+                    previous_price = float(history[i+1]['price'])
+                    price_change = current_price - previous_price
+                    price_change_percent = (price_change / previous_price) * 100
                 
-                history[i]['price_change'] = price_change
-                history[i]['price_change_percent'] = round(price_change_percent, 2)
+                    history[i]['price_change'] = price_change
+                    history[i]['price_change_percent'] = round(price_change_percent, 2)
             
-            return {"history": history}
+                return {"history": history}
+        return await run_db(query_db)
     except Exception as e:
         logger.error(f"Lỗi khi lấy lịch sử giá: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -647,24 +792,26 @@ async def get_price_history(product_id: int):
 async def get_outdated_products():
     """Lấy danh sách sản phẩm chưa được cập nhật trong 24h"""
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                SELECT p.id, p.name, p.price, p.last_updated,
-                       DATEDIFF(hour, p.last_updated, GETDATE()) as hours_since_update,
-                       s.name as store_name
-                FROM Products p
-                JOIN Stores s ON p.store_id = s.id
-                WHERE DATEDIFF(hour, p.last_updated, GETDATE()) >= 24
-                ORDER BY p.last_updated ASC
-            """)
+        def query_db():
+            with get_db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT p.id, p.name, p.price, p.last_updated,
+                           DATEDIFF(hour, p.last_updated, GETDATE()) as hours_since_update,
+                           s.name as store_name
+                    FROM Products p
+                    JOIN Stores s ON p.store_id = s.id
+                    WHERE DATEDIFF(hour, p.last_updated, GETDATE()) >= 24
+                    ORDER BY p.last_updated ASC
+                """)
             
-            columns = ['id', 'name', 'price', 'last_updated', 'hours_since_update', 'store_name']
-            products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                columns = ['id', 'name', 'price', 'last_updated', 'hours_since_update', 'store_name']
+                products = [dict(zip(columns, row)) for row in cursor.fetchall()]
             
-            return {
-                "total": len(products),
-                "products": products
-            }
+                return {
+                    "total": len(products),
+                    "products": products
+                }
+        return await run_db(query_db)
     except Exception as e:
         logger.error(f"Lỗi khi lấy danh sách sản phẩm cũ: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -673,38 +820,40 @@ async def get_outdated_products():
 async def get_notifications(unread_only: bool = False):
     """Lấy danh sách thông báo thay đổi giá"""
     try:
-        with get_db_cursor() as cursor:
-            # Kiểm tra xem bảng Notifications có tồn tại không
-            cursor.execute("""
-                IF EXISTS (SELECT * FROM sys.tables WHERE name = 'Notifications')
-                BEGIN
-                    SELECT n.*, p.name as product_name, p.image_url
-                    FROM Notifications n
-                    JOIN Products p ON n.product_id = p.id
-                    WHERE (? = 0 OR n.is_read = 0)
-                    ORDER BY n.created_at DESC
-                END
-                ELSE
-                BEGIN
-                    SELECT 0 as total, 0 as unread_count
-                END
-            """, (0 if unread_only else 1,))
+        def query_db():
+            with get_db_cursor() as cursor:
+                # Kiểm tra xem bảng Notifications có tồn tại không
+                cursor.execute("""
+                    IF EXISTS (SELECT * FROM sys.tables WHERE name = 'Notifications')
+                    BEGIN
+                        SELECT n.*, p.name as product_name, p.image_url
+                        FROM Notifications n
+                        JOIN Products p ON n.product_id = p.id
+                        WHERE (? = 0 OR n.is_read = 0)
+                        ORDER BY n.created_at DESC
+                    END
+                    ELSE
+                    BEGIN
+                        SELECT 0 as total, 0 as unread_count
+                    END
+                """, (0 if unread_only else 1,))
             
-            if cursor.description:  # Nếu có kết quả trả về
-                columns = [column[0] for column in cursor.description]
-                notifications = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                if cursor.description:  # Nếu có kết quả trả về
+                    columns = [column[0] for column in cursor.description]
+                    notifications = [dict(zip(columns, row)) for row in cursor.fetchall()]
                 
-                return {
-                    "total": len(notifications),
-                    "unread_count": len([n for n in notifications if not n['is_read']]),
-                    "notifications": notifications
-                }
-            else:
-                return {
-                    "total": 0,
-                    "unread_count": 0,
-                    "notifications": []
-                }
+                    return {
+                        "total": len(notifications),
+                        "unread_count": len([n for n in notifications if not n['is_read']]),
+                        "notifications": notifications
+                    }
+                else:
+                    return {
+                        "total": 0,
+                        "unread_count": 0,
+                        "notifications": []
+                    }
+        return await run_db(query_db)
     except Exception as e:
         logger.error(f"Lỗi khi lấy thông báo: {str(e)}")
         return {
@@ -718,12 +867,14 @@ async def get_notifications(unread_only: bool = False):
 async def mark_notification_read(notification_id: int):
     """Đánh dấu thông báo đã đọc"""
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                "UPDATE Notifications SET is_read = 1 WHERE id = ?",
-                (notification_id,)
-            )
-            return {"message": "Đã đánh dấu đã đọc"}
+        def query_db():
+            with get_db_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE Notifications SET is_read = 1 WHERE id = ?",
+                    (notification_id,)
+                )
+                return {"message": "Đã đánh dấu đã đọc"}
+        return await run_db(query_db)
     except Exception as e:
         logger.error(f"Lỗi khi đánh dấu đã đọc: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -743,7 +894,7 @@ async def search_endpoint(request: Request):
             raise HTTPException(status_code=400, detail="Thiếu tên sản phẩm cần tìm")
 
         logger.info(f"Bắt đầu tìm kiếm: {product_name}, condition: {condition}")
-        result = search_product(product_name, condition)
+        result = await cached_search(normalize_search_query(product_name), condition)
         
         # Đảm bảo format trả về đúng với yêu cầu của frontend
         response = {
@@ -756,6 +907,8 @@ async def search_endpoint(request: Request):
         return response
     except JSONDecodeError:
         raise HTTPException(status_code=400, detail="Dữ liệu không đúng định dạng JSON")
+    except ExecutorQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Lỗi khi tìm kiếm: {str(e)}")
         # Trả về kết quả rỗng khi có lỗi thay vì raise exception
@@ -765,18 +918,292 @@ async def search_endpoint(request: Request):
             "query": product_name if product_name else ""
         }
 
+def format_sse(event: str, data: Any) -> str:
+    """Định dạng một sự kiện Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+class SearchBroadcast:
+    """
+    Sự kiện của một lượt tìm kiếm stream dùng chung cho mọi client cùng từ khóa:
+    client vào sau nhận lại các sự kiện đã phát rồi tiếp tục nhận sự kiện mới.
+    Chỉ truy cập từ event loop (thread crawl gửi sự kiện qua call_soon_threadsafe).
+    """
+    def __init__(self, query: str):
+        self.query = query
+        self.events: List[Any] = []
+        self.finished = False
+        self._subscribers: List[asyncio.Queue] = []
+        # Kết quả đã gộp (giống search_product) khi có sự kiện "summary", dùng để ghi search_cache
+        self.summary: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def publish(self, event):
+        """Phát một sự kiện (tên, dữ liệu); None là kết thúc lượt tìm kiếm."""
+        if event is None:
+            self.finished = True
+            if not self.summary.done():
+                self.summary.set_exception(RuntimeError(f"Lượt tìm kiếm '{self.query}' kết thúc không có kết quả"))
+        else:
+            self.events.append(event)
+            name, data = event
+            if name == "summary" and not self.summary.done():
+                self.summary.set_result({key: data[key] for key in ("total", "results", "stores")})
+        for subscriber in self._subscribers:
+            subscriber.put_nowait(event)
+
+    def follow(self, task: asyncio.Task):
+        """Phát kết quả của một lượt tìm kiếm không stream (/api/search) đang chạy cùng từ khóa."""
+        def done(task: asyncio.Task):
+            if task.cancelled() or task.exception() is not None:
+                detail = "Lượt tìm kiếm bị hủy" if task.cancelled() else str(task.exception())
+                self.publish(("search_error", {"detail": detail}))
+            else:
+                self.publish(("summary", {"query": self.query, **task.result()}))
+            self.publish(None)
+        task.add_done_callback(done)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        if self.finished:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+        return queue
+
+# Các lượt tìm kiếm stream đang chạy theo key của search_cache
+search_broadcasts: Dict[str, SearchBroadcast] = {}
+
+def start_search_broadcast(key: str, normalized_query: str, condition: Optional[str]) -> SearchBroadcast:
+    """
+    Lấy lượt tìm kiếm đang chạy cùng key hoặc bắt đầu lượt mới (một lượt crawl cho mọi client).
+    Lượt mới được đăng ký vào single-flight của search_cache nên /api/search cùng từ khóa
+    dùng chung lượt crawl này và kết quả được ghi vào search_cache.
+    """
+    broadcast = search_broadcasts.get(key)
+    if broadcast is not None:
+        return broadcast
+
+    loop = asyncio.get_running_loop()
+    broadcast = SearchBroadcast(normalized_query)
+    inflight = search_cache.get_inflight(key)
+    if inflight is not None:
+        broadcast.follow(inflight)
+    else:
+        def produce():
+            # Chạy trong crawl_executor; mỗi sự kiện được chuyển về event loop ngay khi có
+            try:
+                for event in search_product_stream(normalized_query, condition):
+                    loop.call_soon_threadsafe(broadcast.publish, event)
+            except Exception as e:
+                logger.error(f"Lỗi khi stream tìm kiếm '{normalized_query}': {str(e)}")
+                loop.call_soon_threadsafe(broadcast.publish, ("search_error", {"detail": str(e)}))
+            finally:
+                loop.call_soon_threadsafe(broadcast.publish, None)
+
+        # Gửi lượt crawl vào hàng đợi trước khi bắt đầu response để có thể trả về 503 khi đầy
+        crawl_executor.submit(produce)
+        search_cache.compute_shared(key, lambda: broadcast.summary, should_cache=should_cache_search)
+
+    search_broadcasts[key] = broadcast
+
+    def forget(summary: asyncio.Future):
+        if search_broadcasts.get(key) is broadcast:
+            del search_broadcasts[key]
+        if not summary.cancelled():
+            summary.exception()  # lỗi đã được gửi cho client qua sự kiện search_error
+    broadcast.summary.add_done_callback(forget)
+    return broadcast
+
+@app.get("/api/search-stream")
+async def search_stream(
+    product_name: str = Query(..., min_length=1, description="Tên sản phẩm cần tìm"),
+    condition: Optional[str] = Query(None, description="Tình trạng sản phẩm (vd: 'new')")
+):
+    """
+    Tìm kiếm sản phẩm và stream kết quả bằng Server-Sent Events: sự kiện "store" được gửi ngay
+    khi từng cửa hàng crawl xong, sự kiện "summary" chứa kết quả đã gộp và loại trùng.
+    Dùng chung search_cache và single-flight với /api/search: kết quả đã cache được trả ngay
+    trong sự kiện "summary", các request cùng từ khóa đang chạy dùng chung một lượt crawl.
+    """
+    normalized_query = normalize_search_query(product_name)
+    if not normalized_query:
+        raise HTTPException(status_code=400, detail="Thiếu tên sản phẩm cần tìm")
+
+    key = get_search_cache_key(normalized_query, condition)
+    cached = search_cache.get(key)
+    if cached is not None:
+        events: asyncio.Queue = asyncio.Queue()
+        events.put_nowait(("summary", {"query": normalized_query, **cached, "cached": True}))
+        events.put_nowait(None)
+    else:
+        try:
+            events = start_search_broadcast(key, normalized_query, condition).subscribe()
+        except ExecutorQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    async def generate():
+        yield format_sse("start", {"query": normalized_query})
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield format_sse(*event)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class SearchJobRequest(BaseModel):
+    product_name: str = Field(..., min_length=1, description="Tên sản phẩm cần tìm")
+    condition: Optional[str] = Field(default=None, description="Tình trạng sản phẩm (vd: 'new')")
+
+def _format_timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value else None
+
+@app.post("/api/search-jobs", status_code=202)
+async def create_search_job(request: SearchJobRequest):
+    """
+    Xếp một lượt tìm kiếm vào hàng đợi để process worker xử lý, trả về job id ngay.
+    Các yêu cầu cùng từ khóa khi job trước chưa xong dùng chung một job.
+    """
+    normalized_query = normalize_search_query(request.product_name)
+    if not normalized_query:
+        raise HTTPException(status_code=400, detail="Thiếu tên sản phẩm cần tìm")
+    try:
+        job_id, status, deduplicated = await run_db(job_queue.enqueue, normalized_query, request.condition)
+    except (JobQueueFullError, ExecutorQueueFullError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Lỗi khi tạo job tìm kiếm: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logger.info(f"Job tìm kiếm {job_id} ('{normalized_query}'): {status}, gộp với job có sẵn: {deduplicated}")
+    return {
+        "job_id": job_id,
+        "status": status,
+        "deduplicated": deduplicated,
+        "query": normalized_query,
+        "status_url": f"/api/search-jobs/{job_id}",
+        "result_url": f"/api/search-jobs/{job_id}/result"
+    }
+
+@app.get("/api/search-jobs/{job_id}")
+async def get_search_job(job_id: str):
+    """Trạng thái của job tìm kiếm: queued (kèm vị trí), running, done (kèm tổng số kết quả) hoặc failed."""
+    job = await run_db(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    for field in ("created_at", "started_at", "finished_at"):
+        job[field] = _format_timestamp(job[field])
+    return job
+
+@app.get("/api/search-jobs/{job_id}/result")
+async def get_search_job_result(job_id: str):
+    """Kết quả của job tìm kiếm; trả về 202 kèm trạng thái nếu job chưa xong."""
+    job = await run_db(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    if job["status"] == STATUS_FAILED:
+        raise HTTPException(status_code=500, detail=job["error"] or "Job tìm kiếm thất bại")
+    if job["status"] != STATUS_DONE:
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+
+    result = await run_db(job_queue.get_result, job_id) or {}
+    return {
+        "job_id": job_id,
+        "status": STATUS_DONE,
+        "query": job["query"],
+        "total": result.get("total", 0),
+        "results": result.get("results", []),
+        "stores": result.get("stores", {})
+    }
+
 @app.get("/load-database")
 async def load_database():
     """
     Load toàn bộ database lên web
     """
     try:
-        result = load_database_to_web()
+        result = await query_cache.get_or_compute(
+            "load-database",
+            lambda: run_db(load_database_to_web),
+            should_cache=lambda r: r.get("total", 0) > 0
+        )
         return result
     except Exception as e:
         logger.error(f"Lỗi khi load database: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def to_json_value(value):
+    """Chuyển Decimal/datetime sang kiểu JSON được."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+@app.get("/api/products/export")
+async def export_products(
+    format: str = Query("ndjson", description="Định dạng export (ndjson hoặc json)"),
+    fields: Optional[str] = Query(None, description="Các cột cần lấy, cách nhau bởi dấu phẩy (mặc định tất cả)"),
+    since: Optional[str] = Query(None, description="Chỉ lấy sản phẩm có last_updated >= since (ISO 8601)")
+):
+    """
+    Export toàn bộ sản phẩm dạng stream: đọc database theo từng lô và gửi dần về client,
+    bộ nhớ không tăng theo kích thước catalog.
+    """
+    if format not in ("ndjson", "json"):
+        raise HTTPException(status_code=400, detail="format phải là ndjson hoặc json")
+
+    selected_fields = None
+    if fields:
+        selected_fields = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected_fields if f not in EXPORT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Cột không hợp lệ: {', '.join(unknown)}")
+
+    since_value = None
+    if since:
+        try:
+            since_value = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="since phải có định dạng ISO 8601")
+
+    def generate():
+        # Chạy trong threadpool của Starlette nên fetchmany không chặn event loop
+        count = 0
+        try:
+            chunk = ["["] if format == "json" else []
+            for product in iter_products_export(selected_fields, since_value):
+                line = json.dumps(product, default=to_json_value, ensure_ascii=False)
+                if format == "json":
+                    chunk.append(("," if count else "") + line)
+                else:
+                    chunk.append(line + "\n")
+                count += 1
+                # Gửi theo từng lô thay vì từng dòng để giảm số lần chuyển qua lại với event loop
+                if len(chunk) >= EXPORT_BATCH_SIZE:
+                    yield "".join(chunk)
+                    chunk = []
+            if format == "json":
+                chunk.append("]")
+            if chunk:
+                yield "".join(chunk)
+            logger.info(f"Đã export {count} sản phẩm")
+        except Exception as e:
+            # Header đã được gửi, chỉ có thể ghi log và dừng stream
+            logger.error(f"Lỗi khi export sản phẩm sau {count} dòng: {str(e)}")
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(generate(), media_type=media_type)
+
 # Middleware để thêm cache control headers
 @app.middleware("http")
 async def add_cache_control_headers(request: Request, call_next):
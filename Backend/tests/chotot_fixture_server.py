@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, List
+from aiohttp import web
+
+# Các offset mà crawler Chợ Tốt gửi (CHOTOT_PAGE_LIMIT = 20, CHOTOT_MAX_PAGES = 5)
+PAGE_LIMIT = 20
+OFFSETS = (0, 20, 40, 60, 80)
+# Mỗi trang lặp lại 2 tin cuối của trang trước (API thật trả tin trùng khi có tin mới chen vào)
+OVERLAP = 2
+
+def build_ad(list_id: int) -> Dict:
+    """Một tin đăng có cùng các trường mà API ad-listing trả về."""
+    return {
+        "ad_id": 150000000 + list_id,
+        "list_id": list_id,
+        "subject": f"iPhone 13 Pro Max 128GB tin {list_id}",
+        "price": 15_000_000 + list_id * 1000,
+        "price_string": f"{15_000_000 + list_id * 1000:,} đ".replace(",", "."),
+        "image": f"https://cdn.chotot.com/{list_id}.jpg",
+        "category": 5010,
+        "region_name": "Tp Hồ Chí Minh",
+    }
+
+def build_page(offset: int) -> Dict:
+    """Trang kết quả tại offset: list_id liên tiếp, kèm OVERLAP tin trùng với trang trước và một tin không có giá."""
+    start = max(0, offset - OVERLAP) if offset else 0
+    ads = [build_ad(1000 + i) for i in range(start, offset + PAGE_LIMIT - 1)]
+    ads.append({**build_ad(9000 + offset), "price": 0})  # tin "Thỏa thuận" không có giá
+    return {"total": len(OFFSETS) * PAGE_LIMIT, "ads": ads}
+
+def expected_list_ids() -> List[int]:
+    """Các list_id hợp lệ (có giá, không trùng) trên toàn bộ các trang."""
+    ids = set()
+    for offset in OFFSETS:
+        ids.update(ad["list_id"] for ad in build_page(offset)["ads"] if ad["price"])
+    return sorted(ids)
+
+class ChototFixtureServer:
+    """
+    Server aiohttp cục bộ giả lập API ad-listing của Chợ Tốt cho test crawler.
+    failures[offset] là danh sách mã lỗi trả về lần lượt cho các request đầu tiên của offset đó;
+    delay là thời gian chờ trước khi trả mỗi trang (để kiểm tra các trang được lấy song song),
+    delays[offset] thay cho delay với riêng offset đó.
+    """
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.delays: Dict[int, float] = {}
+        self.failures: Dict[int, List[int]] = {}
+        self.requests: Dict[int, int] = defaultdict(int)
+        self.max_concurrent = 0
+        self._concurrent = 0
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self.port = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/public/ad-listing"
+
+    async def _ad_listing(self, request: web.Request) -> web.Response:
+        offset = int(request.query.get("o", "0"))
+        self.requests[offset] += 1
+        self._concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self._concurrent)
+        try:
+            delay = self.delays.get(offset, self.delay)
+            if delay:
+                await asyncio.sleep(delay)
+            pending = self.failures.get(offset)
+            if pending:
+                return web.json_response({"error": "fixture"}, status=pending.pop(0))
+            if offset not in OFFSETS:
+                return web.json_response({"total": 0, "ads": []})
+            return web.json_response(build_page(offset))
+        finally:
+            self._concurrent -= 1
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get("/v1/public/ad-listing", self._ad_listing)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self) -> "ChototFixtureServer":
+        threading.Thread(target=self._loop.run_forever, name="chotot-fixture", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(5)
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
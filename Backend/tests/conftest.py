@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module được import từ thư mục Backend (giống khi chạy main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import time
+import pytest
+from Crawler import chotot
+from Crawler.utils import crawl_deadline
+from tests.chotot_fixture_server import ChototFixtureServer, OFFSETS, build_page, expected_list_ids
+
+@pytest.fixture
+def chotot_server(monkeypatch):
+    server = ChototFixtureServer().start()
+    monkeypatch.setattr(chotot, "CHOTOT_API_URL", server.url)
+    yield server
+    server.stop()
+
+def list_ids(products):
+    return sorted(int(product["link"].rsplit("/", 1)[1].split(".")[0]) for product in products)
+
+def test_fetches_all_offsets_in_parallel(chotot_server):
+    chotot_server.delay = 0.3
+    start = time.monotonic()
+    products = chotot.crawl_chotot("iphone 13")
+    elapsed = time.monotonic() - start
+
+    assert sorted(chotot_server.requests) == list(OFFSETS)
+    assert chotot_server.max_concurrent > 1
+    # 5 trang x 0.3s nếu lấy tuần tự
+    assert elapsed < 0.3 * len(OFFSETS)
+    assert len(products) > 0
+
+def test_dedups_ads_across_pages_and_skips_unpriced(chotot_server):
+    products = chotot.crawl_chotot("iphone 13")
+
+    assert list_ids(products) == expected_list_ids()
+    assert len({product["link"] for product in products}) == len(products)
+    assert all(product["price"] > 0 and product["store_id"] == 3 for product in products)
+
+def test_retries_on_429_and_5xx(chotot_server):
+    chotot_server.failures = {20: [429, 503], 60: [502]}
+    products = chotot.crawl_chotot("iphone 13")
+
+    assert chotot_server.requests[20] == 3
+    assert chotot_server.requests[60] == 2
+    assert list_ids(products) == expected_list_ids()
+
+def test_page_failing_after_retries_is_skipped(chotot_server):
+    chotot_server.failures = {40: [500] * 10}
+    products = chotot.crawl_chotot("iphone 13")
+
+    # 1 lần đầu + HTTP_MAX_RETRIES lần thử lại, các trang khác vẫn được trả về
+    assert chotot_server.requests[40] == 4
+    assert 0 < len(products) < len(expected_list_ids())
+
+def test_deadline_returns_pages_already_fetched(chotot_server):
+    chotot_server.delays = {80: 3.0}
+    start = time.monotonic()
+    with crawl_deadline(time.monotonic() + 1.0):
+        products = chotot.crawl_chotot("iphone 13")
+    elapsed = time.monotonic() - start
+
+    # Trang offset 80 chưa về khi hết hạn, các trang còn lại vẫn được trả về
+    assert elapsed < 2.0
+    last_page_ids = {ad["list_id"] for ad in build_page(80)["ads"]} - {
+        ad["list_id"] for offset in OFFSETS[:-1] for ad in build_page(offset)["ads"]}
+    assert list_ids(products) == sorted(set(expected_list_ids()) - last_page_ids)
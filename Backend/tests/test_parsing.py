@@ -0,0 +1,27 @@
+import pytest
+from Crawler.engine import normalize_items
+from Crawler.parsing import _bs4_parse_list_items, get_store_selectors, load_search_page_fixture, parse_list_items
+from Crawler.stores import get_store_config
+
+# Số sản phẩm có giá trong trang tìm kiếm đã lưu của từng cửa hàng
+EXPECTED_PRODUCTS = {1: 4, 2: 6}
+
+@pytest.mark.parametrize("store_id", sorted(EXPECTED_PRODUCTS))
+def test_lxml_matches_beautifulsoup_on_saved_pages(store_id):
+    page = load_search_page_fixture(store_id)
+    selectors = get_store_selectors(get_store_config(store_id))
+
+    assert page is not None
+    assert parse_list_items(page, selectors) == _bs4_parse_list_items(page, selectors)
+
+@pytest.mark.parametrize("store_id", sorted(EXPECTED_PRODUCTS))
+def test_saved_pages_normalize_to_products(store_id):
+    store = get_store_config(store_id)
+    products = list(normalize_items(store, parse_list_items(load_search_page_fixture(store_id), get_store_selectors(store))))
+
+    assert len(products) == EXPECTED_PRODUCTS[store_id]
+    for product in products:
+        assert product["link"].startswith(store.base_url + "/")
+        assert product["image_url"].startswith("https://")
+        # Giá bán, không dính giá gốc hay tiền quà tặng
+        assert 1_000_000 <= product["price"] <= 30_000_000
@@ -0,0 +1,32 @@
+import dataclasses
+from Crawler import stores, utils
+
+class FakeDriver:
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((cmd, params))
+
+def blocked_urls(driver):
+    return next(params["urls"] for cmd, params in driver.commands if cmd == "Network.setBlockedURLs")
+
+def test_allowlisted_image_pattern_is_not_blocked_in_tab(monkeypatch):
+    store = dataclasses.replace(stores.get_store_config(2), resource_allowlist=("*.webp",))
+    monkeypatch.setattr(stores, "get_store_config", lambda store_id: store if store_id == 2 else None)
+    monkeypatch.setattr(utils, "CHROME_LEAN_PROFILE", True)
+
+    allowed, default = FakeDriver(), FakeDriver()
+    utils.apply_resource_blocking(allowed, store_id=2)
+    utils.apply_resource_blocking(default, store_id=1)
+
+    assert "*.webp" not in blocked_urls(allowed)
+    assert "*.jpg" in blocked_urls(allowed)
+    assert "*.webp" in blocked_urls(default)
+
+def test_lean_profile_does_not_disable_images_globally(monkeypatch):
+    monkeypatch.setattr(utils, "CHROME_LEAN_PROFILE", True)
+    options = utils.setup_chrome_driver()
+
+    assert not any("imagesEnabled" in argument for argument in options.arguments)
+    assert "profile.managed_default_content_settings.images" not in options.experimental_options.get("prefs", {})
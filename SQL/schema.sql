@@ -32,15 +32,16 @@ BEGIN
 END
 GO
 
--- 5. Tạo bảng Products với price là DECIMAL(15,2)
+-- 5. Tạo bảng Products với price là DECIMAL(18,2) (giống init_db trong Backend/Database/db.py)
 IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'Products')
 BEGIN
     CREATE TABLE Products (
         id INT IDENTITY(1,1) PRIMARY KEY,
         name NVARCHAR(255) NOT NULL,
+        name_normalized NVARCHAR(255), -- Tên không dấu, chữ thường (do ứng dụng điền, giống normalize_text)
         store_id INT NOT NULL,
         category_id INT,
-        price DECIMAL(15,2) NOT NULL,
+        price DECIMAL(18,2) NOT NULL,
         rating FLOAT,
         link NVARCHAR(500) NOT NULL,
         image_url NVARCHAR(500),
@@ -56,9 +57,13 @@ BEGIN
     BEGIN
         ALTER TABLE Products ADD image_url NVARCHAR(500);
     END
+    IF NOT EXISTS (SELECT * FROM sys.columns WHERE name = 'name_normalized' AND object_id = OBJECT_ID('Products'))
+    BEGIN
+        ALTER TABLE Products ADD name_normalized NVARCHAR(255);
+    END
     IF EXISTS (SELECT * FROM sys.columns WHERE name = 'price' AND object_id = OBJECT_ID('Products') AND system_type_id = TYPE_ID('int'))
     BEGIN
-        ALTER TABLE Products ALTER COLUMN price DECIMAL(15,2) NOT NULL;
+        ALTER TABLE Products ALTER COLUMN price DECIMAL(18,2) NOT NULL;
     END
 END
 GO
@@ -69,7 +74,7 @@ BEGIN
     CREATE TABLE PriceHistory (
         id INT IDENTITY(1,1) PRIMARY KEY,
         product_id INT NOT NULL,
-        price DECIMAL(15,2) NOT NULL,
+        price DECIMAL(18,2) NOT NULL,
         recorded_at DATETIME DEFAULT GETDATE(),
         FOREIGN KEY (product_id) REFERENCES Products(id)
     );
@@ -161,4 +166,48 @@ BEGIN
     (N'Nồi cơm điện'),    -- ID: 10
     (N'Khác');           -- ID: 11
 END
+GO
+
+-- 11b. Chèn các cửa hàng (ID khớp với store_id trong Backend/Crawler/stores.py)
+MERGE Stores AS target
+USING (VALUES
+    (1, N'Điện Máy Xanh', N'https://www.dienmayxanh.com'),
+    (2, N'Thế Giới Di Động', N'https://www.thegioididong.com'),
+    (3, N'Chợ Tốt', N'https://www.chotot.com'),
+    (4, N'Nguyễn Kim', N'https://www.nguyenkim.com')
+) AS source (id, name, website)
+ON target.id = source.id
+WHEN NOT MATCHED THEN
+    INSERT (id, name, website) VALUES (source.id, source.name, source.website);
+GO
+
+-- 12. Tạo các index phục vụ tìm kiếm, lọc giá và sắp xếp
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Products_name_normalized' AND object_id = OBJECT_ID('Products'))
+    CREATE INDEX IX_Products_name_normalized ON Products (name_normalized) INCLUDE (price, store_id);
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Products_store_name_link' AND object_id = OBJECT_ID('Products'))
+    CREATE INDEX IX_Products_store_name_link ON Products (store_id, name) INCLUDE (link, price);
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Products_price' AND object_id = OBJECT_ID('Products'))
+    CREATE INDEX IX_Products_price ON Products (price);
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Products_last_updated' AND object_id = OBJECT_ID('Products'))
+    CREATE INDEX IX_Products_last_updated ON Products (last_updated);
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_PriceHistory_product_recorded' AND object_id = OBJECT_ID('PriceHistory'))
+    CREATE INDEX IX_PriceHistory_product_recorded ON PriceHistory (product_id, recorded_at);
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Notifications_is_read_created' AND object_id = OBJECT_ID('Notifications'))
+    CREATE INDEX IX_Notifications_is_read_created ON Notifications (is_read, created_at);
+GO
+
+-- 13. Full-text index trên tên đã chuẩn hóa (chỉ tạo khi SQL Server có cài Full-Text Search)
+IF FULLTEXTSERVICEPROPERTY('IsFullTextInstalled') = 1
+BEGIN
+    IF NOT EXISTS (SELECT * FROM sys.fulltext_catalogs WHERE name = 'ProductsCatalog')
+        CREATE FULLTEXT CATALOG ProductsCatalog WITH ACCENT_SENSITIVITY = OFF;
+
+    IF NOT EXISTS (SELECT * FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('Products'))
+    BEGIN
+        DECLARE @pk SYSNAME = (SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID('Products') AND is_primary_key = 1);
+        DECLARE @sql NVARCHAR(MAX) = N'CREATE FULLTEXT INDEX ON Products (name_normalized LANGUAGE 0) KEY INDEX '
+            + QUOTENAME(@pk) + N' ON ProductsCatalog WITH CHANGE_TRACKING AUTO, STOPLIST = OFF';
+        EXEC sp_executesql @sql;
+    END
+END
 GO
\ No newline at end of file